@@ -0,0 +1,588 @@
+"""
+NoPickie - 录像归档批量分析
+把一个目录（含子目录）下的全部录像分给进程池并行分析，每个工作进程一个检测器（一个 Pose 实例），
+每路录像的结果单独保存为一个 .npz（按列存储，压缩）
+
+分两步，各自缓存：
+- 提取：解码 + 姿态模型，得到每帧关键点，保存到 landmarks/<会话>.npz（慢，和录像时长成正比）
+- 评分：用关键点驱动距离计算和状态机，得到触发时间线、片段和距离曲线，保存到 results/<会话>.npz（快）
+
+两者都记录了录像文件的大小/修改时间和所用配置的指纹：中断后重新运行会跳过已完成的会话；
+只改了 detection 参数（阈值、平滑等）时只重新评分，不再解码和推理
+
+提取时关闭运动门控、关键帧预测和手部细分，每帧都跑姿态模型（缓存的关键点与评分参数无关）
+
+结果文件的列：
+    timestamps  (N,)   float64  每帧时间（秒，帧号 / 录像帧率）
+    present     (N,)   bool     是否检测到人体
+    distance    (N,)   float32  平滑后的手头距离（未检测到人体时为 NaN）
+    state       (N,)   int8     状态（STATES 中的下标）
+    triggers    (K,)   float64  触发时间（秒）
+    episodes    (M, 2) float64  片段（连续的 Warning/Detected）的开始、结束时间
+    episode_triggers (M,) int32 每个片段内的触发次数
+    meta        JSON 字符串：录像信息、配置指纹、汇总
+
+用法：
+    python archive.py ~/recordings --output ~/recordings_analysis --workers 4
+    python archive.py ~/recordings --output ~/recordings_analysis --config tuned.json   # 改阈值后重新评分
+    python archive.py ~/recordings --output ~/recordings_analysis --force               # 全部重新提取
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from geometry import NUM_LANDMARKS
+from replay import ReplayClock, create_detector, load_replay_config
+
+VIDEO_SUFFIXES = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+STATES = ('Normal', 'Warning', 'Detected')
+FORMAT_VERSION = 1  # 结果文件格式变化时加一（旧结果会重新评分）
+
+# 影响关键点的配置（变化时需要重新提取）；影响评分的配置（变化时只需重新评分）
+EXTRACT_SECTIONS = ('model', 'tracking')
+SCORE_SECTIONS = ('detection',)
+
+
+def fingerprint(config, sections):
+    """
+    计算配置指纹
+
+    Args:
+        config: 完整配置
+        sections: 参与计算的配置段
+
+    Returns:
+        str: 12 位十六进制
+    """
+    data = json.dumps({name: config.get(name, {}) for name in sections}, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()[:12]
+
+
+def extract_config(config):
+    """
+    提取关键点使用的配置：每帧推理，不做运动门控、关键帧预测和手部细分，模型不自动切换
+
+    Args:
+        config: 完整配置
+
+    Returns:
+        dict: 新的配置（不修改原配置）
+    """
+    config = copy.deepcopy(config)
+    config.setdefault('model', {})['auto'] = False
+    for section in ('motion_gate', 'keyframes', 'hand_stage'):
+        config.setdefault(section, {})['enabled'] = False
+    return config
+
+
+def source_signature(path):
+    """录像文件的大小和修改时间（文件被替换或重新导出后缓存失效）"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def find_sessions(archive, output):
+    """
+    列出归档目录下的录像
+
+    Args:
+        archive: 归档目录
+        output: 输出目录
+
+    Returns:
+        list: [{"name", "source", "landmarks", "results"}]，按路径排序
+    """
+    archive = Path(archive)
+    output = Path(output)
+    sessions = []
+    for path in sorted(archive.rglob('*')):
+        if path.suffix.lower() not in VIDEO_SUFFIXES or not path.is_file():
+            continue
+        # 子目录中的同名文件不冲突：路径分隔符换成 __
+        name = '__'.join(path.relative_to(archive).with_suffix('').parts)
+        sessions.append({
+            'name': name,
+            'source': str(path),
+            'landmarks': str(output / 'landmarks' / f"{name}.npz"),
+            'results': str(output / 'results' / f"{name}.npz")
+        })
+    return sessions
+
+
+def read_meta(path):
+    """
+    读取 .npz 中的 meta（只解压这一列）
+
+    Returns:
+        dict，文件不存在或损坏时返回 None
+    """
+    try:
+        with np.load(path) as data:
+            return json.loads(str(data['meta']))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def save_npz(path, meta, **columns):
+    """
+    原子地保存 .npz（先写临时文件再改名，中断时不会留下半个结果）
+
+    Args:
+        path: 目标路径
+        meta: 元数据（保存为 JSON 字符串）
+        columns: 各列数组
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **columns)
+    os.replace(tmp, path)
+
+
+def plan_session(session, extract_key, score_key, force=False):
+    """
+    判断会话需要做哪些步骤
+
+    Args:
+        session: find_sessions() 的元素
+        extract_key: 提取配置指纹
+        score_key: 评分配置指纹
+        force: 忽略缓存，全部重新提取
+
+    Returns:
+        'skip'（结果已是最新）、'score'（只重新评分）或 'extract'
+    """
+    if force:
+        return 'extract'
+    signature = source_signature(session['source'])
+
+    landmarks = read_meta(session['landmarks'])
+    if landmarks is None or landmarks.get('source') != signature or landmarks.get('extract_key') != extract_key:
+        return 'extract'
+
+    results = read_meta(session['results'])
+    if (results is None or results.get('version') != FORMAT_VERSION
+            or results.get('landmarks_key') != landmarks.get('landmarks_key')
+            or results.get('score_key') != score_key):
+        return 'score'
+    return 'skip'
+
+
+class FrameReader:
+    """
+    后台线程解码视频，最多提前解码 depth 帧
+
+    depth + 1 块帧缓冲区循环使用：解码线程拿不到空闲缓冲区时等待，
+    内存占用固定，解码（OpenCV 释放 GIL）与推理并行
+    """
+
+    def __init__(self, path, depth=8):
+        """
+        Args:
+            path: 视频路径
+            depth: 预读帧数上限
+        """
+        import cv2
+
+        from capture import FileCapture
+
+        self.cap = FileCapture(str(path))
+        if not self.cap.isOpened():
+            raise IOError(f"无法打开视频: {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self._free = queue.Queue()
+        for _ in range(max(1, depth) + 1):
+            self._free.put(None)  # 第一次使用时按画面尺寸分配
+        self._ready = queue.Queue()
+        self._stop = threading.Event()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="NoPickie-ArchiveReader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                buffer = self._free.get()
+                if self._stop.is_set():
+                    break
+                ret, frame = self.cap.read(buffer)
+                if not ret:
+                    break
+                self._ready.put(frame)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.put(None)
+
+    def __iter__(self):
+        """
+        逐帧取出画面（用完的画面在下一次迭代时归还，不要保存引用）
+
+        Yields:
+            (帧号, BGR 画面)
+        """
+        index = 0
+        while True:
+            frame = self._ready.get()
+            if frame is None:
+                break
+            yield index, frame
+            self._free.put(frame)
+            index += 1
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """停止解码线程并释放视频"""
+        self._stop.set()
+        self._free.put(None)  # 唤醒等待空闲缓冲区的解码线程
+        self._thread.join()
+        self.cap.release()
+
+
+def extract_landmarks(detector, clock, path, read_ahead):
+    """
+    解码录像并逐帧推理关键点
+
+    Args:
+        detector: 使用 extract_config() 和 clock 创建的检测器
+        clock: ReplayClock
+        path: 视频路径
+        read_ahead: 预读帧数上限
+
+    Returns:
+        (timestamps, points, present, 录像信息)
+    """
+    reader = FrameReader(path, read_ahead)
+    # 帧数只是容器里的估计值，按需扩容
+    capacity = max(reader.frame_count, 1)
+    timestamps = np.empty(capacity, dtype=np.float64)
+    points = np.zeros((capacity, NUM_LANDMARKS, 3), dtype=np.float32)
+    present = np.zeros(capacity, dtype=bool)
+    shape = None
+    count = 0
+
+    detector.reset()
+    try:
+        for index, frame in reader:
+            if index >= capacity:
+                capacity *= 2
+                timestamps = np.resize(timestamps, capacity)
+                points = np.resize(points, (capacity, NUM_LANDMARKS, 3))
+                present = np.resize(present, capacity)
+            shape = frame.shape
+            timestamp = index / reader.fps
+            clock.set(timestamp)
+            detector.analyze(frame)
+            timestamps[index] = timestamp
+            present[index] = detector.last_points is not None
+            if present[index]:
+                points[index] = detector.last_points
+            else:
+                points[index] = 0.0
+            count = index + 1
+    finally:
+        reader.close()
+
+    info = {
+        'frames': count,
+        'fps': reader.fps,
+        'width': shape[1] if shape else None,
+        'height': shape[0] if shape else None
+    }
+    return timestamps[:count], points[:count], present[:count], info
+
+
+def score_landmarks(detector, clock, timestamps, points, present):
+    """
+    用关键点驱动检测器，得到每帧的距离和状态
+
+    Args:
+        detector: 检测器（会被重置）
+        clock: 创建检测器时使用的 ReplayClock
+        timestamps: (N,) 每帧时间（秒）
+        points: (N, 33, 3) 关键点（已镜像）
+        present: (N,) 是否检测到人体
+
+    Returns:
+        dict: 结果文件的各列（不含 meta）
+    """
+    count = len(timestamps)
+    distance = np.full(count, np.nan, dtype=np.float32)
+    state = np.zeros(count, dtype=np.int8)
+    state_codes = {name: code for code, name in enumerate(STATES)}
+    triggers = []
+
+    detector.reset()
+    trigger_count = detector.trigger_count
+    for i in range(count):
+        clock.set(float(timestamps[i]))
+        stats = detector.analyze_points(points[i].astype(np.float64) if present[i] else None)
+        if stats['distance'] is not None:
+            distance[i] = stats['distance']
+        state[i] = state_codes[stats['state']]
+        if stats['trigger_count'] > trigger_count:
+            triggers.append(float(timestamps[i]))
+        trigger_count = stats['trigger_count']
+
+    episodes, episode_triggers = find_episodes(timestamps, state, triggers)
+    return {
+        'timestamps': np.asarray(timestamps, dtype=np.float64),
+        'present': np.asarray(present, dtype=bool),
+        'distance': distance,
+        'state': state,
+        'triggers': np.asarray(triggers, dtype=np.float64),
+        'episodes': episodes,
+        'episode_triggers': episode_triggers
+    }
+
+
+def find_episodes(timestamps, state, triggers):
+    """
+    找出连续的非 Normal 片段
+
+    Args:
+        timestamps: (N,) 每帧时间
+        state: (N,) 状态下标
+        triggers: 触发时间列表
+
+    Returns:
+        episodes: (M, 2) 开始、结束时间（结束取片段后第一帧的时间，录像结尾时取最后一帧）
+        episode_triggers: (M,) 每个片段内的触发次数
+    """
+    active = np.concatenate(([False], state != 0, [False]))
+    edges = np.flatnonzero(active[1:] != active[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    last = len(timestamps) - 1
+    episodes = np.array(
+        [(timestamps[s], timestamps[min(e, last)]) for s, e in zip(starts, ends)],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    trigger_times = np.asarray(triggers, dtype=np.float64)
+    episode_triggers = np.array(
+        [np.count_nonzero((trigger_times >= start) & (trigger_times <= end)) for start, end in episodes],
+        dtype=np.int32
+    )
+    return episodes, episode_triggers
+
+
+def summarize_session(columns, info):
+    """
+    单个会话的汇总（写入 meta，也用于总报告）
+
+    Args:
+        columns: score_landmarks() 的结果
+        info: 录像信息
+    """
+    durations = columns['episodes'][:, 1] - columns['episodes'][:, 0]
+    timestamps = columns['timestamps']
+    return {
+        'frames': int(len(timestamps)),
+        'media_seconds': round(float(timestamps[-1]) + 1.0 / info['fps'], 3) if len(timestamps) else 0.0,
+        'present_ratio': round(float(columns['present'].mean()), 4) if len(timestamps) else 0.0,
+        'triggers': int(len(columns['triggers'])),
+        'episodes': int(len(durations)),
+        'episode_seconds': round(float(durations.sum()), 3),
+        'longest_episode_seconds': round(float(durations.max()), 3) if len(durations) else 0.0
+    }
+
+
+# 工作进程的全局状态（每个进程一个检测器）
+_worker = {}
+
+
+def _init_worker(config):
+    """工作进程初始化：创建检测器"""
+    # Ctrl+C 由主进程处理（结束进程池），工作进程不打印中断的堆栈
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    clock = ReplayClock()
+    _worker['clock'] = clock
+    _worker['detector'] = create_detector(extract_config(config), clock)
+    _worker['extract_key'] = fingerprint(config, EXTRACT_SECTIONS)
+    _worker['score_key'] = fingerprint(config, SCORE_SECTIONS)
+
+
+def process_session(job):
+    """
+    在工作进程中处理一个会话
+
+    Args:
+        job: (会话, 步骤, 预读帧数)
+
+    Returns:
+        dict: 会话名称、步骤、耗时、汇总或错误信息
+    """
+    session, step, read_ahead = job
+    detector = _worker['detector']
+    clock = _worker['clock']
+    start = time.perf_counter()
+    try:
+        if step == 'extract':
+            signature = source_signature(session['source'])
+            timestamps, points, present, info = extract_landmarks(detector, clock, session['source'], read_ahead)
+            landmarks_meta = {
+                'source': signature,
+                'extract_key': _worker['extract_key'],
+                # 关键点缓存本身的标识（评分结果据此判断是否基于最新的关键点）
+                'landmarks_key': f"{_worker['extract_key']}-{signature['size']}-{signature['mtime_ns']}",
+                'info': info
+            }
+            save_npz(session['landmarks'], landmarks_meta, timestamps=timestamps, points=points, present=present)
+        else:
+            with np.load(session['landmarks']) as data:
+                landmarks_meta = json.loads(str(data['meta']))
+                timestamps, points, present = data['timestamps'], data['points'], data['present']
+            info = landmarks_meta['info']
+        extract_seconds = time.perf_counter() - start
+
+        columns = score_landmarks(detector, clock, timestamps, points, present)
+        summary = summarize_session(columns, info)
+        meta = {
+            'version': FORMAT_VERSION,
+            'session': session['name'],
+            'source': session['source'],
+            'landmarks_key': landmarks_meta['landmarks_key'],
+            'score_key': _worker['score_key'],
+            'states': list(STATES),
+            'info': info,
+            'summary': summary
+        }
+        save_npz(session['results'], meta, **columns)
+    except Exception as e:
+        return {'session': session['name'], 'step': step, 'error': str(e)}
+
+    wall_seconds = time.perf_counter() - start
+    return {
+        'session': session['name'],
+        'step': step,
+        'wall_seconds': round(wall_seconds, 2),
+        'extract_seconds': round(extract_seconds, 2) if step == 'extract' else 0.0,
+        'realtime_factor': round(summary['media_seconds'] / wall_seconds, 1) if wall_seconds > 0 else None,
+        **summary
+    }
+
+
+def run_archive(sessions, config, workers, read_ahead, force, report):
+    """
+    并行分析全部会话
+
+    Args:
+        sessions: find_sessions() 的结果
+        config: 检测配置
+        workers: 工作进程数
+        read_ahead: 每个工作进程的预读帧数上限
+        force: 忽略缓存全部重新提取
+        report: 每完成一个会话的回调 report(dict)
+
+    Returns:
+        dict: 各步骤的会话数和失败的会话
+    """
+    extract_key = fingerprint(config, EXTRACT_SECTIONS)
+    score_key = fingerprint(config, SCORE_SECTIONS)
+    jobs = []
+    counts = {'skip': 0, 'score': 0, 'extract': 0}
+    for session in sessions:
+        step = plan_session(session, extract_key, score_key, force)
+        counts[step] += 1
+        if step != 'skip':
+            jobs.append((session, step, read_ahead))
+    # 先处理需要提取的长录像，避免最后只剩一个进程在跑
+    jobs.sort(key=lambda job: (job[1] != 'extract', -os.path.getsize(job[0]['source'])))
+
+    errors = []
+    if jobs:
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(min(workers, len(jobs)), initializer=_init_worker, initargs=(config,)) as pool:
+            for result in pool.imap_unordered(process_session, jobs):
+                if 'error' in result:
+                    errors.append(result)
+                report(result)
+    return {**counts, 'errors': errors}
+
+
+def collect_summary(sessions):
+    """
+    汇总全部会话（从结果文件的 meta 读取，不解压数据列）
+
+    Returns:
+        dict: 总时长、触发次数、片段总时长和各会话汇总
+    """
+    entries = []
+    for session in sessions:
+        meta = read_meta(session['results'])
+        if meta is not None:
+            entries.append({'session': session['name'], **meta['summary']})
+    media_seconds = sum(e['media_seconds'] for e in entries)
+    triggers = sum(e['triggers'] for e in entries)
+    return {
+        'sessions': len(entries),
+        'media_hours': round(media_seconds / 3600, 3),
+        'triggers': triggers,
+        'triggers_per_hour': round(triggers / (media_seconds / 3600), 2) if media_seconds > 0 else None,
+        'episodes': sum(e['episodes'] for e in entries),
+        'episode_seconds': round(sum(e['episode_seconds'] for e in entries), 3),
+        'per_session': entries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 录像归档批量分析")
+    parser.add_argument('archive', help="录像目录（包含子目录）")
+    parser.add_argument('--output', required=True, help="结果目录（landmarks/、results/、summary.json）")
+    parser.add_argument('--config', default='config.json', help="检测配置文件")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="工作进程数（每个进程一个 Pose 实例）")
+    parser.add_argument('--read-ahead', type=int, default=8, help="每个进程的预读帧数上限")
+    parser.add_argument('--force', action='store_true', help="忽略缓存，全部重新提取关键点")
+    args = parser.parse_args()
+
+    config = load_replay_config(args.config)
+    sessions = find_sessions(args.archive, args.output)
+    if not sessions:
+        print(f"❌ 没有找到录像: {args.archive}", file=sys.stderr)
+        return 1
+
+    def report(result):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    start = time.perf_counter()
+    try:
+        outcome = run_archive(sessions, config, max(1, args.workers), max(1, args.read_ahead), args.force, report)
+    except KeyboardInterrupt:
+        # 已完成的会话都已保存，重新运行时从未完成的会话继续
+        print("\n⏹ 已中断，重新运行即可继续", file=sys.stderr)
+        return 130
+
+    summary = collect_summary(sessions)
+    summary['run'] = {
+        'extracted': outcome['extract'],
+        'rescored': outcome['score'],
+        'skipped': outcome['skip'],
+        'failed': [e['session'] for e in outcome['errors']],
+        'wall_seconds': round(time.perf_counter() - start, 1)
+    }
+    with open(Path(args.output) / 'summary.json', 'w') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(json.dumps({k: v for k, v in summary.items() if k != 'per_session'}, indent=2, ensure_ascii=False),
+          file=sys.stderr)
+    return 1 if outcome['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
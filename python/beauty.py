@@ -0,0 +1,180 @@
+"""
+NoPickie - 美颜滤镜
+磨皮 + 美白 + 增加饱和度，按画质档位选择实现方式：
+
+- full:     整帧双边滤波 + convertScaleAbs + HSV 浮点运算（原始实现）
+- balanced: 只在脸部区域、半分辨率下磨皮，美白和饱和度使用查找表
+- fast:     脸部区域 1/4 分辨率磨皮，美白和饱和度使用查找表
+"""
+
+import cv2
+import numpy as np
+
+
+# 美白：alpha 提高对比度，beta 增加亮度
+BRIGHTEN_ALPHA = 1.15
+BRIGHTEN_BETA = 20
+# 饱和度倍数
+SATURATION_GAIN = 1.2
+
+# 画质档位：smoothing 为磨皮范围（frame=整帧，face=脸部区域），scale 为磨皮时的缩放比例
+QUALITY_PRESETS = {
+    'full': {'smoothing': 'frame', 'scale': 1.0, 'lut': False},
+    'balanced': {'smoothing': 'face', 'scale': 0.5, 'lut': True},
+    'fast': {'smoothing': 'face', 'scale': 0.25, 'lut': True},
+}
+
+# 脸部关键点（鼻子、眼睛、耳朵、嘴角）
+FACE_INDICES = range(0, 11)
+
+
+def _build_luts():
+    """预先计算 256 项查找表"""
+    values = np.arange(256, dtype=np.float64)
+
+    # 直接用 cv2.convertScaleAbs 生成，保证与原实现逐像素一致
+    brighten = cv2.convertScaleAbs(
+        np.arange(256, dtype=np.uint8).reshape(1, 256), alpha=BRIGHTEN_ALPHA, beta=BRIGHTEN_BETA
+    ).reshape(256)
+
+    # 与原实现一致：S 通道乘以倍数后截断（小数部分直接舍去），H/V 通道不变
+    saturation = np.clip(values * SATURATION_GAIN, 0, 255).astype(np.uint8)
+    identity = np.arange(256, dtype=np.uint8)
+    hsv = np.dstack([identity, saturation, identity]).reshape(1, 256, 3)
+
+    return brighten, hsv
+
+
+class BeautyFilter:
+    """美颜滤镜（查找表预先计算，中间缓冲区复用）"""
+
+    def __init__(self, quality='balanced'):
+        """
+        Args:
+            quality: 画质档位（full / balanced / fast）
+        """
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f"未知的美颜画质档位: {quality}")
+        self.quality = quality
+        self.preset = QUALITY_PRESETS[quality]
+
+        self.brighten_lut, self.hsv_lut = _build_luts()
+
+        # 复用的中间缓冲区（按尺寸缓存）
+        self._hsv = None
+        self._small = {}
+
+    def apply(self, frame, face_box=None):
+        """
+        应用美颜滤镜
+
+        查找表模式下结果直接写回 frame（调用方需保证 frame 可以被修改）
+
+        Args:
+            frame: 输入的BGR图像
+            face_box: 脸部区域 (x0, y0, x1, y1)，像素坐标；None 时脸部磨皮模式跳过磨皮
+
+        Returns:
+            美颜后的图像
+        """
+        if not self.preset['lut']:
+            return self._apply_full(frame)
+
+        # 1. 磨皮（只处理脸部区域，低分辨率滤波后放大写回）
+        if face_box is not None:
+            self._smooth_region(frame, face_box, self.preset['scale'])
+
+        # 2. 美白提亮（查找表，原地处理）
+        cv2.LUT(frame, self.brighten_lut, dst=frame)
+
+        # 3. 增加饱和度（HSV 的 S 通道查表，H/V 通道查表结果不变）
+        if self._hsv is None or self._hsv.shape != frame.shape:
+            self._hsv = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        cv2.LUT(self._hsv, self.hsv_lut, dst=self._hsv)
+        cv2.cvtColor(self._hsv, cv2.COLOR_HSV2BGR, dst=frame)
+
+        return frame
+
+    def _apply_full(self, frame):
+        """原始实现：整帧双边滤波 + convertScaleAbs + HSV 浮点运算"""
+        # 1. 双边滤波 - 磨皮效果（保留边缘的同时平滑皮肤）
+        smoothed = cv2.bilateralFilter(frame, 9, 75, 75)
+
+        # 2. 美白提亮（alpha=1.15 提高对比度，beta=20 增加亮度 - 更白）
+        brightened = cv2.convertScaleAbs(smoothed, alpha=BRIGHTEN_ALPHA, beta=BRIGHTEN_BETA)
+
+        # 3. 增加饱和度
+        hsv = cv2.cvtColor(brightened, cv2.COLOR_BGR2HSV)
+        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * SATURATION_GAIN, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+    def _smooth_region(self, frame, box, scale):
+        """
+        在低分辨率下对指定区域做双边滤波，放大后写回原图
+
+        Args:
+            frame: BGR图像（原地修改）
+            box: 区域 (x0, y0, x1, y1)
+            scale: 缩放比例
+        """
+        x0, y0, x1, y1 = box
+        region = frame[y0:y1, x0:x1]
+        h, w = region.shape[:2]
+        small_w, small_h = max(1, int(w * scale)), max(1, int(h * scale))
+
+        small = self._buffer((small_h, small_w, 3), 'small')
+        smoothed = self._buffer((small_h, small_w, 3), 'smoothed')
+        cv2.resize(region, (small_w, small_h), dst=small, interpolation=cv2.INTER_AREA)
+
+        # 分辨率降低后，滤波直径按比例缩小（效果与原图上 d=9 大致相当）
+        diameter = max(3, int(9 * scale) | 1)
+        cv2.bilateralFilter(small, diameter, 75, 75, dst=smoothed)
+
+        cv2.resize(smoothed, (w, h), dst=region, interpolation=cv2.INTER_LINEAR)
+
+    def _buffer(self, shape, name):
+        """获取指定尺寸的复用缓冲区"""
+        key = (name, shape)
+        buffer = self._small.get(key)
+        if buffer is None:
+            if len(self._small) > 16:
+                self._small.clear()
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._small[key] = buffer
+        return buffer
+
+
+def face_box_from_landmarks(landmarks, frame_shape, quantum=16):
+    """
+    根据脸部关键点计算磨皮区域（包含额头和下巴）
+
+    区域边界按 quantum 像素对齐，使相邻帧的缓冲区尺寸尽量相同、可以复用
+
+    Args:
+        landmarks: 归一化坐标的关键点列表（与 frame 的坐标系一致）
+        frame_shape: 图像尺寸
+        quantum: 边界对齐单位（像素）
+
+    Returns:
+        tuple: (x0, y0, x1, y1)，区域无效时返回 None
+    """
+    h, w = frame_shape[:2]
+    xs = [landmarks[i].x for i in FACE_INDICES]
+    ys = [landmarks[i].y for i in FACE_INDICES]
+
+    # 以脸宽（像素）为基准外扩
+    face_w = (max(xs) - min(xs)) * w
+    x0 = min(xs) * w - face_w * 0.3
+    x1 = max(xs) * w + face_w * 0.3
+    y0 = min(ys) * h - face_w * 0.8  # 额头
+    y1 = max(ys) * h + face_w * 0.6  # 下巴
+
+    x0 = max(0, int(x0) // quantum * quantum)
+    y0 = max(0, int(y0) // quantum * quantum)
+    x1 = min(w, -(-int(x1) // quantum) * quantum)
+    y1 = min(h, -(-int(y1) // quantum) * quantum)
+
+    if x1 - x0 < quantum or y1 - y0 < quantum:
+        return None
+    return (x0, y0, x1, y1)
@@ -0,0 +1,242 @@
+"""
+NoPickie - 基准测试
+一组固定的、可复现的合成场景（关键点序列 + 期望触发时间），
+用于在发布前发现性能和准确率的回退
+
+用法：
+    python benchmark.py                              # 运行全部场景并输出报告
+    python benchmark.py --save baseline.json         # 保存为基线
+    python benchmark.py --baseline baseline.json     # 与基线对比，回退时返回非零退出码
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from geometry import NUM_LANDMARKS
+from replay import ReplayClock, Replayer, create_detector, load_replay_config
+
+
+SCENARIO_FPS = 30
+NOISE_SIGMA = 0.003  # 关键点抖动（归一化坐标）
+HIGH_NOISE_SIGMA = 0.04  # 低精度模型（如 model_complexity=0）下的抖动
+
+# 手的位置（归一化坐标，画面已镜像）
+HAND_POSITIONS = {
+    'rest': ((0.40, 0.80), (0.60, 0.80)),     # 双手自然下垂
+    'scratch': ((0.40, 0.80), (0.60, 0.16)),  # 右手在头顶
+    'face': ((0.40, 0.80), (0.51, 0.33)),     # 右手摸脸
+    'near': ((0.40, 0.80), (0.85, 0.30)),     # 右手在头部区域外侧
+}
+
+# 场景：(名称, 总时长, [(开始, 结束, 动作)], 抖动)，未覆盖的时间为 rest，'absent' 表示画面中没有人，
+# 'reach' 表示右手在该时间段内从 rest 匀速移动到 scratch 的位置（其余动作都是瞬间到位）
+SCENARIOS = [
+    ('empty_room', 20.0, [(0.0, 20.0, 'absent')], NOISE_SIGMA),
+    ('hands_resting', 20.0, [], NOISE_SIGMA),
+    ('single_scratch', 15.0, [(5.0, 9.0, 'scratch')], NOISE_SIGMA),
+    ('repeated_scratch', 15.0, [(2.0, 9.5, 'scratch')], NOISE_SIGMA),
+    ('brief_touches', 20.0, [(2.0, 3.0, 'scratch'), (6.0, 7.5, 'face'), (12.0, 13.0, 'scratch')], NOISE_SIGMA),
+    ('face_touch', 12.0, [(4.0, 8.5, 'face')], NOISE_SIGMA),
+    ('near_miss', 15.0, [(3.0, 12.0, 'near')], NOISE_SIGMA),
+    ('person_leaves', 20.0, [(2.0, 4.0, 'scratch'), (4.0, 10.0, 'absent'), (12.0, 16.5, 'scratch')], NOISE_SIGMA),
+    ('long_session', 300.0, [(30.0 * k + 10.0, 30.0 * k + 14.5, 'scratch') for k in range(10)], NOISE_SIGMA),
+    ('jittery_session', 120.0, [(20.0 * k + 5.0, 20.0 * k + 9.5, 'scratch') for k in range(6)], HIGH_NOISE_SIGMA),
+    ('reach_and_scratch', 30.0, [(10.0 * k + 3.0, 10.0 * k + 3.6, 'reach') for k in range(3)] +
+     [(10.0 * k + 3.6, 10.0 * k + 8.0, 'scratch') for k in range(3)], NOISE_SIGMA),
+]
+
+
+def _pose(action):
+    """生成某个动作的标准姿态 (33, 3)"""
+    points = np.zeros((NUM_LANDMARKS, 3))
+    points[:, :2] = (0.5, 0.9)  # 未使用的关键点放在画面下方
+
+    points[0, :2] = (0.50, 0.30)   # 鼻子
+    points[2, :2] = (0.47, 0.27)   # 左眼
+    points[5, :2] = (0.53, 0.27)   # 右眼
+    points[7, :2] = (0.43, 0.28)   # 左耳
+    points[8, :2] = (0.57, 0.28)   # 右耳
+    points[11, :2] = (0.38, 0.50)  # 左肩
+    points[12, :2] = (0.62, 0.50)  # 右肩
+
+    left_hand, right_hand = HAND_POSITIONS[action]
+    points[15, :2] = left_hand                                   # 左手腕
+    points[19, :2] = (left_hand[0], left_hand[1] - 0.04)         # 左食指
+    points[16, :2] = right_hand                                  # 右手腕
+    points[20, :2] = (right_hand[0], right_hand[1] - 0.04)       # 右食指
+    return points
+
+
+def build_scenario(duration, segments, noise=NOISE_SIGMA, seed=0):
+    """
+    生成场景的关键点序列
+
+    Args:
+        duration: 总时长（秒）
+        segments: [(开始, 结束, 动作)]
+        noise: 关键点抖动的标准差
+        seed: 随机种子（抖动）
+
+    Returns:
+        timestamps, points, present（格式同 replay.load_landmark_dump）
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(0.0, duration, 1.0 / SCENARIO_FPS)
+    poses = {action: _pose(action) for action in HAND_POSITIONS}
+
+    points = np.empty((len(timestamps), NUM_LANDMARKS, 3))
+    present = np.ones(len(timestamps), dtype=bool)
+
+    for i, t in enumerate(timestamps):
+        action = 'rest'
+        progress = 0.0
+        for start, end, segment_action in segments:
+            if start <= t < end:
+                action = segment_action
+                progress = (t - start) / (end - start)
+        if action == 'absent':
+            present[i] = False
+            points[i] = 0.0
+        elif action == 'reach':
+            points[i] = poses['rest'] + (poses['scratch'] - poses['rest']) * progress
+        else:
+            points[i] = poses[action]
+
+    points[:, :, :2] += rng.normal(0.0, noise, size=points[:, :, :2].shape)
+    return timestamps, points, present
+
+
+def expected_triggers(segments, time_threshold):
+    """
+    计算场景的期望触发时间：持续接触每满 time_threshold 秒触发一次
+
+    Args:
+        segments: [(开始, 结束, 动作)]
+        time_threshold: 触发时长阈值（秒）
+
+    Returns:
+        list: 期望触发时间（秒）
+    """
+    triggers = []
+    for start, end, action in segments:
+        if action not in ('scratch', 'face'):
+            continue
+        t = start + time_threshold
+        while t < end:
+            triggers.append(t)
+            t += time_threshold
+    return triggers
+
+
+def run_benchmark(config, tolerance=0.5):
+    """
+    运行全部场景
+
+    Args:
+        config: 检测配置
+        tolerance: 触发时间匹配容差（秒）
+
+    Returns:
+        dict: {场景名称: 回放报告}
+    """
+    time_threshold = config['detection']['time_threshold']
+    results = {}
+
+    for index, (name, duration, segments, noise) in enumerate(SCENARIOS):
+        clock = ReplayClock()
+        detector = create_detector(config, clock)
+        replayer = Replayer(detector, clock)
+
+        timestamps, points, present = build_scenario(duration, segments, noise, seed=index)
+
+        start = time.perf_counter()
+        try:
+            replayer.replay_landmarks(timestamps, points, present)
+        finally:
+            detector.cleanup()
+        wall_seconds = time.perf_counter() - start
+
+        expected = expected_triggers(segments, time_threshold)
+        results[name] = replayer.report(wall_seconds, expected, tolerance)
+
+    return results
+
+
+def compare_with_baseline(results, baseline, max_slowdown):
+    """
+    与基线对比
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        max_slowdown: 允许的吞吐量下降比例
+
+    Returns:
+        list: 回退说明，为空表示没有回退
+    """
+    regressions = []
+    for name, report in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        for metric in ('precision', 'recall'):
+            if report['accuracy'][metric] < base['accuracy'][metric]:
+                regressions.append(
+                    f"{name}: {metric} {base['accuracy'][metric]:.3f} → {report['accuracy'][metric]:.3f}")
+
+        if report['throughput_fps'] < base['throughput_fps'] * (1 - max_slowdown):
+            regressions.append(
+                f"{name}: throughput {base['throughput_fps']} → {report['throughput_fps']} FPS")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 基准测试")
+    parser.add_argument('--config', default='config.json', help="检测配置文件")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="触发时间匹配容差（秒）")
+    parser.add_argument('--save', help="把结果保存为基线文件")
+    parser.add_argument('--baseline', help="与基线文件对比")
+    parser.add_argument('--max-slowdown', type=float, default=0.2, help="允许的吞吐量下降比例")
+    parser.add_argument('--keyframes', action='store_true', help="开启关键帧推理（中间帧使用预测的关键点）")
+    args = parser.parse_args()
+
+    config = load_replay_config(args.config)
+    if args.keyframes:
+        config.setdefault('keyframes', {})['enabled'] = True
+    results = run_benchmark(config, args.tolerance)
+
+    for name, report in results.items():
+        accuracy = report['accuracy']
+        analyze = report['stages']['analyze']
+        keyframes = report.get('keyframes')
+        print(f"{name:18s} P={accuracy['precision']:.2f} R={accuracy['recall']:.2f} "
+              f"delay={accuracy['mean_delay']}s "
+              f"{report['throughput_fps']:>9} FPS  analyze p50={analyze['p50_ms']}ms "
+              f"p99={analyze['p99_ms']}ms"
+              + (f"  inference={keyframes['inference_ratio']:.2f}" if keyframes else ""), file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.max_slowdown)
+        for regression in regressions:
+            print(f"❌ 回退: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("✅ 没有发现回退", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+NoPickie - 缓冲区复用
+长时间运行时每帧分配的整帧数组（采集、颜色转换、镜像、缩放）会造成内存抖动和 GC 停顿，
+缓冲池模式下这些数组按分辨率只分配一次，之后通过 OpenCV 的 dst= 参数原地写入：
+
+- BufferPool:  按名称缓存的临时缓冲区，尺寸变化时重新分配（同一线程内使用，不加锁）
+- FrameSlots:  轮流使用的一组整帧缓冲区（渲染输出要交给输出线程，不能立即覆盖）
+- read_into:   把摄像头画面读进已有的缓冲区
+
+关闭时（buffers.enabled = false）get() 返回 None，OpenCV 函数收到 dst=None 时照常分配新数组
+"""
+
+import numpy as np
+
+
+class BufferPool:
+    """按名称复用的缓冲区（不加锁，每个线程使用自己的实例）"""
+
+    def __init__(self, enabled=True):
+        """
+        Args:
+            enabled: 是否复用（False 时 get() 总是返回 None）
+        """
+        self.enabled = enabled
+        self._buffers = {}
+
+        # 统计信息
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        根据 buffers 配置创建
+
+        Args:
+            config: 完整配置
+        """
+        return cls(config.get('buffers', {}).get('enabled', True))
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        获取缓冲区
+
+        Args:
+            name: 用途（每个用途一块内存，尺寸或类型变化时重新分配，不影响其他用途）
+            shape: 数组形状
+            dtype: 数据类型
+
+        Returns:
+            np.ndarray，关闭复用时返回 None
+        """
+        if not self.enabled:
+            return None
+        shape = tuple(shape)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+        return buffer
+
+    def snapshot(self):
+        """
+        获取复用统计
+
+        Returns:
+            dict: 是否启用、累计分配次数、当前缓存的缓冲区数和总大小
+        """
+        return {
+            'enabled': self.enabled,
+            'allocations': self.allocations,
+            'buffers': len(self._buffers),
+            'cached_mb': round(sum(b.nbytes for b in self._buffers.values()) / 1024 / 1024, 2)
+        }
+
+
+class FrameSlots:
+    """
+    轮流使用的一组整帧缓冲区
+
+    渲染结果交给输出线程后还要被编码、发送，下一帧不能写进同一块内存；
+    count 需要大于同时在途的帧数（输出队列长度 + 输出线程正在处理的 1 帧 + 正在渲染的 1 帧）
+    """
+
+    def __init__(self, pool, name, count):
+        """
+        Args:
+            pool: BufferPool（关闭复用时 next() 返回 None）
+            name: 用途
+            count: 缓冲区个数
+        """
+        self.pool = pool
+        self.name = name
+        self.names = [f"{name}_{i}" for i in range(max(1, count))]
+        self._index = 0
+
+    def ensure(self, count):
+        """
+        保证至少有 count 块缓冲区
+
+        Args:
+            count: 最少个数
+        """
+        while len(self.names) < count:
+            self.names.append(f"{self.name}_{len(self.names)}")
+
+    def next(self, shape, dtype=np.uint8):
+        """
+        取下一块缓冲区
+
+        Returns:
+            np.ndarray，关闭复用时返回 None
+        """
+        name = self.names[self._index]
+        self._index = (self._index + 1) % len(self.names)
+        return self.pool.get(name, shape, dtype)
+
+
+def read_into(cap, buffer):
+    """
+    读取一帧（有缓冲区且尺寸一致时直接写入，不分配新数组）
+
+    Args:
+        cap: cv2.VideoCapture
+        buffer: 上一次读到的数组（None 表示分配新数组）
+
+    Returns:
+        (ret, frame)：尺寸变化时 frame 是新分配的数组
+    """
+    if buffer is None:
+        return cap.read()
+    return cap.read(buffer)
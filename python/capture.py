@@ -0,0 +1,381 @@
+"""
+NoPickie - 视频采集
+按配置打开视频源并设置采集参数，返回与 cv2.VideoCapture 接口一致的对象（read / get / set / release）：
+
+- device:    摄像头；按配置设置像素格式（FOURCC，如 MJPG / YUYV）、分辨率、帧率和驱动缓冲帧数，
+             打开后读回驱动实际协商的参数（不支持的设置会被驱动静默忽略）
+- file:      视频文件；可以循环播放，realtime 时按文件帧率出帧（模拟摄像头）
+- synthetic: 合成画面；不需要摄像头也能可重复地测量吞吐量和延迟
+
+配置示例（camera 段）：
+    {"source": "device", "device_id": 0, "width": 640, "height": 480, "fps": 30,
+     "format": "MJPG", "buffer_size": 1}
+    {"source": "file", "file": "session.mp4", "loop": true, "realtime": true}
+    {"source": "synthetic", "width": 1280, "height": 720, "fps": 30,
+     "synthetic": {"pattern": "moving", "frames": 0}}
+
+用法（查看摄像头实际协商的格式并测量采集帧率）：
+    python capture.py                       # 使用 config.json 的 camera 配置
+    python capture.py --source synthetic --seconds 10
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+
+SOURCES = ('device', 'file', 'synthetic')
+
+# 采集后端（apiPreference）
+BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'ffmpeg': cv2.CAP_FFMPEG,
+    'gstreamer': cv2.CAP_GSTREAMER
+}
+
+SYNTHETIC_PATTERNS = ('moving', 'static', 'noise')
+
+
+def fourcc_to_str(value):
+    """把 CAP_PROP_FOURCC 的数值转成 4 个字符（取不到时返回 None）"""
+    value = int(value)
+    if value <= 0:
+        return None
+    text = ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+    return text if text.isprintable() else None
+
+
+def open_capture(config):
+    """
+    按 camera 配置打开视频源
+
+    Args:
+        config: camera 配置字典
+
+    Returns:
+        与 cv2.VideoCapture 接口一致的对象，打不开时返回 None
+
+    Raises:
+        ValueError: 配置不合法（未知的 source / backend / format / pattern）
+    """
+    source = config.get('source', 'device')
+    device_id = config.get('device_id', 0)
+    # 兼容旧配置：device_id 写成路径时按视频文件打开
+    if source == 'device' and isinstance(device_id, str) and not device_id.isdigit():
+        source = 'file'
+        config = dict(config, file=device_id, realtime=config.get('realtime', False))
+    if source not in SOURCES:
+        raise ValueError(f"未知的视频源类型: {source}")
+
+    if source == 'synthetic':
+        settings = config.get('synthetic', {})
+        return SyntheticCapture(
+            config.get('width') or 640,
+            config.get('height') or 480,
+            config.get('fps') or 30,
+            pattern=settings.get('pattern', 'moving'),
+            frames=settings.get('frames', 0),
+            realtime=config.get('realtime', True),
+            seed=settings.get('seed', 0)
+        )
+
+    if source == 'file':
+        cap = FileCapture(str(config['file']), loop=config.get('loop', False),
+                          realtime=config.get('realtime', False))
+        return cap if cap.isOpened() else None
+
+    backend = config.get('backend', 'any')
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的采集后端: {backend}")
+    cap = cv2.VideoCapture(int(device_id), BACKENDS[backend])
+    if not cap.isOpened():
+        return None
+    try:
+        apply_settings(cap, config)
+    except Exception:
+        # 配置不合法时释放摄像头再抛出（否则设备一直被占用到进程退出）
+        cap.release()
+        raise
+    return cap
+
+
+def apply_settings(cap, config):
+    """
+    设置摄像头采集参数（未配置的项保持驱动默认值）
+
+    像素格式要在分辨率之前设置：部分驱动只有在 MJPG 下才提供高分辨率
+
+    Args:
+        cap: 已打开的 cv2.VideoCapture
+        config: camera 配置字典
+    """
+    fmt = config.get('format')
+    if fmt:
+        if len(fmt) != 4:
+            raise ValueError(f"像素格式必须是 4 个字符的 FOURCC: {fmt}")
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fmt.upper()))
+    if config.get('width'):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config['width'])
+    if config.get('height'):
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config['height'])
+    if config.get('fps'):
+        cap.set(cv2.CAP_PROP_FPS, config['fps'])
+    if config.get('buffer_size'):
+        # 驱动内部缓冲的帧数；越少排队的旧帧越少（不是所有后端都支持）
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, config['buffer_size'])
+
+
+def capture_info(cap, config):
+    """
+    读回实际生效的采集参数
+
+    Args:
+        cap: open_capture 返回的对象
+        config: camera 配置字典
+
+    Returns:
+        dict: {"requested": 配置的参数, "negotiated": 实际参数, "mismatch": 与配置不一致的项}
+    """
+    # 只有摄像头会协商格式和缓冲；合成画面按配置的尺寸和帧率生成；视频文件不受这些参数影响
+    source = config.get('source', 'device')
+    keys = {'device': ('width', 'height', 'fps', 'format', 'buffer_size'),
+            'synthetic': ('width', 'height', 'fps')}.get(source, ())
+    requested = {key: config.get(key) for key in keys if config.get(key)}
+    buffer_size = cap.get(cv2.CAP_PROP_BUFFERSIZE)
+    negotiated = {
+        'source': source,
+        'backend': cap.getBackendName(),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': round(cap.get(cv2.CAP_PROP_FPS), 2),
+        'format': fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+        'buffer_size': int(buffer_size) if buffer_size > 0 else None
+    }
+
+    mismatch = {}
+    for key, value in requested.items():
+        actual = negotiated[key]
+        if key == 'format':
+            matches = actual is not None and actual.upper() == str(value).upper()
+        elif key == 'fps':
+            matches = actual > 0 and abs(actual - value) < 0.5
+        else:
+            matches = actual == value
+        if not matches:
+            mismatch[key] = {'requested': value, 'actual': actual}
+
+    return {'requested': requested, 'negotiated': negotiated, 'mismatch': mismatch}
+
+
+class FileCapture:
+    """视频文件（可循环播放；realtime 时按文件帧率出帧，模拟摄像头）"""
+
+    def __init__(self, path, loop=False, realtime=False):
+        """
+        Args:
+            path: 视频路径
+            loop: 播放到结尾时是否从头开始
+            realtime: 是否按文件帧率出帧（False 时尽快读取）
+        """
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        self.realtime = realtime
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.period = 1.0 / fps if realtime and fps > 0 else 0.0
+        self._next = None
+        self.loops = 0
+
+    def read(self, image=None):
+        if self.period > 0:
+            self._next = _wait_until(self._next, self.period)
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.loops += 1
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def getBackendName(self):
+        return f"FILE/{self.cap.getBackendName()}"
+
+    def release(self):
+        self.cap.release()
+
+
+class SyntheticCapture:
+    """
+    合成画面源
+
+    - moving: 固定背景上有一个沿圆周运动的方块（运动门控每帧都需要推理）
+    - static: 只有固定背景（运动门控可以跳过）
+    - noise:  每帧都是随机噪声（最差情况）
+    画面中没有人体，姿态模型每帧都走全帧搜索；画面内容只由帧号和 seed 决定，结果可重复
+    """
+
+    def __init__(self, width=640, height=480, fps=30, pattern='moving', frames=0, realtime=True, seed=0):
+        """
+        Args:
+            width: 画面宽度
+            height: 画面高度
+            fps: 帧率
+            pattern: 画面内容（SYNTHETIC_PATTERNS 之一）
+            frames: 总帧数，0 表示不限
+            realtime: 是否按帧率出帧（False 时尽快生成）
+            seed: 随机种子（noise 模式）
+        """
+        if pattern not in SYNTHETIC_PATTERNS:
+            raise ValueError(f"未知的合成画面: {pattern}")
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.pattern = pattern
+        self.frames = frames
+        self.period = 1.0 / self.fps if realtime and self.fps > 0 else 0.0
+        self.seed = seed
+        self.index = 0
+        self._next = None
+        self._opened = True
+
+        # 背景：水平和垂直渐变（只生成一次）
+        x = np.linspace(40, 200, self.width, dtype=np.float32)
+        y = np.linspace(30, 150, self.height, dtype=np.float32)
+        self._background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self._background[:, :, 0] = x[None, :]
+        self._background[:, :, 1] = y[:, None]
+        self._background[:, :, 2] = 90
+        cv2.setRNGSeed(seed)
+
+    def read(self, image=None):
+        if not self._opened or (self.frames and self.index >= self.frames):
+            return False, None
+        if self.period > 0:
+            self._next = _wait_until(self._next, self.period)
+
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape or image.dtype != np.uint8:
+            image = np.empty(shape, dtype=np.uint8)
+
+        if self.pattern == 'noise':
+            cv2.randu(image, 0, 256)
+        else:
+            np.copyto(image, self._background)
+            if self.pattern == 'moving':
+                t = self.index / self.fps
+                size = max(8, self.height // 8)
+                cx = int(self.width / 2 + self.width / 4 * np.cos(t * 2.0))
+                cy = int(self.height / 2 + self.height / 4 * np.sin(t * 2.0))
+                cv2.rectangle(image, (cx - size // 2, cy - size // 2), (cx + size // 2, cy + size // 2),
+                              (240, 240, 240), -1)
+        self.index += 1
+        return True, image
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        values = {
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*'BGR3'),
+            cv2.CAP_PROP_POS_FRAMES: self.index,
+            cv2.CAP_PROP_FRAME_COUNT: self.frames
+        }
+        return float(values.get(prop, 0))
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.index = int(value)
+            return True
+        return False
+
+    def getBackendName(self):
+        return "SYNTHETIC"
+
+    def release(self):
+        self._opened = False
+
+
+def _wait_until(deadline, period):
+    """按固定周期出帧：睡到截止时间，落后时不补偿。返回下一个截止时间"""
+    now = time.monotonic()
+    if deadline is None:
+        return now + period
+    if deadline > now:
+        time.sleep(deadline - now)
+        return deadline + period
+    return now + period
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 采集参数检查")
+    parser.add_argument('--config', default='config.json', help="配置文件（使用 camera 段）")
+    parser.add_argument('--source', choices=SOURCES, help="覆盖 camera.source")
+    parser.add_argument('--seconds', type=float, default=5.0, help="测量采集帧率的时长（秒）")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config) as f:
+            camera = json.load(f).get('camera', {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 读取配置失败，使用默认值: {e}", file=sys.stderr)
+        camera = {}
+    if args.source:
+        camera['source'] = args.source
+
+    cap = open_capture(camera)
+    if cap is None:
+        raise SystemExit("❌ 无法打开视频源")
+
+    info = capture_info(cap, camera)
+    frame = None
+    reads = []
+    intervals = []
+    last = None
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        t0 = time.monotonic()
+        ret, frame = cap.read(frame)
+        t1 = time.monotonic()
+        if not ret:
+            break
+        reads.append(t1 - t0)
+        if last is not None:
+            intervals.append(t1 - last)
+        last = t1
+    cap.release()
+
+    if frame is not None:
+        info['frame_shape'] = list(frame.shape)
+    if intervals:
+        intervals = np.array(intervals) * 1000
+        info['measured'] = {
+            'frames': len(reads),
+            'fps': round(len(intervals) / (intervals.sum() / 1000), 1),
+            'read_ms_mean': round(float(np.mean(reads)) * 1000, 2),
+            'interval_ms_p50': round(float(np.percentile(intervals, 50)), 2),
+            'interval_ms_p95': round(float(np.percentile(intervals, 95)), 2),
+            'interval_ms_max': round(float(intervals.max()), 2)
+        }
+    print(json.dumps(info, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
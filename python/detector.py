@@ -5,22 +5,36 @@
 
 import cv2
 import mediapipe as mp
-import numpy as np
+import sys
 import time
-import math
 from collections import deque
+from geometry import compute_geometry, landmarks_to_array, OUT_OF_ZONE_DISTANCE
+from perf import NULL_PERF
+from beauty import BeautyFilter, face_box_from_landmarks
+from buffers import BufferPool, FrameSlots
+from overlay import OverlayCompositor
+from filters import create_filter
+from pose_model import PoseModel
+from motion_gate import MotionGate
+from hand_stage import HandStage
+from keyframes import KeyframePredictor
 
 
 class HeadScratchDetector:
     """挠头行为检测器"""
     
-    def __init__(self, config):
+    def __init__(self, config, clock=time.time, perf=NULL_PERF):
         """
         初始化检测器
         
         Args:
             config: 配置字典，包含检测参数
+            clock: 时钟函数（返回秒），离线回放时可注入虚拟时钟
+            perf: 各阶段耗时记录器（默认不计时）
         """
+        self.clock = clock
+        self.perf = perf
+        
         # 加载配置
         self.distance_threshold = config['detection']['distance_threshold']
         self.time_threshold = config['detection']['time_threshold']
@@ -30,17 +44,22 @@ class HeadScratchDetector:
         self.show_skeleton = config['display']['show_skeleton']
         self.show_distance = config['display']['show_distance']
         self.enable_beauty_filter = config['display'].get('beauty_filter', True)
+        self.beauty_filter = BeautyFilter(config['display'].get('beauty_quality', 'balanced'))
+        self.overlay = OverlayCompositor()  # 信息面板和标签文字的缓存合成
+        
+        # 缓冲池（颜色转换、缩放、镜像的整帧数组按分辨率只分配一次）
+        self.buffers = BufferPool.from_config(config)
+        # 渲染结果交给输出线程，轮流写入几块缓冲区（个数需大于在途帧数：输出队列长度 + 2）
+        self.render_slots = FrameSlots(self.buffers, 'render', config.get('buffers', {}).get('render_slots', 4))
         
         # 初始化MediaPipe Pose
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
         
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=1  # 0=Lite, 1=Full, 2=Heavy
-        )
+        # 姿态模型（auto 模式下按实测推理耗时自动选择 Lite/Full/Heavy）
+        frame_budget = 1.0 / config['display'].get('fps', 30)
+        self.pose = PoseModel(self.mp_pose, config.get('model', {}), frame_budget, perf)
         
         # 状态变量
         self.current_state = "Normal"  # Normal/Warning/Detected
@@ -55,17 +74,47 @@ class HeadScratchDetector:
         self.adaptive_head_multiplier = 1.2  # 头部区域：基于肩宽的倍数
         self.adaptive_face_multiplier = 0.8  # 脸部区域：基于肩宽的倍数
         
-        # 距离历史（用于平滑）
+        # 关键点时间滤波（在距离计算之前平滑关键点）
+        self.landmark_filter = create_filter(config['detection'].get('landmark_filter', {'type': 'none'}))
+        
+        # 距离历史（用于平滑，维护累加和，每帧 O(1)）
         self.distance_history = deque(maxlen=self.smoothing_frames)
+        self.distance_sum = 0.0
+        
+        # 最近的手到头部中心的距离 / 头部区域半径（<1 表示手在头部区域内，供调度器使用）
+        self.hand_proximity = None
+        
+        # 最近一帧的几何计算结果（头部中心、鼻子、各区域半径等）
+        self.geometry = None
+        
+        # ROI 跟踪模式（只对上一帧的上半身区域做推理）
+        tracking_config = config.get('tracking', {})
+        self.roi_tracking = tracking_config.get('roi_enabled', False)
+        self.roi_padding = tracking_config.get('padding', 0.4)  # 相对关键点包围框边长的外扩比例
+        self.roi_max_size = tracking_config.get('max_size', 480)  # 裁剪区域长边上限（像素），超出则缩小
+        self.tracking_roi = None  # 下一帧使用的 ROI (x0, y0, x1, y1)，None 表示全帧搜索
+        self.last_roi = None  # 当前帧实际使用的 ROI（用于显示）
+        
+        # 运动门控（头部和双手附近没有变化时复用上一次的关键点，不跑姿态模型）
+        self.motion_gate = MotionGate(config.get('motion_gate', {}), self.buffers)
+        self.last_pose_landmarks = None  # 上一次推理得到的关键点（已镜像）
+        self.last_points = None
+        self.last_distance = None  # 上一次的原始手头距离（未平滑）
+        
+        # 关键帧推理（中间帧用运动模型预测关键点，预测的手接近头部时立即推理）
+        self.keyframes = KeyframePredictor(config.get('keyframes', {}))
+        
+        # 手部细分阶段（只在预警期间对离头最近的手做手指级检测，区分抠头/拔头发/搓眼睛/吃手指）
+        self.hand_stage = HandStage(mp.solutions.hands, config.get('hand_stage', {}), perf, self.buffers)
         
         # 用于FPS计算
         self.fps = 0
         self.frame_count = 0
-        self.fps_start_time = time.time()
+        self.fps_start_time = self.clock()
         
     def process_frame(self, frame):
         """
-        处理单帧图像
+        处理单帧图像（分析 + 渲染）
         
         Args:
             frame: 输入的BGR图像
@@ -74,166 +123,362 @@ class HeadScratchDetector:
             processed_frame: 处理后的图像（带可视化）
             stats: 统计信息字典
         """
-        # 镜像翻转画面（左右翻转，体验更自然）
-        frame = cv2.flip(frame, 1)
+        pose_landmarks, stats = self.analyze(frame)
+        processed_frame = self.render(frame, pose_landmarks, stats)
+        return processed_frame, stats
+    
+    def analyze(self, frame):
+        """
+        只做分析不渲染（headless）：不翻转、不复制、不绘制画面
         
-        # 转换颜色空间（MediaPipe需要RGB）
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        画面不做镜像翻转，而是把关键点的 x 坐标镜像（x → 1 - x），
+        得到的坐标与翻转画面后检测的结果一致
         
-        # MediaPipe检测
-        results = self.pose.process(rgb_frame)
+        Args:
+            frame: 输入的BGR图像（摄像头原始画面）
+            
+        Returns:
+            pose_landmarks: 镜像后的关键点（未检测到人体时为 None）
+            stats: 统计信息字典（包含平滑后的距离和状态）
+        """
+        trigger_count = self.trigger_count
+        
+        # 运动门控：画面静止时复用上一次的关键点（手部细分也沿用之前的结果）
+        if self.motion_gate.enabled:
+            with self.perf.measure('motion_gate'):
+                skip = self.motion_gate.check(frame, self.last_points, self.clock())
+            if skip:
+                stats = self.analyze_points(self.last_points)
+                stats['motion_skipped'] = True
+                stats['predicted'] = False
+                if self.current_state == 'Normal':
+                    self.hand_stage.reset()
+                stats['behavior'] = self._record_behavior(self.hand_stage.behavior, trigger_count)
+                return self.last_pose_landmarks, stats
+        
+        # 关键帧之间：用预测的关键点驱动距离计算和状态机（Normal 状态下、手远离头部时）
+        predicted = self.predict_points()
+        if predicted is not None:
+            stats = self.analyze_points(predicted)
+            stats['motion_skipped'] = False
+            stats['predicted'] = True
+            stats['behavior'] = None
+            return self.last_pose_landmarks, stats
+        
+        # MediaPipe检测（ROI 跟踪模式下只处理上半身区域）
+        pose_landmarks = self._detect_pose(frame)
+        
+        points = None
+        if pose_landmarks:
+            # 镜像关键点坐标（代替翻转整帧画面）
+            self._mirror_landmarks(pose_landmarks)
+            points = landmarks_to_array(pose_landmarks.landmark)
+        
+        reused_distance = self.last_distance
+        self.last_pose_landmarks = pose_landmarks
+        self.last_points = points
+        self.observe_keyframe(points)
+        stats = self.analyze_points(points)
+        stats['motion_skipped'] = False
+        stats['predicted'] = False
+        
+        if self.motion_gate.forced:
+            self.motion_gate.verify(reused_distance, self.last_distance)
+        
+        # 级联：预警期间才跑手部模型
+        behavior = self.hand_stage.update(frame, points, self.geometry,
+                                          self.current_state != 'Normal', self.clock())
+        stats['behavior'] = self._record_behavior(behavior, trigger_count)
+        
+        return pose_landmarks, stats
+    
+    def predict_points(self):
+        """
+        关键帧模式下预测本帧的关键点
         
-        # 初始化返回值
-        processed_frame = frame.copy()
-        current_distance = None
+        只在 Normal 状态下预测；以下情况本帧改为推理：
+        - 预测的手进入头部区域（含余量）或脸部区域
+        - 运动门控检测到头部区域有变化（手直接伸向头部时匀速模型预测不到，不等下一个关键帧）
         
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
+        Returns:
+            (33, 3) 预测的关键点（已镜像），需要推理时返回 None
+        """
+        if not self.keyframes.enabled or self.current_state != 'Normal':
+            return None
+        
+        predicted = self.keyframes.predict(self.clock())
+        if predicted is None:
+            return None
+        
+        geometry = compute_geometry(predicted, self.adaptive_head_multiplier, self.adaptive_face_multiplier)
+        near_head = geometry['nearest_hand'] < geometry['head_zone'] * (1 + self.keyframes.zone_margin)
+        if near_head or geometry['distance'] < OUT_OF_ZONE_DISTANCE or self.motion_gate.head_moved():
+            self.keyframes.force()
+            return None
+        return predicted
+    
+    def observe_keyframe(self, points):
+        """
+        记录关键帧的推理结果（更新运动模型和关键帧间隔）
+        
+        Args:
+            points: (33, 3) 推理得到的关键点（已镜像），未检测到人体时为 None
+        """
+        if self.keyframes.enabled:
+            self.keyframes.observe(points, self.clock())
+    
+    def _record_behavior(self, behavior, trigger_count):
+        """本帧触发时把当前片段的行为计入统计"""
+        if self.trigger_count > trigger_count:
+            self.hand_stage.record_trigger()
+        return behavior
+    
+    def analyze_points(self, points):
+        """
+        根据关键点数组更新检测状态（不调用 MediaPipe，离线回放关键点数据时直接使用）
+        
+        Args:
+            points: (33, 3) 关键点数组（已镜像），未检测到人体时为 None
             
-            # 计算手头距离
-            current_distance = self._calculate_hand_head_distance(landmarks)
+        Returns:
+            stats: 统计信息字典（包含平滑后的距离和状态）
+        """
+        if points is not None:
+            # 关键点时间滤波
+            points = self.landmark_filter(points, self.clock())
             
-            # 添加到历史记录
-            self.distance_history.append(current_distance)
+            # 计算手头距离
+            current_distance = self._calculate_hand_head_distance(points)
+            self.last_distance = current_distance
             
             # 使用平滑后的距离
-            smoothed_distance = np.mean(list(self.distance_history))
+            smoothed_distance = self._smooth_distance(current_distance)
             
             # 更新挠头状态
             self._update_scratch_state(smoothed_distance)
-            
-            # 绘制骨骼关键点
-            if self.show_skeleton:
-                self._draw_skeleton(processed_frame, results.pose_landmarks)
-                # 绘制检测区域（调试用，显示绿色头部区域和红色脸部排除区域）
-                self._draw_detection_zones(processed_frame, landmarks)
-            
-            # 使用平滑距离进行显示
-            display_distance = smoothed_distance
         else:
             # 没有检测到人体
-            display_distance = None
+            smoothed_distance = None
+            self.last_distance = None
+            self.hand_proximity = None
+            self.landmark_filter.reset()
             self._reset_state()
         
         # 更新FPS
         self._update_fps()
         
-        # 绘制信息面板
-        self._draw_info_panel(processed_frame, display_distance)
-        
-        # 🎨 应用美颜滤镜
-        if self.enable_beauty_filter:
-            processed_frame = self._apply_beauty_filter(processed_frame)
-        
         # 返回统计信息
-        stats = {
+        return {
             'state': self.current_state,
-            'distance': display_distance,
+            'distance': smoothed_distance,
             'duration': self.scratch_duration,
             'trigger_count': self.trigger_count,
-            'fps': self.fps
+            'fps': self.fps,
+            'hand_proximity': self.hand_proximity,
+            'model_complexity': self.pose.complexity
         }
-        
-        return processed_frame, stats
     
-    def _calculate_hand_head_distance(self, landmarks):
+    def render(self, frame, pose_landmarks, stats):
         """
-        改进的距离计算：检测挠头和摸脸行为 + 自适应检测区域
-        
-        逻辑：
-        1. 根据肩宽自适应调整检测区域大小
-        2. 如果手在头部区域（大范围）内 → 可能是挠头
-        3. 如果手在脸部中心区域（小范围）内 → 摸脸行为（也会触发 Warning）
-        4. 返回最小距离（挠头或摸脸，取较小值）
+        渲染可视化画面（仅在有调试窗口或需要截图时调用）
         
         Args:
-            landmarks: MediaPipe检测到的关键点列表
+            frame: 输入的BGR图像（摄像头原始画面）
+            pose_landmarks: analyze() 返回的关键点
+            stats: analyze() 返回的统计信息
             
         Returns:
-            float: 最小距离（归一化坐标）
+            processed_frame: 处理后的图像（带可视化）
         """
-        # 关键点
-        nose = landmarks[0]
-        left_eye = landmarks[2]
-        right_eye = landmarks[5]
-        left_ear = landmarks[7]
-        right_ear = landmarks[8]
-        left_shoulder = landmarks[11]   # 左肩
-        right_shoulder = landmarks[12]  # 右肩
-        
-        # === 自适应逻辑：根据肩宽计算检测区域 ===
-        # 计算肩宽（人在画面中的大小指标）
-        shoulder_width = math.sqrt(
-            (right_shoulder.x - left_shoulder.x) ** 2 + 
-            (right_shoulder.y - left_shoulder.y) ** 2
-        )
+        # 镜像翻转画面（左右翻转，体验更自然；写入另一块缓冲区，不修改原始帧）
+        with self.perf.measure('flip'):
+            processed_frame = cv2.flip(frame, 1, dst=self.render_slots.next(frame.shape))
+        
+        with self.perf.measure('draw'):
+            if pose_landmarks and self.show_skeleton:
+                # 绘制骨骼关键点
+                self._draw_skeleton(processed_frame, pose_landmarks)
+                # 绘制检测区域（调试用，显示绿色头部区域和红色脸部排除区域）
+                self._draw_detection_zones(processed_frame, pose_landmarks.landmark)
+                # 手部细分的指尖和行为
+                self._draw_hand_stage(processed_frame, stats.get('behavior'))
+            
+            # 绘制信息面板
+            self._draw_info_panel(processed_frame, stats['distance'])
         
-        # 自适应调整头部区域半径
-        # 距离近 → 人大 → 肩宽大 → 检测圆圈大
-        # 距离远 → 人小 → 肩宽小 → 检测圆圈小
-        adaptive_head_zone = shoulder_width * self.adaptive_head_multiplier
+        # 🎨 应用美颜滤镜
+        if self.enable_beauty_filter:
+            with self.perf.measure('beauty'):
+                processed_frame = self._apply_beauty_filter(processed_frame, pose_landmarks)
         
-        # 设置合理的上下限（避免极端值）
-        adaptive_head_zone = max(0.20, min(adaptive_head_zone, 0.60))
+        return processed_frame
+    
+    def _detect_pose(self, frame):
+        """
+        执行姿态检测
         
-        # 自适应调整脸部区域半径（新增）
-        adaptive_face_zone = shoulder_width * self.adaptive_face_multiplier
+        ROI 跟踪模式下先在上一帧的上半身区域内检测，关键点映射回全帧归一化坐标；
+        跟踪丢失时在同一帧上回退到全帧搜索
         
-        # 脸部区域限制（确保不会过大或过小）
-        adaptive_face_zone = max(0.12, min(adaptive_face_zone, 0.25))
+        Args:
+            frame: 输入的BGR图像（摄像头原始画面）
+            
+        Returns:
+            pose_landmarks: 全帧归一化坐标的关键点（未镜像），未检测到时为 None
+        """
+        pose_landmarks = None
+        self.last_roi = None
         
-        # 确保脸部区域 < 头部区域（保持逻辑清晰）
-        adaptive_face_zone = min(adaptive_face_zone, adaptive_head_zone * 0.7)
+        if self.roi_tracking and self.tracking_roi is not None:
+            pose_landmarks = self._detect_pose_in_roi(frame, self.tracking_roi)
+            if pose_landmarks:
+                self.last_roi = self.tracking_roi
         
-        # 更新当前自适应半径（用于显示）
-        self.adaptive_head_zone = adaptive_head_zone
-        self.adaptive_face_zone = adaptive_face_zone
+        if pose_landmarks is None:
+            # 全帧搜索（非跟踪模式，或跟踪丢失）
+            with self.perf.measure('cvtcolor'):
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.buffers.get('rgb', frame.shape))
+            pose_landmarks = self.pose.process(rgb_frame)
         
-        # 头部中心（使用眼睛和耳朵，更准确）
-        head_center_x = (left_eye.x + right_eye.x + left_ear.x + right_ear.x) / 4
-        head_center_y = (left_eye.y + right_eye.y + left_ear.y + right_ear.y) / 4
+        if self.roi_tracking:
+            self.tracking_roi = self._compute_roi(pose_landmarks, frame.shape) if pose_landmarks else None
         
-        # 鼻子位置（脸部中心）
-        nose_x = nose.x
-        nose_y = nose.y
+        return pose_landmarks
+    
+    def _detect_pose_in_roi(self, frame, roi):
+        """
+        在裁剪区域内做姿态检测
         
-        # 手部关键点索引
-        left_wrist = landmarks[15]
-        right_wrist = landmarks[16]
-        left_index = landmarks[19]
-        right_index = landmarks[20]
+        Args:
+            frame: 输入的BGR图像
+            roi: 裁剪区域 (x0, y0, x1, y1)，像素坐标
+            
+        Returns:
+            pose_landmarks: 映射回全帧归一化坐标的关键点，未检测到时为 None
+        """
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = roi
+        crop = frame[y0:y1, x0:x1]
+        
+        # 裁剪区域过大时缩小（坐标是归一化的，缩放不影响映射）
+        crop_h, crop_w = crop.shape[:2]
+        scale = self.roi_max_size / max(crop_w, crop_h)
+        if scale < 1.0:
+            size = (int(crop_w * scale), int(crop_h * scale))
+            with self.perf.measure('roi_resize'):
+                crop = cv2.resize(crop, size, dst=self.buffers.get('roi', (size[1], size[0], 3)),
+                                  interpolation=cv2.INTER_AREA)
+        
+        with self.perf.measure('cvtcolor'):
+            rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self.buffers.get('roi_rgb', crop.shape))
+        pose_landmarks = self.pose.process(rgb_crop, roi=True)
+        if not pose_landmarks:
+            return None
+        
+        # 裁剪区域归一化坐标 → 全帧归一化坐标（z 与 x 同尺度，按裁剪宽度与全帧宽度之比缩放）
+        for landmark in pose_landmarks.landmark:
+            landmark.x = (x0 + landmark.x * crop_w) / w
+            landmark.y = (y0 + landmark.y * crop_h) / h
+            landmark.z = landmark.z * crop_w / w
+        
+        return pose_landmarks
+    
+    def _compute_roi(self, pose_landmarks, frame_shape):
+        """
+        根据头部、肩膀和手部关键点（0-20）计算下一帧的裁剪区域
         
-        hands = [left_wrist, right_wrist, left_index, right_index]
+        Args:
+            pose_landmarks: 全帧归一化坐标的关键点
+            frame_shape: 画面尺寸
+            
+        Returns:
+            tuple: (x0, y0, x1, y1) 像素坐标；区域接近全帧时返回 None（直接全帧检测）
+        """
+        h, w = frame_shape[:2]
+        upper_body = pose_landmarks.landmark[:21]
+        xs = [landmark.x for landmark in upper_body]
+        ys = [landmark.y for landmark in upper_body]
+        
+        # 包围框外扩（手可能快速抬到头顶，留足余量）
+        box_w = max(xs) - min(xs)
+        box_h = max(ys) - min(ys)
+        pad = max(box_w, box_h) * self.roi_padding
+        
+        x0 = int(max(0.0, min(xs) - pad) * w)
+        y0 = int(max(0.0, min(ys) - pad) * h)
+        x1 = int(min(1.0, max(xs) + pad) * w)
+        y1 = int(min(1.0, max(ys) + pad) * h)
+        
+        # 区域太小（异常）或接近全帧（裁剪没有收益）时不跟踪
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return None
+        if (x1 - x0) * (y1 - y0) > 0.8 * w * h:
+            return None
+        
+        return (x0, y0, x1, y1)
+    
+    def _mirror_landmarks(self, pose_landmarks):
+        """
+        镜像关键点的 x 坐标（原地修改）
         
-        # 使用自适应的检测区域（而不是固定值）
-        head_zone_radius = adaptive_head_zone
-        face_zone_radius = adaptive_face_zone
+        左右标签不做交换：距离计算和绘制对左右手/左右耳都是对称处理的
         
-        min_distance = 999.0  # 默认大值，表示不在检测区域
+        Args:
+            pose_landmarks: MediaPipe检测到的关键点
+        """
+        for landmark in pose_landmarks.landmark:
+            landmark.x = 1.0 - landmark.x
+    
+    def _smooth_distance(self, distance):
+        """
+        距离滑动平均（最近 smoothing_frames 帧）
         
-        for hand in hands:
-            # 计算手到头部中心的距离
-            dist_to_head = math.sqrt(
-                (hand.x - head_center_x) ** 2 + 
-                (hand.y - head_center_y) ** 2
-            )
-            
-            # 计算手到鼻子的距离
-            dist_to_nose = math.sqrt(
-                (hand.x - nose_x) ** 2 + 
-                (hand.y - nose_y) ** 2
-            )
+        Args:
+            distance: 本帧距离
             
-            # 判断逻辑（自适应双区域检测）：
-            # 1. 挠头：手在头部区域内且不在脸部区域 → 检测挠头顶、后脑勺、侧面
-            if dist_to_head < head_zone_radius and dist_to_nose > face_zone_radius:
-                min_distance = min(min_distance, dist_to_head)
+        Returns:
+            float: 平滑后的距离
+        """
+        if len(self.distance_history) == self.distance_history.maxlen:
+            self.distance_sum -= self.distance_history[0]
+        self.distance_history.append(distance)
+        self.distance_sum += distance
+        return self.distance_sum / len(self.distance_history)
+    
+    def _calculate_hand_head_distance(self, points):
+        """
+        改进的距离计算：检测挠头和摸脸行为 + 自适应检测区域
+        
+        逻辑：
+        1. 根据肩宽自适应调整检测区域大小
+        2. 如果手在头部区域（大范围）内 → 可能是挠头
+        3. 如果手在脸部中心区域（小范围）内 → 摸脸行为（也会触发 Warning）
+        4. 返回最小距离（挠头或摸脸，取较小值）
+        
+        具体计算由 geometry.compute_geometry 向量化完成
+        
+        Args:
+            points: (33, 3) 关键点数组
             
-            # 2. 摸脸：手在脸部区域内 → 检测摸眼睛、鼻子、嘴巴等行为
-            elif dist_to_nose <= face_zone_radius:
-                min_distance = min(min_distance, dist_to_nose)
+        Returns:
+            float: 最小距离（归一化坐标）
+        """
+        geometry = compute_geometry(
+            points,
+            self.adaptive_head_multiplier,
+            self.adaptive_face_multiplier
+        )
+        
+        # 保存本帧几何结果（绘制检测区域时复用，不再重复计算头部中心）
+        self.geometry = geometry
         
-        return min_distance
+        # 更新当前自适应半径（用于显示）
+        self.adaptive_head_zone = float(geometry['head_zone'])
+        self.adaptive_face_zone = float(geometry['face_zone'])
+        
+        self.hand_proximity = float(geometry['nearest_hand']) / self.adaptive_head_zone
+        
+        return float(geometry['distance'])
     
     def _update_scratch_state(self, distance):
         """
@@ -242,7 +487,7 @@ class HeadScratchDetector:
         Args:
             distance: 手部到头部的距离
         """
-        current_time = time.time()
+        current_time = self.clock()
         
         if distance < self.distance_threshold:
             # 手部接近头部
@@ -322,21 +567,16 @@ class HeadScratchDetector:
         h, w, _ = frame.shape
         
         # 获取关键点
-        nose = landmarks[0]
-        left_eye = landmarks[2]
-        right_eye = landmarks[5]
-        left_ear = landmarks[7]
-        right_ear = landmarks[8]
         left_shoulder = landmarks[11]
         right_shoulder = landmarks[12]
         
-        # 头部中心
-        head_x = int(((left_eye.x + right_eye.x + left_ear.x + right_ear.x) / 4) * w)
-        head_y = int(((left_eye.y + right_eye.y + left_ear.y + right_ear.y) / 4) * h)
-        
-        # 鼻子位置
-        nose_x = int(nose.x * w)
-        nose_y = int(nose.y * h)
+        # 头部中心和鼻子位置（复用距离计算时的结果）
+        head_center = self.geometry['head_center']
+        nose = self.geometry['nose']
+        head_x = int(head_center[0] * w)
+        head_y = int(head_center[1] * h)
+        nose_x = int(nose[0] * w)
+        nose_y = int(nose[1] * h)
         
         # 绘制肩膀连线（用于显示自适应基准）
         left_shoulder_x = int(left_shoulder.x * w)
@@ -353,7 +593,7 @@ class HeadScratchDetector:
         
         # 显示自适应半径值
         adaptive_text = f"Adaptive: {self.adaptive_head_zone:.2f}"
-        cv2.putText(frame, adaptive_text, (head_x - 60, head_y - head_radius - 10), 
+        self.overlay.put_text(frame, adaptive_text, (head_x - 60, head_y - head_radius - 10), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
         # 绘制自适应的脸部检测区域（橙色圆圈，与头部绿色区分）
@@ -362,8 +602,32 @@ class HeadScratchDetector:
         
         # 显示自适应脸部半径值
         face_text = f"Face: {self.adaptive_face_zone:.2f}"
-        cv2.putText(frame, face_text, (nose_x - 40, nose_y + face_radius + 20), 
+        self.overlay.put_text(frame, face_text, (nose_x - 40, nose_y + face_radius + 20), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 1)
+        
+        # 绘制 ROI 跟踪区域（灰色框，画面已镜像，x 坐标需要翻转）
+        if self.last_roi is not None:
+            x0, y0, x1, y1 = self.last_roi
+            cv2.rectangle(frame, (w - x1, y0), (w - x0, y1), (200, 200, 200), 1)
+    
+    def _draw_hand_stage(self, frame, behavior):
+        """
+        绘制手部细分阶段的指尖位置和当前行为
+        
+        Args:
+            frame: 要绘制的图像（已镜像）
+            behavior: 当前片段的行为
+        """
+        hand_points = self.hand_stage.hand_points
+        if hand_points is None:
+            return
+        h, w = frame.shape[:2]
+        for x, y, _ in hand_points:
+            cv2.circle(frame, (int(x * w), int(y * h)), 3, (255, 0, 255), -1)
+        if behavior is not None:
+            x, y = hand_points[0, :2]
+            self.overlay.put_text(frame, behavior, (int(x * w) + 10, int(y * h) + 20),
+                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
     
     def _draw_info_panel(self, frame, distance):
         """
@@ -380,10 +644,8 @@ class HeadScratchDetector:
             "Detected": (0, 0, 255)     # Red
         }
         
-        # 半透明背景（增大高度以容纳新的 Zone 信息）
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (5, 5), (300, 240), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.5, frame, 0.5, 0, frame)
+        # 半透明背景（增大高度以容纳新的 Zone 信息；只混合面板区域）
+        self.overlay.blend_rect(frame, (5, 5), (300, 240), (0, 0, 0), 0.5)
         
         # 文字参数
         font = cv2.FONT_HERSHEY_SIMPLEX
@@ -398,52 +660,122 @@ class HeadScratchDetector:
         
         # 显示信息（去掉emoji，用文字和彩色圆点）
         status_text = f"Status: {self.current_state}"
-        cv2.putText(frame, status_text, (x, y), font, font_scale, color, thickness)
+        self.overlay.put_text(frame, status_text, (x, y), font, font_scale, color, thickness)
         # 在文字右侧画一个彩色圆点作为状态指示器
         cv2.circle(frame, (x + 220, y - 7), 10, color, -1)
         
         if distance is not None:
-            cv2.putText(frame, f"Distance: {distance:.3f}", 
+            self.overlay.put_text(frame, f"Distance: {distance:.3f}", 
                         (x, y + line_height), font, font_scale, (255, 255, 255), thickness)
         else:
-            cv2.putText(frame, "Distance: N/A", 
+            self.overlay.put_text(frame, "Distance: N/A", 
                         (x, y + line_height), font, font_scale, (128, 128, 128), thickness)
         
-        cv2.putText(frame, f"Duration: {self.scratch_duration:.1f}s", 
+        self.overlay.put_text(frame, f"Duration: {self.scratch_duration:.1f}s", 
                     (x, y + line_height * 2), font, font_scale, (255, 255, 255), thickness)
         
-        cv2.putText(frame, f"Triggers: {self.trigger_count}", 
+        self.overlay.put_text(frame, f"Triggers: {self.trigger_count}", 
                     (x, y + line_height * 3), font, font_scale, (255, 255, 255), thickness)
         
         # 显示自适应半径（用黄色显示头部，橙色显示脸部）
-        cv2.putText(frame, f"Head: {self.adaptive_head_zone:.2f}", 
+        self.overlay.put_text(frame, f"Head: {self.adaptive_head_zone:.2f}", 
                     (x, y + line_height * 4), font, font_scale, (0, 255, 255), thickness)
-        cv2.putText(frame, f"Face: {self.adaptive_face_zone:.2f}", 
+        self.overlay.put_text(frame, f"Face: {self.adaptive_face_zone:.2f}", 
                     (x, y + line_height * 5), font, font_scale, (0, 165, 255), thickness)
         
-        cv2.putText(frame, f"FPS: {self.fps:.1f}", 
+        self.overlay.put_text(frame, f"FPS: {self.fps:.1f}", 
                     (x, y + line_height * 6), font, font_scale, (255, 255, 255), thickness)
         
         # 底部提示
         h = frame.shape[0]
-        cv2.putText(frame, "Press ESC to exit | Press R to reset counter", 
+        self.overlay.put_text(frame, "Press ESC to exit | Press R to reset counter", 
                     (10, h - 10), font, 0.5, (200, 200, 200), 1)
     
     def _update_fps(self):
         """更新FPS计数"""
         self.frame_count += 1
-        elapsed = time.time() - self.fps_start_time
+        elapsed = self.clock() - self.fps_start_time
         
         if elapsed > 1.0:  # 每秒更新一次
             self.fps = self.frame_count / elapsed
             self.frame_count = 0
-            self.fps_start_time = time.time()
+            self.fps_start_time = self.clock()
     
     def reset_counter(self):
         """重置触发计数器"""
         self.trigger_count = 0
-        print("✅ 计数器已重置")
-    
+        # stdout 是事件通道，提示信息只能写 stderr
+        print("✅ 计数器已重置", file=sys.stderr)
+
+    def configure(self, detection=None, display=None):
+        """
+        运行中修改检测和显示参数（在两帧之间调用，不重建模型）
+
+        先校验全部参数，任何一个不合法时都不修改
+
+        Args:
+            detection: detection 配置中要修改的项（distance_threshold、time_threshold、smoothing_frames、
+                       landmark_filter）
+            display: display 配置中要修改的项（show_skeleton、show_distance、beauty_filter、beauty_quality）
+
+        Returns:
+            dict: 实际生效的参数 {"detection": {...}, "display": {...}}
+
+        Raises:
+            ValueError: 未知的参数或取值不合法
+        """
+        detection = dict(detection or {})
+        display = dict(display or {})
+
+        # 校验并转换
+        updates = {}
+        for key, value in detection.items():
+            if key in ('distance_threshold', 'time_threshold'):
+                value = float(value)
+                if value < 0:
+                    raise ValueError(f"{key} 不能为负数")
+            elif key == 'smoothing_frames':
+                value = int(value)
+                if value < 1:
+                    raise ValueError("smoothing_frames 至少为 1")
+            elif key == 'landmark_filter':
+                updates['landmark_filter_instance'] = create_filter(value)
+            else:
+                raise ValueError(f"未知的检测参数: {key}")
+            detection[key] = value
+        for key, value in display.items():
+            if key in ('show_skeleton', 'show_distance', 'beauty_filter'):
+                # 只接受 JSON 的 true / false（bool("false") 为 True）
+                if not isinstance(value, bool):
+                    raise ValueError(f"{key} 必须是 true 或 false")
+            elif key == 'beauty_quality':
+                updates['beauty_filter_instance'] = BeautyFilter(value)
+            else:
+                raise ValueError(f"未知的显示参数: {key}")
+            display[key] = value
+
+        # 应用
+        for key in ('distance_threshold', 'time_threshold'):
+            if key in detection:
+                setattr(self, key, detection[key])
+        if 'smoothing_frames' in detection:
+            self.smoothing_frames = detection['smoothing_frames']
+            self.distance_history = deque(self.distance_history, maxlen=self.smoothing_frames)
+            self.distance_sum = float(sum(self.distance_history))
+        if 'landmark_filter_instance' in updates:
+            self.landmark_filter = updates['landmark_filter_instance']
+
+        if 'show_skeleton' in display:
+            self.show_skeleton = display['show_skeleton']
+        if 'show_distance' in display:
+            self.show_distance = display['show_distance']
+        if 'beauty_filter' in display:
+            self.enable_beauty_filter = display['beauty_filter']
+        if 'beauty_filter_instance' in updates:
+            self.beauty_filter = updates['beauty_filter_instance']
+
+        return {'detection': detection, 'display': display}
+
     def get_stats(self):
         """
         获取统计信息
@@ -458,32 +790,57 @@ class HeadScratchDetector:
             'fps': self.fps
         }
     
-    def _apply_beauty_filter(self, frame):
+    def _apply_beauty_filter(self, frame, pose_landmarks=None):
         """
         应用简单美颜滤镜
         
-        效果：磨皮 + 美白 + 增加饱和度
+        效果：磨皮 + 美白 + 增加饱和度（具体实现由 beauty_quality 档位决定）
         
         Args:
-            frame: 输入图像
+            frame: 输入图像（已镜像，可原地修改）
+            pose_landmarks: 镜像后的关键点，用于确定脸部磨皮区域
             
         Returns:
             美颜后的图像
         """
-        # 1. 双边滤波 - 磨皮效果（保留边缘的同时平滑皮肤）
-        smoothed = cv2.bilateralFilter(frame, 9, 75, 75)
-        
-        # 2. 美白提亮（alpha=1.15 提高对比度，beta=20 增加亮度 - 更白）
-        brightened = cv2.convertScaleAbs(smoothed, alpha=1.15, beta=20)
-        
-        # 3. 增加饱和度
-        hsv = cv2.cvtColor(brightened, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.2, 0, 255).astype(np.uint8)
-        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        face_box = None
+        if pose_landmarks:
+            face_box = face_box_from_landmarks(pose_landmarks.landmark, frame.shape)
+        return self.beauty_filter.apply(frame, face_box)
+    
+    def warmup(self, frame_shape):
+        """
+        预热姿态模型（首次推理包含图初始化，提前在空白画面上完成）
         
-        return result
+        Args:
+            frame_shape: 预计的画面尺寸 (h, w, 3)
+        """
+        # ROI 跟踪模式下同时预热裁剪画面使用的实例（裁剪区域的长边不超过 roi_max_size）
+        roi_shape = (self.roi_max_size, self.roi_max_size, 3) if self.roi_tracking else None
+        self.pose.warmup(frame_shape, roi_shape)
+        self.hand_stage.warmup()
+    
+    def reset(self):
+        """
+        清空跟踪和检测状态（常驻模式下暂停后重新开始时调用）
+        """
+        self.landmark_filter.reset()
+        self.distance_history.clear()
+        self.distance_sum = 0.0
+        self.hand_proximity = None
+        self.geometry = None
+        self.tracking_roi = None
+        self.last_roi = None
+        self.motion_gate.reset()
+        self.keyframes.reset()
+        self.hand_stage.reset()
+        self.last_pose_landmarks = None
+        self.last_points = None
+        self.last_distance = None
+        self._reset_state()
     
     def cleanup(self):
         """清理资源"""
         self.pose.close()
+        self.hand_stage.close()
 
@@ -0,0 +1,356 @@
+"""
+NoPickie - 证据保存
+触发时的截图和前后片段在后台线程中编码写盘，不占用推理/输出线程：
+
+- FrameRing:      最近一段时间的原始帧（按 clip_fps 抽帧，总内存有上限）
+- EvidenceWriter: 有界任务队列 + 写盘线程；触发后等到事后 post_seconds 的画面采集完，
+                  把 [触发前 pre_seconds, 触发后 post_seconds] 的帧编码成片段；
+                  截图目录超过磁盘配额时按时间从旧到新删除
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from perf import NULL_PERF
+
+
+# 由本模块写入、受配额管理的文件名前缀（用户自己放进目录的文件不会被删除）
+MANAGED_PREFIXES = ("screenshot_", "clip_")
+
+
+class FrameRing:
+    """
+    最近的原始帧环形缓冲（线程安全）
+
+    默认只保存帧的引用（采集到的每一帧都是新数组，不会被覆盖），按 min_interval 抽帧，
+    超过 max_seconds 或 max_bytes 时丢弃最旧的帧
+
+    采集缓冲区复用时（copy=True）帧会被下一次读入覆盖，改为复制到环形缓冲自己的数组里，
+    丢弃的旧数组留给下一帧复制使用；取出片段时返回副本
+    """
+
+    def __init__(self, max_seconds, max_bytes, fps, copy=False):
+        """
+        Args:
+            max_seconds: 保留的时长（秒）
+            max_bytes: 内存上限（字节）
+            fps: 抽帧帧率
+            copy: 是否复制帧（调用方会复用帧缓冲区时为 True）
+        """
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.copy = copy
+        self._frames = deque()  # (capture_time, frame)
+        self._bytes = 0
+        self._spare = None  # 复制模式下最近丢弃的数组（下一帧复用）
+        self._lock = threading.Lock()
+
+    @property
+    def latest_time(self):
+        """最新一帧的采集时间（没有帧时为 None）"""
+        with self._lock:
+            return self._frames[-1][0] if self._frames else None
+
+    def add(self, frame, capture_time):
+        """
+        加入一帧（距上一帧不足 min_interval 时跳过）
+
+        Args:
+            frame: 原始BGR图像
+            capture_time: 采集时间（time.monotonic()）
+        """
+        with self._lock:
+            if self._frames and capture_time - self._frames[-1][0] < self.min_interval:
+                return
+            if self.copy:
+                spare = self._spare
+                self._spare = None
+                if spare is None or spare.shape != frame.shape or spare.dtype != frame.dtype:
+                    spare = frame.copy()
+                else:
+                    np.copyto(spare, frame)
+                frame = spare
+            self._frames.append((capture_time, frame))
+            self._bytes += frame.nbytes
+
+            while self._frames and (self._bytes > self.max_bytes or
+                                    capture_time - self._frames[0][0] > self.max_seconds):
+                _, old = self._frames.popleft()
+                self._bytes -= old.nbytes
+                if self.copy:
+                    self._spare = old
+
+    def window(self, start, end):
+        """
+        取出时间范围内的帧
+
+        Returns:
+            list: [(capture_time, frame)]（复制模式下是副本，写盘期间环形缓冲可以继续复用原数组）
+        """
+        with self._lock:
+            if self.copy:
+                return [(t, f.copy()) for t, f in self._frames if start <= t <= end]
+            return [(t, f) for t, f in self._frames if start <= t <= end]
+
+
+class EvidenceWriter(threading.Thread):
+    """
+    证据写盘线程
+
+    所有写盘任务都通过有界队列交给本线程；队列满时丢弃任务并计数，绝不阻塞调用方
+    """
+
+    def __init__(self, directory, config, emit=None, perf=NULL_PERF, copy_frames=False):
+        """
+        Args:
+            directory: 截图目录
+            config: evidence 配置字典
+            emit: 片段写完后发送 clip_saved 事件的函数（可选）
+            perf: 各阶段耗时记录器
+            copy_frames: 调用方是否复用帧缓冲区（是则原始帧和截图都先复制再排队）
+        """
+        super().__init__(name="EvidenceWriter", daemon=True)
+        self.directory = Path(directory)
+        self.emit = emit
+        self.perf = perf
+
+        self.clips_enabled = config.get('clips', True)
+        self.pre_seconds = config.get('pre_seconds', 3.0)
+        self.post_seconds = config.get('post_seconds', 2.0)
+        self.clip_fps = config.get('clip_fps', 10)
+        self.clip_format = config.get('clip_format', 'avi')  # avi（MJPEG）或 jpg（图片序列）
+        self.jpeg_quality = config.get('jpeg_quality', 95)
+        self.max_disk_bytes = config.get('max_disk_mb', 500) * 1024 * 1024
+
+        self.copy_frames = copy_frames
+        self.ring = FrameRing(
+            self.pre_seconds + self.post_seconds + 1.0,
+            config.get('ring_memory_mb', 128) * 1024 * 1024,
+            self.clip_fps,
+            copy=copy_frames
+        )
+
+        self._jobs = queue.Queue(maxsize=config.get('queue_size', 8))
+        self._pending_clips = []  # (触发时间, 片段路径)，只在写盘线程中访问
+        self._running = True
+        self._used_bytes = self._scan_usage()
+
+        # 统计信息
+        self.saved = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def add_frame(self, frame, capture_time):
+        """
+        记录原始帧（在推理线程中调用，复用缓冲区时复制，否则只保存引用）
+
+        Args:
+            frame: 原始BGR图像
+            capture_time: 采集时间（time.monotonic()）
+        """
+        if self.clips_enabled:
+            self.ring.add(frame, capture_time)
+
+    def save_image(self, path, frame):
+        """
+        异步保存截图
+
+        Args:
+            path: 文件路径
+            frame: 渲染后的图像（copy_frames=False 时调用方之后不能再修改）
+
+        Returns:
+            bool: 是否已加入队列
+        """
+        if self.copy_frames:
+            frame = frame.copy()
+        return self._submit(('image', path, frame))
+
+    def capture_clip(self, trigger_time, stem):
+        """
+        记录一次触发，事后帧采集完成后保存片段
+
+        Args:
+            trigger_time: 触发帧的采集时间（time.monotonic()）
+            stem: 文件名（不含扩展名）
+
+        Returns:
+            str: 片段路径（写完后才存在），未启用片段时为 None
+        """
+        if not self.clips_enabled:
+            return None
+        path = self.directory / (stem if self.clip_format == 'jpg' else f"{stem}.avi")
+        self._submit(('clip', trigger_time, path))
+        return str(path)
+
+    def stop(self, timeout=2.0):
+        """停止线程（尽量写完队列中已有的任务）"""
+        self._running = False
+        self.join(timeout)
+
+    def snapshot(self):
+        """
+        获取写盘统计
+
+        Returns:
+            dict: 已保存、丢弃、配额删除的文件数，以及目录占用
+        """
+        return {
+            'saved': self.saved,
+            'dropped': self.dropped,
+            'evicted': self.evicted,
+            'queued': self._jobs.qsize(),
+            'disk_mb': round(self._used_bytes / 1024 / 1024, 1)
+        }
+
+    def _submit(self, job):
+        try:
+            self._jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def run(self):
+        while self._running or not self._jobs.empty():
+            try:
+                job = self._jobs.get(timeout=0.1)
+            except queue.Empty:
+                job = None
+
+            try:
+                if job is not None and job[0] == 'image':
+                    self._write_image(job[1], job[2])
+                elif job is not None and job[0] == 'clip':
+                    self._pending_clips.append(job[1:])
+                self._flush_clips(force=not self._running)
+            except Exception as e:
+                print(f"⚠️ 证据保存失败: {e}", file=sys.stderr)
+
+        self._flush_clips(force=True)
+
+    def _flush_clips(self, force=False):
+        """事后画面已经采集够（或强制）时编码片段"""
+        if not self._pending_clips:
+            return
+
+        latest = self.ring.latest_time
+        now = time.monotonic()
+        remaining = []
+        for trigger_time, path in self._pending_clips:
+            end = trigger_time + self.post_seconds
+            # 画面停了（例如摄像头断开）时最多再等 post_seconds
+            if force or (latest is not None and latest >= end) or now >= end + self.post_seconds:
+                self._write_clip(path, self.ring.window(trigger_time - self.pre_seconds, end))
+            else:
+                remaining.append((trigger_time, path))
+        self._pending_clips = remaining
+
+    def _write_image(self, path, frame):
+        with self.perf.measure('evidence_image'):
+            cv2.imwrite(str(path), frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        print(f"📸 截图已保存: {path}", file=sys.stderr)
+        self._account(path)
+
+    def _write_clip(self, path, frames):
+        """编码片段（原始帧在这里才做镜像翻转，与截图方向一致）"""
+        if not frames:
+            return
+
+        with self.perf.measure('evidence_clip'):
+            if self.clip_format == 'jpg':
+                path.mkdir(parents=True, exist_ok=True)
+                for i, (_, frame) in enumerate(frames):
+                    frame_path = path / f"{i:04d}.jpg"
+                    cv2.imwrite(str(frame_path), cv2.flip(frame, 1),
+                                [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    self._account(frame_path)
+            else:
+                h, w = frames[0][1].shape[:2]
+                writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'),
+                                         self.clip_fps, (w, h))
+                try:
+                    for _, frame in frames:
+                        writer.write(cv2.flip(frame, 1))
+                finally:
+                    writer.release()
+                self._account(path)
+
+        duration = frames[-1][0] - frames[0][0]
+        print(f"🎞 片段已保存: {path}（{len(frames)} 帧，{duration:.1f} 秒）", file=sys.stderr)
+        if self.emit is not None:
+            self.emit("clip_saved", {
+                "clip": str(path),
+                "frames": len(frames),
+                "duration": round(duration, 2)
+            })
+
+    def _account(self, path):
+        """记录新文件的大小，超出配额时删除最旧的文件"""
+        self.saved += 1
+        try:
+            self._used_bytes += os.path.getsize(path)
+        except OSError:
+            return
+        if self._used_bytes > self.max_disk_bytes:
+            self._enforce_quota(keep=str(path))
+
+    def _managed_files(self):
+        """
+        目录中受配额管理的文件（图片序列目录里的帧也算在内）
+
+        Returns:
+            list: [(修改时间, 大小, 路径)]
+        """
+        files = []
+        if not self.directory.exists():
+            return files
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith(MANAGED_PREFIXES):
+                continue
+            if entry.is_dir():
+                for child in os.scandir(entry.path):
+                    if child.is_file():
+                        stat = child.stat()
+                        files.append((stat.st_mtime, stat.st_size, child.path))
+            elif entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _scan_usage(self):
+        return sum(size for _, size, _ in self._managed_files())
+
+    def _enforce_quota(self, keep=None):
+        """
+        按修改时间从旧到新删除，直到低于配额（刚写入的文件 keep 不删）
+
+        重新扫描目录而不是只依赖内存中的计数：多路模式下多个进程共用同一个目录
+        """
+        files = sorted(self._managed_files())
+        used = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if used <= self.max_disk_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+            self.evicted += 1
+            # 删空的图片序列目录
+            parent = os.path.dirname(path)
+            if parent != str(self.directory) and not os.listdir(parent):
+                os.rmdir(parent)
+        self._used_bytes = used
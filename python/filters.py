@@ -0,0 +1,214 @@
+"""
+NoPickie - 关键点时间滤波
+对整组关键点 (33, 3) 做逐帧平滑，每帧更新都是 O(1)：
+
+- none:           不滤波
+- moving_average: 滑动平均（环形缓冲 + 累加和）
+- ema:            指数滑动平均
+- one_euro:       One Euro 滤波（静止时强平滑，快速运动时低延迟）
+- kalman:         匀速模型卡尔曼滤波（每个坐标独立）
+"""
+
+import math
+
+import numpy as np
+
+
+class PassthroughFilter:
+    """不滤波"""
+
+    def __call__(self, points, t):
+        return points
+
+    def reset(self):
+        pass
+
+
+class MovingAverageFilter:
+    """滑动平均：环形缓冲区 + 累加和，每帧 O(1)"""
+
+    def __init__(self, window=5):
+        self.window = max(1, int(window))
+        self.reset()
+
+    def reset(self):
+        self._buffer = None
+        self._sum = None
+        self._index = 0
+        self._count = 0
+
+    def __call__(self, points, t):
+        if self._buffer is None:
+            self._buffer = np.zeros((self.window,) + points.shape)
+            self._sum = np.zeros(points.shape)
+
+        if self._count == self.window:
+            self._sum -= self._buffer[self._index]
+        else:
+            self._count += 1
+
+        self._buffer[self._index] = points
+        self._sum += points
+        self._index = (self._index + 1) % self.window
+
+        return self._sum / self._count
+
+
+class EmaFilter:
+    """指数滑动平均"""
+
+    def __init__(self, alpha=0.5):
+        """
+        Args:
+            alpha: 新数据权重（0-1，越大越跟手）
+        """
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def __call__(self, points, t):
+        if self._value is None:
+            self._value = points.copy()
+        else:
+            self._value += self.alpha * (points - self._value)
+        return self._value.copy()
+
+
+def _smoothing_factor(dt, cutoff):
+    """One Euro 滤波的平滑系数"""
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """
+    One Euro 滤波（Casiez et al. 2012）
+
+    截止频率随速度自适应：静止时 min_cutoff 强平滑去抖，移动越快截止频率越高、延迟越小
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=5.0, d_cutoff=1.0):
+        """
+        Args:
+            min_cutoff: 最小截止频率（Hz），越小静止时越稳
+            beta: 速度系数（归一化坐标/秒），越大快速运动时越跟手
+            d_cutoff: 速度估计的截止频率（Hz）
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._derivative = None
+        self._last_t = None
+
+    def __call__(self, points, t):
+        if self._value is None:
+            self._value = points.copy()
+            self._derivative = np.zeros(points.shape)
+            self._last_t = t
+            return self._value.copy()
+
+        dt = t - self._last_t
+        if dt <= 0:
+            return self._value.copy()
+        self._last_t = t
+
+        # 速度估计（低通）
+        derivative = (points - self._value) / dt
+        self._derivative += _smoothing_factor(dt, self.d_cutoff) * (derivative - self._derivative)
+
+        # 根据速度调整截止频率，逐坐标计算平滑系数
+        cutoff = self.min_cutoff + self.beta * np.abs(self._derivative)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / dt)
+
+        self._value += alpha * (points - self._value)
+        return self._value.copy()
+
+
+class KalmanFilter:
+    """
+    匀速模型卡尔曼滤波：每个坐标一个 [位置, 速度] 状态，整组向量化更新
+
+    协方差矩阵是 2x2 对称阵，按 (p00, p01, p11) 三个数组保存
+    """
+
+    def __init__(self, process_noise=10.0, measurement_noise=1e-4):
+        """
+        Args:
+            process_noise: 加速度噪声方差（归一化坐标/秒²）
+            measurement_noise: 观测噪声方差（归一化坐标²）
+        """
+        self.q = process_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self._pos = None
+        self._last_t = None
+
+    def __call__(self, points, t):
+        if self._pos is None:
+            self._pos = points.copy()
+            self._vel = np.zeros(points.shape)
+            self._p00 = np.full(points.shape, self.r)
+            self._p01 = np.zeros(points.shape)
+            self._p11 = np.full(points.shape, 1.0)
+            self._last_t = t
+            return self._pos.copy()
+
+        dt = t - self._last_t
+        if dt <= 0:
+            return self._pos.copy()
+        self._last_t = t
+
+        # 预测：x = F x，P = F P F' + Q
+        self._pos += self._vel * dt
+        p00 = self._p00 + dt * (2 * self._p01 + dt * self._p11) + self.q * dt ** 4 / 4
+        p01 = self._p01 + dt * self._p11 + self.q * dt ** 3 / 2
+        p11 = self._p11 + self.q * dt ** 2
+
+        # 更新（只观测位置）
+        s = p00 + self.r
+        k0 = p00 / s
+        k1 = p01 / s
+        innovation = points - self._pos
+        self._pos += k0 * innovation
+        self._vel += k1 * innovation
+
+        self._p00 = (1 - k0) * p00
+        self._p01 = (1 - k0) * p01
+        self._p11 = p11 - k1 * p01
+
+        return self._pos.copy()
+
+
+FILTERS = {
+    'none': PassthroughFilter,
+    'moving_average': MovingAverageFilter,
+    'ema': EmaFilter,
+    'one_euro': OneEuroFilter,
+    'kalman': KalmanFilter,
+}
+
+
+def create_filter(config):
+    """
+    根据配置创建关键点滤波器
+
+    Args:
+        config: {"type": "one_euro", ...其余为滤波器参数}
+
+    Returns:
+        滤波器实例：filter(points, t) → 平滑后的 points，filter.reset() 清空状态
+    """
+    params = dict(config or {})
+    filter_type = params.pop('type', 'none')
+    if filter_type not in FILTERS:
+        raise ValueError(f"未知的关键点滤波器: {filter_type}")
+    return FILTERS[filter_type](**params)
@@ -0,0 +1,261 @@
+"""
+NoPickie - 调试画面二进制通道
+在本机回环地址上提供 MJPEG 流（multipart/x-mixed-replace，每帧带 Content-Length），
+调试窗口用 <img src="http://127.0.0.1:端口/stream?token=..."> 直接显示，
+画面不再以 base64 形式塞进 stdout 上的 JSON 事件
+
+每次启动生成随机 token，只通过 stdout 事件（stream_url）交给宿主；
+本机其他进程或网页猜到端口也看不到摄像头画面（缺少或错误的 token 返回 403）
+"""
+
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from buffers import BufferPool
+from perf import NULL_PERF
+
+
+BOUNDARY = "nopickieframe"
+
+# 自适应画质档位：(宽度, JPEG 质量)，拥塞或编码太慢时降档
+QUALITY_LEVELS = [(960, 90), (800, 80), (640, 70), (480, 60)]
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    """单个订阅者的连接（每个连接一个线程）"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/stream':
+            self.send_error(404)
+            return
+
+        stream = self.server.frame_stream
+        token = parse_qs(url.query).get('token', [''])[0]
+        if not secrets.compare_digest(token.encode(), stream.token.encode()):
+            self.send_error(403)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache, no-store')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        client_id = stream._subscribe()
+        try:
+            seq = 0
+            while stream.running:
+                jpeg, seq = stream._wait_frame(seq, timeout=1.0)
+                if jpeg is None:
+                    continue
+                self.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode('ascii'))
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+                self.wfile.flush()
+                stream._delivered(client_id, seq)
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+        finally:
+            stream._unsubscribe(client_id)
+
+    def log_message(self, format, *args):
+        # 不输出每个请求的访问日志
+        pass
+
+
+class FrameStreamServer:
+    """
+    调试画面 MJPEG 服务
+
+    - 只有在有订阅者（调试窗口已连接）时才编码
+    - 与上一帧几乎相同的画面直接跳过
+    - 订阅者跟不上或编码太慢时自动降低分辨率/画质，恢复后逐步升档
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, perf=NULL_PERF,
+                 change_threshold=1.0, encode_budget=0.02, buffers=None):
+        """
+        Args:
+            host: 监听地址（只监听本机）
+            port: 端口，0 表示自动分配
+            perf: 各阶段耗时记录器
+            change_threshold: 画面变化阈值（缩略图平均灰度差），低于此值视为未变化
+            encode_budget: 单帧缩放+编码的耗时预算（秒），超出则降档
+            buffers: 缓冲池（缩略图和缩放画面，只在输出线程中使用），None 表示每帧分配
+        """
+        self.perf = perf
+        self.buffers = buffers or BufferPool(enabled=False)
+        self.change_threshold = change_threshold
+        self.encode_budget = encode_budget
+        self.running = False
+
+        self.token = secrets.token_urlsafe(24)  # 订阅地址中的访问凭证（每次启动不同）
+        self._server = ThreadingHTTPServer((host, port), _StreamHandler)
+        self._server.daemon_threads = True
+        self._server.frame_stream = self
+        self._thread = None
+
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._clients = {}  # client_id → 已发送的帧序号
+        self._next_client_id = 0
+
+        self._last_thumbnail = None
+        self.level = 0
+        self._clean_publishes = 0
+
+        # 统计信息
+        self.published = 0
+        self.skipped_unchanged = 0
+
+    @property
+    def address(self):
+        """监听地址（不含 token，用于日志）"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/stream"
+
+    @property
+    def url(self):
+        """订阅地址（带 token）"""
+        return f"{self.address}?token={self.token}"
+
+    @property
+    def subscribers(self):
+        """当前订阅者数量"""
+        return len(self._clients)
+
+    def start(self):
+        """启动服务线程"""
+        self.running = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="FrameStreamServer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止服务"""
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, frame, force=False):
+        """
+        发布一帧画面（在输出线程中调用）
+
+        Args:
+            frame: 渲染后的BGR图像
+            force: 即使画面没有变化也发送（例如状态变化时）
+
+        Returns:
+            bool: 是否实际编码并发送
+        """
+        if not self._clients:
+            return False
+
+        # 画面没有变化时跳过（比较小尺寸灰度缩略图）
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.buffers.get('stream_gray', frame.shape[:2]))
+        thumbnail = cv2.resize(gray, (32, 24), dst=self.buffers.get('stream_thumbnail', (24, 32)),
+                               interpolation=cv2.INTER_AREA).astype(np.int16)
+        if not force and self._last_thumbnail is not None:
+            if np.abs(thumbnail - self._last_thumbnail).mean() < self.change_threshold:
+                self.skipped_unchanged += 1
+                return False
+        self._last_thumbnail = thumbnail
+
+        # 有订阅者还没拿到上一帧 → 拥塞
+        with self._cond:
+            congested = any(seq < self._seq for seq in self._clients.values())
+
+        width, quality = QUALITY_LEVELS[self.level]
+        start = time.perf_counter()
+        h, w = frame.shape[:2]
+        if w > width:
+            size = (width, int(h * width / w))
+            frame = cv2.resize(frame, size, dst=self.buffers.get('stream_resized', (size[1], size[0], 3)),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        encode_time = time.perf_counter() - start
+        self.perf.add('stream_encode', encode_time)
+
+        if not ok:
+            return False
+
+        self._adapt(congested or encode_time > self.encode_budget)
+
+        with self._cond:
+            self._jpeg = buffer.tobytes()
+            self._seq += 1
+            self._cond.notify_all()
+
+        self.published += 1
+        return True
+
+    def _adapt(self, overloaded):
+        """根据拥塞情况调整画质档位"""
+        if overloaded:
+            self.level = min(self.level + 1, len(QUALITY_LEVELS) - 1)
+            self._clean_publishes = 0
+        else:
+            self._clean_publishes += 1
+            if self._clean_publishes >= 10 and self.level > 0:
+                self.level -= 1
+                self._clean_publishes = 0
+
+    def snapshot(self):
+        """
+        获取通道统计
+
+        Returns:
+            dict: 订阅者数量、档位、发送/跳过帧数
+        """
+        width, quality = QUALITY_LEVELS[self.level]
+        return {
+            'subscribers': self.subscribers,
+            'width': width,
+            'quality': quality,
+            'published': self.published,
+            'skipped_unchanged': self.skipped_unchanged
+        }
+
+    def _subscribe(self):
+        with self._cond:
+            client_id = self._next_client_id
+            self._next_client_id += 1
+            self._clients[client_id] = self._seq
+            # 下一帧强制编码，新订阅者不用等画面变化
+            self._last_thumbnail = None
+            return client_id
+
+    def _unsubscribe(self, client_id):
+        with self._cond:
+            self._clients.pop(client_id, None)
+
+    def _delivered(self, client_id, seq):
+        with self._cond:
+            if client_id in self._clients:
+                self._clients[client_id] = seq
+
+    def _wait_frame(self, seq, timeout):
+        """
+        等待比 seq 更新的帧
+
+        Returns:
+            (jpeg, 新序号)，超时返回 (None, seq)
+        """
+        with self._cond:
+            if self._seq <= seq and self.running:
+                self._cond.wait(timeout)
+            if self._seq <= seq or self._jpeg is None:
+                return None, seq
+            return self._jpeg, self._seq
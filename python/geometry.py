@@ -0,0 +1,121 @@
+"""
+NoPickie - 几何计算模块
+基于 NumPy 的向量化手-头距离计算，支持单帧和整批帧
+"""
+
+import numpy as np
+
+
+# MediaPipe Pose 关键点索引
+NOSE = 0
+LEFT_EYE = 2
+RIGHT_EYE = 5
+LEFT_EAR = 7
+RIGHT_EAR = 8
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+HAND_INDICES = [15, 16, 19, 20]  # 左手腕、右手腕、左食指、右食指
+
+NUM_LANDMARKS = 33
+
+# 自适应区域的上下限
+HEAD_ZONE_MIN = 0.20
+HEAD_ZONE_MAX = 0.60
+FACE_ZONE_MIN = 0.12
+FACE_ZONE_MAX = 0.25
+FACE_TO_HEAD_RATIO = 0.7  # 脸部区域最大为头部区域的 70%
+
+# 手不在任何检测区域时的距离
+OUT_OF_ZONE_DISTANCE = 999.0
+
+
+def landmarks_to_array(landmarks):
+    """
+    把 MediaPipe 关键点列表转换成 (33, 3) 数组
+
+    Args:
+        landmarks: MediaPipe检测到的关键点列表
+
+    Returns:
+        np.ndarray: 每行为 (x, y, z)
+    """
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float64)
+
+
+def compute_geometry(points, head_multiplier=1.2, face_multiplier=0.8):
+    """
+    向量化计算自适应检测区域和手-头距离
+
+    结果与逐点标量计算一致（差异仅在浮点舍入范围内）：
+    1. 根据肩宽自适应调整头部/脸部区域半径
+    2. 手在头部区域内且不在脸部区域 → 取到头部中心的距离（挠头）
+    3. 手在脸部区域内 → 取到鼻子的距离（摸脸）
+    4. 所有手部关键点取最小值，都不在区域内时为 999.0
+
+    Args:
+        points: 关键点数组，形状 (33, 3) 或 (N, 33, 3)
+        head_multiplier: 头部区域相对肩宽的倍数
+        face_multiplier: 脸部区域相对肩宽的倍数
+
+    Returns:
+        dict: 各项结果，单帧输入时为标量 / (4,) 数组，批量输入时多一个 N 维
+            - shoulder_width: 肩宽
+            - head_zone / face_zone: 自适应头部 / 脸部区域半径
+            - head_center / nose: 头部中心和鼻子坐标 (x, y)
+            - dist_to_head / dist_to_nose: 每个手部关键点到头部中心 / 鼻子的距离
+            - distance: 最小距离（与原标量算法相同的判定规则）
+            - nearest_hand: 最近的手到头部中心的距离（不论是否在区域内）
+    """
+    points = np.asarray(points, dtype=np.float64)
+    single = points.ndim == 2
+    if single:
+        points = points[np.newaxis]
+
+    xy = points[:, :, :2]
+
+    # 肩宽（人在画面中的大小指标）
+    shoulder_delta = xy[:, RIGHT_SHOULDER] - xy[:, LEFT_SHOULDER]
+    shoulder_width = np.sqrt(shoulder_delta[:, 0] ** 2 + shoulder_delta[:, 1] ** 2)
+
+    # 自适应区域半径
+    head_zone = np.clip(shoulder_width * head_multiplier, HEAD_ZONE_MIN, HEAD_ZONE_MAX)
+    face_zone = np.clip(shoulder_width * face_multiplier, FACE_ZONE_MIN, FACE_ZONE_MAX)
+    face_zone = np.minimum(face_zone, head_zone * FACE_TO_HEAD_RATIO)
+
+    # 头部中心（眼睛和耳朵的平均，保持与标量代码相同的求和顺序）
+    head_center = (xy[:, LEFT_EYE] + xy[:, RIGHT_EYE] + xy[:, LEFT_EAR] + xy[:, RIGHT_EAR]) / 4
+    nose = xy[:, NOSE]
+
+    # 每个手部关键点到头部中心 / 鼻子的距离，形状 (N, 4)
+    hands = xy[:, HAND_INDICES]
+    to_head = hands - head_center[:, np.newaxis]
+    to_nose = hands - nose[:, np.newaxis]
+    dist_to_head = np.sqrt(to_head[..., 0] ** 2 + to_head[..., 1] ** 2)
+    dist_to_nose = np.sqrt(to_nose[..., 0] ** 2 + to_nose[..., 1] ** 2)
+
+    head_zone_col = head_zone[:, np.newaxis]
+    face_zone_col = face_zone[:, np.newaxis]
+    in_head_zone = (dist_to_head < head_zone_col) & (dist_to_nose > face_zone_col)
+    in_face_zone = dist_to_nose <= face_zone_col
+
+    candidates = np.where(
+        in_head_zone, dist_to_head,
+        np.where(in_face_zone, dist_to_nose, OUT_OF_ZONE_DISTANCE)
+    )
+
+    result = {
+        'shoulder_width': shoulder_width,
+        'head_zone': head_zone,
+        'face_zone': face_zone,
+        'head_center': head_center,
+        'nose': nose,
+        'dist_to_head': dist_to_head,
+        'dist_to_nose': dist_to_nose,
+        'distance': candidates.min(axis=1),
+        'nearest_hand': dist_to_head.min(axis=1)
+    }
+
+    if single:
+        result = {key: value[0] for key, value in result.items()}
+
+    return result
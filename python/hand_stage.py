@@ -0,0 +1,246 @@
+"""
+NoPickie - 手部细分阶段（级联）
+姿态模型只有手腕和食指（15/16/19/20），分不清抠头、拔头发、搓眼睛、吃手指：
+
+只在预警期间（手已进入头部区域）才在离头最近的那只手腕周围裁一小块画面，
+跑 MediaPipe Hands 得到 21 个手指关键点，根据指尖和五官的位置细分行为；
+其余时间不产生任何额外开销，耗时单独计入 perf 的 hand 阶段和 snapshot()
+"""
+
+import sys
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from buffers import BufferPool
+from geometry import LEFT_EYE, RIGHT_EYE, LEFT_SHOULDER, RIGHT_SHOULDER, NOSE
+from perf import NULL_PERF
+
+
+# 姿态关键点：嘴角和手（手腕、食指）
+MOUTH_LEFT = 9
+MOUTH_RIGHT = 10
+WRISTS = (15, 16)
+INDEX_FINGERS = (19, 20)
+
+# 手部关键点：指尖
+THUMB_TIP = 4
+INDEX_TIP = 8
+FINGERTIPS = [4, 8, 12, 16, 20]
+
+# 行为判定的距离阈值（相对肩宽）
+EYE_RADIUS = 0.12       # 指尖离眼睛
+MOUTH_RADIUS = 0.12     # 指尖离嘴
+PINCH_RADIUS = 0.06     # 拇指尖和食指尖（捏住头发）
+
+BEHAVIORS = ('scratch', 'hair_pull', 'eye_rub', 'finger_bite', 'face_touch')
+
+
+def classify_behavior(hand_points, points, face_zone):
+    """
+    根据指尖和五官的位置细分行为
+
+    Args:
+        hand_points: (21, 3) 手部关键点（全帧归一化坐标，已镜像）
+        points: (33, 3) 姿态关键点（已镜像）
+        face_zone: 自适应脸部区域半径
+
+    Returns:
+        str: BEHAVIORS 之一
+    """
+    shoulder_width = max(float(np.linalg.norm(points[RIGHT_SHOULDER, :2] - points[LEFT_SHOULDER, :2])), 1e-6)
+    tips = hand_points[FINGERTIPS, :2]
+
+    def nearest(target):
+        return float(np.min(np.linalg.norm(tips - target, axis=1))) / shoulder_width
+
+    eyes = min(nearest(points[LEFT_EYE, :2]), nearest(points[RIGHT_EYE, :2]))
+    mouth = nearest((points[MOUTH_LEFT, :2] + points[MOUTH_RIGHT, :2]) / 2)
+    if mouth < MOUTH_RADIUS and mouth <= eyes:
+        return 'finger_bite'
+    if eyes < EYE_RADIUS:
+        return 'eye_rub'
+
+    # 指尖都在眉毛以下、离鼻子近（脸部区域内），但不在眼睛、嘴附近
+    eye_line = min(points[LEFT_EYE, 1], points[RIGHT_EYE, 1]) - EYE_RADIUS * shoulder_width
+    above_eyes = float(tips[:, 1].min()) < eye_line
+    if not above_eyes and nearest(points[NOSE, :2]) * shoulder_width <= face_zone:
+        return 'face_touch'
+
+    # 头发区域：捏合（拇指尖碰食指尖）视为拔头发，否则是抠头
+    pinch = float(np.linalg.norm(hand_points[THUMB_TIP, :2] - hand_points[INDEX_TIP, :2])) / shoulder_width
+    return 'hair_pull' if pinch < PINCH_RADIUS else 'scratch'
+
+
+class HandStage:
+    """
+    级联的手部细分阶段（在推理线程中调用）
+
+    每个预警片段内按帧投票，stats['behavior'] 为当前片段中出现最多的行为
+    """
+
+    def __init__(self, mp_hands, config, perf=NULL_PERF, buffers=None):
+        """
+        Args:
+            mp_hands: mediapipe.solutions.hands 模块
+            config: hand_stage 配置字典
+            perf: 各阶段耗时记录器
+            buffers: 缓冲池（裁剪区域的缩放和颜色转换），None 表示每次分配
+        """
+        self.enabled = config.get('enabled', True)
+        self.min_interval = config.get('min_interval', 0.1)  # 两次手部推理的最短间隔（秒）
+        self.crop_scale = config.get('crop_scale', 0.9)  # 裁剪边长（相对肩宽）
+        self.crop_size = config.get('crop_size', 192)  # 裁剪画面缩放到的边长（像素）
+        self.perf = perf
+        self.buffers = buffers or BufferPool(enabled=False)
+
+        self.hands = None
+        if self.enabled:
+            self.hands = mp_hands.Hands(
+                static_image_mode=True,  # 每次裁剪位置都不同，不使用跨帧跟踪
+                max_num_hands=1,
+                model_complexity=config.get('model_complexity', 0),
+                min_detection_confidence=config.get('min_detection_confidence', 0.5)
+            )
+
+        self.last_run = None
+        self.hand_points = None  # 最近一次的手部关键点（全帧归一化坐标，已镜像）
+        self.last_crop = None    # 最近一次的裁剪区域（原始画面像素坐标，用于显示）
+        self._votes = Counter()
+
+        # 统计信息
+        self.frames = 0
+        self.runs = 0
+        self.found = 0
+        self.total_seconds = 0.0
+        self.behaviors = Counter()
+
+    @property
+    def behavior(self):
+        """当前预警片段中出现最多的行为（没有结果时为 None）"""
+        if not self._votes:
+            return None
+        return self._votes.most_common(1)[0][0]
+
+    def update(self, frame, points, geometry, active, now):
+        """
+        预警期间对离头最近的手做细分
+
+        Args:
+            frame: 摄像头原始画面（BGR）
+            points: (33, 3) 姿态关键点（已镜像），没有人体时为 None
+            geometry: 本帧 compute_geometry 的结果
+            active: 是否处于预警片段中（Warning / Detected）
+            now: 当前时间（检测器时钟，秒）
+
+        Returns:
+            str: 当前片段的行为，非预警期间为 None
+        """
+        self.frames += 1
+        if not active or points is None or geometry is None:
+            self.reset()
+            return None
+        if not self.enabled or (self.last_run is not None and now - self.last_run < self.min_interval):
+            return self.behavior
+
+        self.last_run = now
+        start = time.perf_counter()
+        try:
+            hand_points = self._detect(frame, points, geometry)
+        except Exception as e:
+            print(f"⚠️ 手部细分失败: {e}", file=sys.stderr)
+            hand_points = None
+        elapsed = time.perf_counter() - start
+        self.perf.add('hand', elapsed)
+        self.total_seconds += elapsed
+        self.runs += 1
+
+        self.hand_points = hand_points
+        if hand_points is not None:
+            self.found += 1
+            label = classify_behavior(hand_points, points, float(geometry['face_zone']))
+            self._votes[label] += 1
+        return self.behavior
+
+    def _detect(self, frame, points, geometry):
+        """在离头最近的手腕周围裁剪并检测手部关键点"""
+        h, w = frame.shape[:2]
+
+        # 离头部中心最近的那只手（dist_to_head 的顺序与 HAND_INDICES 一致：左腕、右腕、左食指、右食指）
+        side = int(np.argmin(geometry['dist_to_head'])) % 2
+        wrist = points[WRISTS[side], :2]
+        index = points[INDEX_FINGERS[side], :2]
+
+        # 裁剪中心沿手腕 → 食指方向偏移（手指在食指关键点之外），换回原始画面坐标
+        center = wrist + (index - wrist) * 1.5
+        cx = (1.0 - center[0]) * w
+        cy = center[1] * h
+        half = max(32.0, float(geometry['shoulder_width']) * self.crop_scale * w / 2)
+
+        x0, y0 = int(max(0, cx - half)), int(max(0, cy - half))
+        x1, y1 = int(min(w, cx + half)), int(min(h, cy + half))
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        self.last_crop = (x0, y0, x1, y1)
+
+        crop = frame[y0:y1, x0:x1]
+        crop_h, crop_w = crop.shape[:2]
+        scale = self.crop_size / max(crop_w, crop_h)
+        if scale < 1.0:
+            size = (int(crop_w * scale), int(crop_h * scale))
+            crop = cv2.resize(crop, size, dst=self.buffers.get('hand_crop', (size[1], size[0], 3)),
+                              interpolation=cv2.INTER_AREA)
+        rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self.buffers.get('hand_rgb', crop.shape))
+        result = self.hands.process(rgb_crop)
+        if not result.multi_hand_landmarks:
+            return None
+
+        # 裁剪区域归一化坐标 → 全帧归一化坐标（并镜像，与姿态关键点一致）
+        landmarks = result.multi_hand_landmarks[0].landmark
+        hand_points = np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float64)
+        hand_points[:, 0] = 1.0 - (x0 + hand_points[:, 0] * crop_w) / w
+        hand_points[:, 1] = (y0 + hand_points[:, 1] * crop_h) / h
+        return hand_points
+
+    def record_trigger(self):
+        """触发时记录当前片段的行为（用于统计各行为的触发次数）"""
+        behavior = self.behavior
+        if behavior is not None:
+            self.behaviors[behavior] += 1
+        return behavior
+
+    def reset(self):
+        """预警片段结束：清空投票"""
+        self._votes.clear()
+        self.hand_points = None
+        self.last_crop = None
+        self.last_run = None
+
+    def warmup(self):
+        """在空白画面上跑一次推理（图初始化）"""
+        if self.hands is not None:
+            self.hands.process(np.zeros((self.crop_size, self.crop_size, 3), dtype=np.uint8))
+
+    def close(self):
+        """释放模型"""
+        if self.hands is not None:
+            self.hands.close()
+
+    def snapshot(self):
+        """
+        获取细分阶段统计
+
+        Returns:
+            dict: 运行比例（相对分析帧数）、平均耗时、找到手的次数、各行为的触发次数
+        """
+        return {
+            'enabled': self.enabled,
+            'frames': self.frames,
+            'runs': self.runs,
+            'run_rate': round(self.runs / self.frames, 3) if self.frames else 0.0,
+            'found': self.found,
+            'mean_ms': round(self.total_seconds / self.runs * 1000, 2) if self.runs else None,
+            'behaviors': dict(self.behaviors)
+        }
@@ -0,0 +1,546 @@
+"""
+NoPickie - 检测日志
+只追加的事件日志（SQLite，WAL 模式），记录触发、预警片段和会话开始/结束：
+
+- events: 每条记录一行，按时间建索引，写入后不再修改
+- hourly / daily: 按小时、按天的聚合，与事件在同一个事务中增量更新，
+  查询"最近 90 天每小时的次数"只读聚合表，不扫描历史
+
+写入在后台线程中完成（不阻塞输出线程）；多路模式下各工作进程各自打开同一个数据库
+
+命令行查询（输出 JSON）：
+    python journal.py counts --bucket hour --days 90
+    python journal.py events --kind trigger --days 1
+"""
+
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from perf import NULL_PERF
+
+
+DEFAULT_PATH = "~/.nopickie/journal.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT '',
+    session INTEGER,
+    duration REAL,
+    distance REAL,
+    screenshot TEXT,
+    clip TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+CREATE TABLE IF NOT EXISTS hourly (
+    bucket TEXT NOT NULL,
+    source TEXT NOT NULL,
+    triggers INTEGER NOT NULL DEFAULT 0,
+    warnings INTEGER NOT NULL DEFAULT 0,
+    warning_seconds REAL NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    active_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, source)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily (
+    bucket TEXT NOT NULL,
+    source TEXT NOT NULL,
+    triggers INTEGER NOT NULL DEFAULT 0,
+    warnings INTEGER NOT NULL DEFAULT 0,
+    warning_seconds REAL NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    active_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, source)
+) WITHOUT ROWID;
+"""
+
+AGGREGATE_COLUMNS = ('triggers', 'warnings', 'warning_seconds', 'sessions', 'active_seconds')
+
+# 聚合桶（本地时间，与 stats.json 的日期格式一致）
+BUCKET_FORMATS = {
+    'hour': "%Y-%m-%d %H:00",
+    'day': "%Y-%m-%d"
+}
+BUCKET_TABLES = {'hour': 'hourly', 'day': 'daily'}
+
+
+def bucket_key(ts, bucket):
+    """
+    计算时间所在的聚合桶
+
+    Args:
+        ts: Unix 时间戳（秒）
+        bucket: hour / day
+
+    Returns:
+        str: 本地时间的桶名
+    """
+    return datetime.fromtimestamp(ts).strftime(BUCKET_FORMATS[bucket])
+
+
+def next_bucket_start(ts, bucket):
+    """
+    下一个聚合桶的开始时间
+
+    Args:
+        ts: Unix 时间戳（秒）
+        bucket: hour / day
+
+    Returns:
+        float: Unix 时间戳（一定大于 ts）
+    """
+    dt = datetime.fromtimestamp(ts)
+    if bucket == 'hour':
+        boundary = dt.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    else:
+        boundary = dt.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    # 夏令时回拨的那一小时本地时间有歧义，保证时间前进
+    return max(boundary.timestamp(), ts + 1.0)
+
+
+def split_duration(start, duration, bucket):
+    """
+    把一段时间按聚合桶拆分
+
+    Args:
+        start: 开始时间（Unix 时间戳）
+        duration: 时长（秒）
+        bucket: hour / day
+
+    Returns:
+        list: [(桶名, 落在该桶内的秒数)]
+    """
+    parts = []
+    end = start + duration
+    while start < end:
+        stop = min(next_bucket_start(start, bucket), end)
+        parts.append((bucket_key(start, bucket), stop - start))
+        start = stop
+    return parts
+
+
+def aggregate_delta(kind, ts, duration):
+    """
+    一条记录对聚合的增量
+
+    次数记在记录时间所在的桶；会话和预警片段的时长按实际覆盖的时间段拆分到各个桶
+    （warning 的记录时间是片段开始时间，session_stop 的记录时间是会话结束时间）
+
+    Args:
+        kind: 记录类型
+        ts: 记录时间（Unix 时间戳）
+        duration: 时长（秒）
+
+    Returns:
+        counts: 列名 → 增量（记在 ts 所在的桶），不影响次数时为空字典
+        seconds: (列名, 开始时间, 时长)，没有时长时为 None
+    """
+    duration = duration or 0.0
+    if kind == 'trigger':
+        return {'triggers': 1}, None
+    if kind == 'warning':
+        return {'warnings': 1}, ('warning_seconds', ts, duration)
+    if kind == 'session_start':
+        return {'sessions': 1}, None
+    if kind == 'session_stop':
+        return {}, ('active_seconds', ts - duration, duration)
+    return {}, None
+
+
+def connect(path):
+    """
+    打开数据库（WAL 模式：写入只追加到 WAL 文件，进程崩溃不会损坏已提交的数据，读写互不阻塞）
+
+    Args:
+        path: 数据库文件路径
+
+    Returns:
+        sqlite3.Connection
+    """
+    connection = sqlite3.connect(str(path), timeout=5.0, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=FULL")
+    return connection
+
+
+class DetectionJournal(threading.Thread):
+    """
+    检测日志写入线程
+
+    record() 只把记录放进有界队列，队列满时丢弃并计数，绝不阻塞调用方；
+    写入线程每次把队列中已有的记录合并为一个事务提交
+    """
+
+    def __init__(self, path=DEFAULT_PATH, source='', perf=NULL_PERF, queue_size=256):
+        """
+        Args:
+            path: 数据库文件路径（支持 ~）
+            source: 视频源 ID（单路模式为空字符串）
+            perf: 各阶段耗时记录器
+            queue_size: 待写入记录的队列长度
+        """
+        super().__init__(name="DetectionJournal", daemon=True)
+        self.path = Path(os.path.expanduser(path))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.source = source
+        self.perf = perf
+
+        self._records = queue.Queue(maxsize=queue_size)
+        self._running = True
+        self._connection = connect(self.path)
+        self._connection.executescript(SCHEMA)
+
+        # 统计信息
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, kind, ts=None, **fields):
+        """
+        追加一条记录（异步）
+
+        Args:
+            kind: trigger / warning / session_start / session_stop
+            ts: Unix 时间戳（秒），默认当前时间
+            fields: session、duration、distance、screenshot、clip，其余字段存入 data（JSON）
+        """
+        try:
+            self._records.put_nowait((kind, time.time() if ts is None else ts, fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=2.0):
+        """停止线程（写完队列中已有的记录）"""
+        self._running = False
+        self.join(timeout)
+
+    def snapshot(self):
+        """
+        获取写入统计
+
+        Returns:
+            dict: 已写入、丢弃、排队中的记录数
+        """
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self._records.qsize()
+        }
+
+    def run(self):
+        try:
+            while self._running or not self._records.empty():
+                try:
+                    batch = [self._records.get(timeout=0.2)]
+                except queue.Empty:
+                    continue
+                while len(batch) < 64:
+                    try:
+                        batch.append(self._records.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    with self.perf.measure('journal'):
+                        self._write(batch)
+                    self.written += len(batch)
+                except sqlite3.Error as e:
+                    self.dropped += len(batch)
+                    print(f"⚠️ 检测日志写入失败: {e}", file=sys.stderr)
+        finally:
+            self._connection.close()
+
+    def _write(self, batch):
+        """在一个事务中追加记录并更新聚合"""
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, ts, fields in batch:
+                fields = dict(fields)
+                columns = {name: fields.pop(name, None)
+                           for name in ('session', 'duration', 'distance', 'screenshot', 'clip')}
+                connection.execute(
+                    "INSERT INTO events (ts, kind, source, session, duration, distance, screenshot, clip, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ts, kind, self.source, columns['session'], columns['duration'], columns['distance'],
+                     columns['screenshot'], columns['clip'], json.dumps(fields) if fields else None)
+                )
+
+                counts, seconds = aggregate_delta(kind, ts, columns['duration'])
+                for bucket, table in BUCKET_TABLES.items():
+                    rows = {}  # 桶名 → {列名: 增量}
+                    if counts:
+                        rows[bucket_key(ts, bucket)] = dict(counts)
+                    if seconds is not None:
+                        name, start, duration = seconds
+                        for key, part in split_duration(start, duration, bucket):
+                            row = rows.setdefault(key, {})
+                            row[name] = row.get(name, 0.0) + part
+                    for key, delta in rows.items():
+                        self._add_aggregate(table, key, delta)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _add_aggregate(self, table, key, delta):
+        """把增量累加到聚合表的一个桶（调用方持有事务）"""
+        names = ', '.join(delta)
+        placeholders = ', '.join('?' * len(delta))
+        updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in delta)
+        self._connection.execute(
+            f"INSERT INTO {table} (bucket, source, {names}) VALUES (?, ?, {placeholders}) "
+            f"ON CONFLICT (bucket, source) DO UPDATE SET {updates}",
+            (key, self.source, *delta.values())
+        )
+
+
+def open_journal(config, source='', perf=NULL_PERF):
+    """
+    按配置打开检测日志并启动写入线程
+
+    Args:
+        config: journal 配置字典
+        source: 视频源 ID
+        perf: 各阶段耗时记录器
+
+    Returns:
+        SessionRecorder，未启用或数据库打不开时为 None
+    """
+    if not config.get('enabled', True):
+        return None
+    try:
+        journal = DetectionJournal(config.get('path', DEFAULT_PATH), source, perf)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ 检测日志不可用: {e}", file=sys.stderr)
+        return None
+    journal.start()
+    return SessionRecorder(journal)
+
+
+class SessionRecorder:
+    """
+    把输出阶段看到的检测结果转成日志记录
+
+    - 会话：一次开始检测到停止（常驻模式下每次恢复是一个新会话）
+    - 预警片段：离开 Normal 到回到 Normal 的一段时间，结束时记录时长和其中的触发次数
+    - 触发：进入 Detected 的那一帧
+    """
+
+    def __init__(self, journal):
+        """
+        Args:
+            journal: DetectionJournal
+        """
+        self.journal = journal
+        self.session = None
+        self.session_start = 0.0
+        self.session_triggers = 0
+        self.episode_start = None
+        self.episode_triggers = 0
+
+    def start(self):
+        """开始会话"""
+        self.session_start = time.time()
+        self.session = int(self.session_start * 1000)
+        self.session_triggers = 0
+        self.journal.record('session_start', self.session_start, session=self.session)
+
+    def on_state(self, last_state, current_state, ts):
+        """
+        状态变化时调用
+
+        Args:
+            last_state: 之前的状态
+            current_state: 当前状态
+            ts: 帧的采集时间（Unix 时间戳）
+        """
+        if last_state == 'Normal' and self.episode_start is None:
+            self.episode_start = ts
+            self.episode_triggers = 0
+        elif current_state == 'Normal':
+            self._end_episode(ts)
+
+    def on_trigger(self, stats, ts, screenshot=None, clip=None):
+        """
+        触发时调用
+
+        Args:
+            stats: 检测器返回的统计信息
+            ts: 帧的采集时间（Unix 时间戳）
+            screenshot: 截图路径
+            clip: 片段路径
+        """
+        self.session_triggers += 1
+        self.episode_triggers += 1
+        self.journal.record(
+            'trigger', ts,
+            session=self.session,
+            duration=stats['duration'],
+            distance=stats['distance'],
+            screenshot=screenshot,
+            clip=clip,
+            trigger_count=stats['trigger_count'],
+            behavior=stats.get('behavior')
+        )
+
+    def stop(self, reason, frames=0):
+        """
+        结束会话（未结束的预警片段一并结束）
+
+        Args:
+            reason: 结束原因
+            frames: 本次会话处理的帧数
+        """
+        if self.session is None:
+            return
+        now = time.time()
+        self._end_episode(now)
+        self.journal.record(
+            'session_stop', now,
+            session=self.session,
+            duration=now - self.session_start,
+            reason=reason,
+            frames=frames,
+            triggers=self.session_triggers
+        )
+        self.session = None
+
+    def snapshot(self):
+        """写入统计（见 DetectionJournal.snapshot）"""
+        return self.journal.snapshot()
+
+    def close(self):
+        """停止写入线程"""
+        self.journal.stop()
+
+    def _end_episode(self, ts):
+        if self.episode_start is None:
+            return
+        self.journal.record(
+            'warning', self.episode_start,
+            session=self.session,
+            duration=ts - self.episode_start,
+            outcome='detected' if self.episode_triggers else 'cleared',
+            triggers=self.episode_triggers
+        )
+        self.episode_start = None
+
+
+def query_counts(path, start, end, bucket='hour', source=None):
+    """
+    按小时 / 天查询聚合（只读聚合表）
+
+    Args:
+        path: 数据库文件路径
+        start: 起始时间（datetime，包含）
+        end: 结束时间（datetime，包含）
+        bucket: hour / day
+        source: 视频源 ID，None 表示所有来源合计
+
+    Returns:
+        list: [{"bucket", "triggers", "warnings", "warning_seconds", "sessions", "active_seconds"}]
+    """
+    table = BUCKET_TABLES[bucket]
+    fmt = BUCKET_FORMATS[bucket]
+    sums = ', '.join(f"SUM({name})" for name in AGGREGATE_COLUMNS)
+    sql = f"SELECT bucket, {sums} FROM {table} WHERE bucket BETWEEN ? AND ?"
+    params = [start.strftime(fmt), end.strftime(fmt)]
+    if source is not None:
+        sql += " AND source = ?"
+        params.append(source)
+    sql += " GROUP BY bucket ORDER BY bucket"
+
+    connection = connect(os.path.expanduser(path))
+    try:
+        rows = connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(('bucket',) + AGGREGATE_COLUMNS, row)) for row in rows]
+
+
+def query_events(path, start, end, kind=None, limit=1000):
+    """
+    按时间范围查询记录（走 ts 索引）
+
+    Args:
+        path: 数据库文件路径
+        start: 起始时间（datetime）
+        end: 结束时间（datetime）
+        kind: 记录类型，None 表示全部
+        limit: 最多返回的条数
+
+    Returns:
+        list: 记录字典，按时间排序
+    """
+    sql = ("SELECT ts, kind, source, session, duration, distance, screenshot, clip, data "
+           "FROM events WHERE ts BETWEEN ? AND ?")
+    params = [start.timestamp(), end.timestamp()]
+    if kind is not None:
+        sql += " AND kind = ?"
+        params.append(kind)
+    sql += " ORDER BY ts LIMIT ?"
+    params.append(limit)
+
+    connection = connect(os.path.expanduser(path))
+    try:
+        rows = connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+
+    events = []
+    for ts, kind, source, session, duration, distance, screenshot, clip, data in rows:
+        event = {
+            'time': datetime.fromtimestamp(ts).isoformat(),
+            'kind': kind,
+            'source': source,
+            'session': session,
+            'duration': duration,
+            'distance': distance,
+            'screenshot': screenshot,
+            'clip': clip
+        }
+        if data:
+            event.update(json.loads(data))
+        events.append(event)
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 检测日志查询")
+    parser.add_argument('query', choices=('counts', 'events'), help="counts: 聚合次数；events: 原始记录")
+    parser.add_argument('--db', default=DEFAULT_PATH, help="数据库文件")
+    parser.add_argument('--days', type=float, default=1.0, help="查询最近多少天")
+    parser.add_argument('--bucket', choices=tuple(BUCKET_TABLES), default='hour', help="聚合粒度")
+    parser.add_argument('--source', help="只查询某个视频源")
+    parser.add_argument('--kind', help="记录类型（trigger / warning / session_start / session_stop）")
+    parser.add_argument('--limit', type=int, default=1000, help="最多返回的记录数")
+    args = parser.parse_args()
+
+    if not Path(os.path.expanduser(args.db)).exists():
+        print(f"❌ 找不到检测日志: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    end = datetime.now()
+    start = end - timedelta(days=args.days)
+    started = time.perf_counter()
+    if args.query == 'counts':
+        result = query_counts(args.db, start, end, args.bucket, args.source)
+    else:
+        result = query_events(args.db, start, end, args.kind, args.limit)
+    print(f"⏱ 查询耗时: {(time.perf_counter() - started) * 1000:.1f}ms，{len(result)} 行", file=sys.stderr)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+NoPickie - 关键帧推理
+只在关键帧上跑姿态模型，中间帧用匀速运动模型预测关键点：
+
+- 关键帧间隔 interval（帧）按手部关键点的实测速度自适应：手几乎不动时放宽到 max_interval，
+  手快速移动时收紧到 min_interval
+- 预测只在 Normal 状态下使用；预测的手进入头部区域（含 zone_margin 余量）或脸部区域、
+  或运动门控检测到头部区域有画面变化时，检测器立即在当前帧推理（见 HeadScratchDetector.predict_points），
+  Warning 之后每帧都推理
+
+检测延迟：手在两个关键帧之间直接出现在头部、又没有画面变化可用时（关键点回放，或关闭了运动门控），
+要到下一个关键帧才能看到，进入 Warning 最多推迟 max_interval - 1 帧。benchmark.py --keyframes 回放的
+就是这种情况（关键点瞬间到位），single_scratch 的检测延迟从 0.133s 增加到约 0.3s
+"""
+
+import numpy as np
+
+from geometry import HAND_INDICES
+
+
+class KeyframePredictor:
+    """关键帧间的关键点预测（在推理线程中使用）"""
+
+    def __init__(self, config):
+        """
+        Args:
+            config: keyframes 配置字典
+        """
+        self.enabled = config.get('enabled', False)
+        self.min_interval = config.get('min_interval', 1)  # 关键帧最小间隔（帧）
+        self.max_interval = config.get('max_interval', 6)  # 关键帧最大间隔（帧）
+        self.slow_speed = config.get('slow_speed', 0.05)  # 手速低于该值（归一化坐标/秒）时使用最大间隔
+        self.fast_speed = config.get('fast_speed', 0.6)   # 手速高于该值时每帧推理
+        self.zone_margin = config.get('zone_margin', 0.3)  # 预测的手距头部中心小于 头部半径×(1+margin) 时强制推理
+        self.velocity_alpha = config.get('velocity_alpha', 0.5)  # 速度的指数平滑系数
+        self.max_horizon = config.get('max_horizon', 0.3)  # 最长外推时间（秒），超过后位置不再外推
+
+        self._points = None    # 最近关键帧的关键点
+        self._time = None      # 最近关键帧的时间
+        self._velocity = None  # 平滑后的关键点速度（每秒）
+        self._since = 0        # 距上一关键帧的帧数
+        self.interval = self.min_interval
+        self.speed = 0.0
+
+        # 统计信息
+        self.keyframes = 0
+        self.predicted = 0
+        self.forced = 0
+
+    def observe(self, points, now):
+        """
+        记录关键帧的推理结果
+
+        Args:
+            points: (33, 3) 关键点（已镜像），没有人体时为 None
+            now: 当前时间（检测器时钟，秒）
+        """
+        self.keyframes += 1
+        if points is None:
+            self.reset()
+            return
+
+        if self._points is not None and now > self._time:
+            velocity = (points - self._points) / (now - self._time)
+            if self._velocity is None:
+                self._velocity = velocity
+            else:
+                self._velocity = self.velocity_alpha * velocity + (1 - self.velocity_alpha) * self._velocity
+            self.speed = float(np.max(np.linalg.norm(self._velocity[HAND_INDICES, :2], axis=1)))
+            self.interval = self._interval_for(self.speed)
+
+        self._points = points
+        self._time = now
+        self._since = 0
+
+    def predict(self, now):
+        """
+        预测当前帧的关键点
+
+        Args:
+            now: 当前时间（检测器时钟，秒）
+
+        Returns:
+            (33, 3) 预测的关键点；到了关键帧（或还没有可用的关键帧）时返回 None
+        """
+        if self._points is None or self._velocity is None or self._since + 1 >= self.interval:
+            return None
+        self._since += 1
+        self.predicted += 1
+        dt = min(now - self._time, self.max_horizon)
+        return self._points + self._velocity * dt
+
+    def force(self):
+        """预测的手进入检测区域：本帧改为推理"""
+        self.forced += 1
+        self._since = self.interval
+
+    def reset(self):
+        """清空运动模型（人离开画面、暂停后重新开始时）"""
+        self._points = None
+        self._time = None
+        self._velocity = None
+        self._since = 0
+        self.interval = self.min_interval
+        self.speed = 0.0
+
+    def _interval_for(self, speed):
+        """手速 → 关键帧间隔（线性插值）"""
+        if speed <= self.slow_speed:
+            return self.max_interval
+        if speed >= self.fast_speed:
+            return self.min_interval
+        ratio = (speed - self.slow_speed) / (self.fast_speed - self.slow_speed)
+        return int(round(self.max_interval - ratio * (self.max_interval - self.min_interval)))
+
+    def snapshot(self):
+        """
+        获取关键帧统计
+
+        Returns:
+            dict: 关键帧数、预测帧数、强制推理次数、推理比例、当前间隔和手速
+        """
+        frames = self.keyframes + self.predicted
+        return {
+            'enabled': self.enabled,
+            'keyframes': self.keyframes,
+            'predicted': self.predicted,
+            'forced': self.forced,
+            'inference_ratio': round(self.keyframes / frames, 3) if frames else 1.0,
+            'interval': self.interval,
+            'hand_speed': round(self.speed, 3)
+        }
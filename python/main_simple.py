@@ -3,14 +3,33 @@ NoPickie - Python 检测脚本（简化版for Tauri）
 输出 JSON 到 stdout 供 Tauri 读取
 """
 
-import cv2
 import json
 import sys
 import time
 import base64
 from datetime import datetime
 from pathlib import Path
-from detector import HeadScratchDetector
+
+# 脚本开始执行的时间（启动耗时统计的起点）
+STARTUP_T0 = time.monotonic()
+
+# mediapipe（detector 模块）导入很慢，由 startup.DetectorLoader 在后台线程中导入
+import cv2
+from pipeline import FrameGrabber, DeadlinePacer, InferenceScheduler, OutputStage, LatencyTracker
+from perf import PerfRecorder
+from buffers import BufferPool, read_into
+from protocol import EventWriter, negotiate_version
+from frame_stream import FrameStreamServer
+from capture import open_capture, capture_info
+from evidence import EvidenceWriter
+from journal import open_journal
+from startup import StartupTimer, DetectorLoader, DaemonControl
+
+# 各阶段耗时记录（采集、推理、输出线程共用，周期性地以 perf 事件发送）
+perf = PerfRecorder()
+
+# stdout 事件写入器（main() 中按协商的协议版本重新创建）
+event_writer = EventWriter(perf=perf)
 
 def load_config():
     """加载配置"""
@@ -25,28 +44,597 @@ def load_config():
                 "time_threshold": 2.0,
                 "smoothing_frames": 5,
                 "head_zone_radius": 0.35,
-                "face_exclude_radius": 0.10
+                "face_exclude_radius": 0.10,
+                "landmark_filter": {"type": "none"}
             },
             "display": {
                 "show_skeleton": True,
                 "show_distance": True,
                 "window_width": 640,
                 "window_height": 480,
-                "fps": 30
+                "fps": 30,
+                "debug_frames": True,
+                "debug_channel": "stream",
+                "debug_stream_port": 0
+            },
+            "model": {
+                "complexity": 1,
+                "auto": False,
+                "min_complexity": 0,
+                "max_complexity": 2,
+                "headroom": 0.7,
+                "cooldown_seconds": 10.0
+            },
+            "tracking": {
+                "roi_enabled": False,
+                "padding": 0.4,
+                "max_size": 480
+            },
+            "motion_gate": {
+                "enabled": True,
+                "motion_threshold": 0.02,
+                "region_radius": 0.15,
+                "max_skip_seconds": 0.5
+            },
+            "keyframes": {
+                "enabled": False,
+                "min_interval": 1,
+                "max_interval": 6,
+                "zone_margin": 0.3
+            },
+            "hand_stage": {
+                "enabled": True,
+                "model_complexity": 0,
+                "min_interval": 0.1,
+                "crop_scale": 0.9
             },
             "camera": {
-                "device_id": 0
+                "source": "device",
+                "device_id": 0,
+                "width": 640,
+                "height": 480,
+                "fps": 30,
+                "format": "MJPG",
+                "buffer_size": 1
+            },
+            "sources": [],
+            "pipeline": {
+                "threaded": True,
+                "output_queue_size": 2
+            },
+            "scheduler": {
+                "enabled": True,
+                "far_fps": 10,
+                "probe_fps": 3,
+                "near_ratio": 1.5,
+                "hold_seconds": 2.0
+            },
+            "perf": {
+                "enabled": True,
+                "interval": 10.0
+            },
+            "evidence": {
+                "clips": True,
+                "pre_seconds": 3.0,
+                "post_seconds": 2.0,
+                "clip_fps": 10,
+                "clip_format": "avi",
+                "ring_memory_mb": 128,
+                "max_disk_mb": 500
+            },
+            "events": {
+                "protocol": 2,
+                "flush_interval": 0.1,
+                "max_batch": 64,
+                "max_queue": 256,
+                "close_timeout": 2.0
+            },
+            "journal": {
+                "enabled": True,
+                "path": "~/.nopickie/journal.db"
+            },
+            "buffers": {
+                "enabled": True,
+                "render_slots": 4
             }
         }
 
-def send_event(event_type, data):
-    """发送事件到 Tauri（通过 JSON）"""
-    event = {
-        "event": event_type,
-        "timestamp": datetime.now().isoformat(),
-        **data
-    }
-    print(json.dumps(event), flush=True)
+def send_event(event_type, data, t=None):
+    """
+    发送事件到 Tauri（协议见 protocol.py）
+    
+    Args:
+        event_type: 事件类型
+        data: 事件数据
+        t: 事件对应的单调时钟时间（例如帧的采集时间），None 表示当前时间
+    """
+    event_writer.send(event_type, data, t)
+
+class EventOutput:
+    """输出阶段：根据检测结果发送事件、调试帧和保存截图"""
+    
+    FRAME_SEND_INTERVAL = 0.2  # 每0.2秒发送一帧（5 FPS）
+    STATUS_UPDATE_INTERVAL = 5.0  # 每5秒发送一次状态更新
+    
+    def __init__(self, screenshots_dir, debug_frames=True, perf_interval=10.0, frame_stream=None,
+                 emit=None, screenshot_prefix="screenshot", evidence=None, journal=None, buffers=None,
+                 writer=None):
+        self.screenshots_dir = Path(screenshots_dir)
+        self.buffers = buffers or BufferPool(enabled=False)  # 输出线程的缓冲池（调试画面缩放）
+        self.evidence = evidence  # 后台证据写盘线程（截图、触发前后片段），None 表示同步写截图
+        self.journal = journal  # 检测日志（journal.SessionRecorder），None 表示不记录
+        self.emit = emit or send_event  # 事件出口（多路模式下由工作进程替换为进程间队列）
+        # emit 背后的 EventWriter（写入统计、积压判断）；自定义 emit 且没有 writer 时不报告写入统计
+        self.writer = writer or (event_writer if emit is None else None)
+        self.screenshot_prefix = screenshot_prefix  # 截图文件名前缀（多路模式下区分来源）
+        self.debug_frames = debug_frames  # 是否有调试窗口在接收画面
+        self.frame_stream = frame_stream  # 调试画面二进制通道（None 表示用 JSON + base64 发送）
+        self.perf_interval = perf_interval  # perf 事件发送间隔（秒），<= 0 表示不发送
+        self.last_perf_time = time.monotonic()
+        
+        # 状态追踪
+        self.last_state = "Normal"
+        self.last_stats = None
+        self.frame_count = 0
+        self.last_status_time = time.monotonic()
+        
+        # 渲染调度（由推理线程调用 needs_render）
+        self.render_last_state = "Normal"
+        self.next_debug_frame_time = 0
+        self.next_debug_status_time = 0
+        
+        # 启动计时（开始检测后的第一帧发送 ready 事件）
+        self.startup = None
+        
+        # 流水线统计（由流水线模式提供）
+        self.latency = LatencyTracker()
+        self.pipeline_stats = None
+    
+    def needs_render(self, stats):
+        """
+        判断当前帧是否需要渲染画面（在推理线程中调用）
+        
+        只有调试窗口已连接且到了发送时间，或刚触发需要截图时才渲染，其余帧只做分析
+        
+        Args:
+            stats: 检测器返回的统计信息
+            
+        Returns:
+            bool: 是否需要渲染
+        """
+        current_state = stats['state']
+        screenshot_due = current_state == 'Detected' and self.render_last_state != 'Detected'
+        self.render_last_state = current_state
+        
+        now = time.monotonic()
+        debug_frame_due = self.debug_subscribed() and now >= self.next_debug_frame_time
+        if debug_frame_due:
+            self.next_debug_frame_time = now + self.FRAME_SEND_INTERVAL
+        
+        return screenshot_due or debug_frame_due
+    
+    def observe_frame(self, frame, capture_time):
+        """
+        记录原始帧供触发前后片段使用（在推理线程中调用，只保存引用）
+        
+        Args:
+            frame: 摄像头原始画面
+            capture_time: 帧的采集时间戳（time.monotonic()）
+        """
+        if self.evidence is not None:
+            self.evidence.add_frame(frame, capture_time)
+    
+    def debug_subscribed(self):
+        """是否有调试窗口在接收画面（二进制通道模式下以是否有连接为准）"""
+        if not self.debug_frames:
+            return False
+        return self.frame_stream is None or self.frame_stream.subscribers > 0
+    
+    def handle(self, processed_frame, stats, capture_time):
+        """
+        处理一帧检测结果
+        
+        Args:
+            processed_frame: 处理后的图像（本帧未渲染时为 None）
+            stats: 检测器返回的统计信息
+            capture_time: 帧的采集时间戳（time.monotonic()）
+        """
+        self.frame_count += 1
+        current_state = stats['state']
+        last_state = self.last_state
+        
+        # glass-to-event 延迟（采集 → 输出）
+        latency_ms = self.latency.record(capture_time)
+        
+        # 开始检测后的第一帧：发送各启动阶段耗时
+        if self.startup is not None:
+            report = self.startup.report()
+            self.startup = None
+            self.emit("ready", report, capture_time)
+            print(f"🚀 首帧检测完成: {report['time_to_first_detection_ms']}ms {report['phases_ms']}",
+                  file=sys.stderr)
+        
+        # 发送视频帧到调试窗口（只有渲染过的帧才有画面，渲染频率由 needs_render 控制）
+        if processed_frame is not None and self.debug_frames:
+            if self.frame_stream is not None:
+                # 二进制通道：只在有订阅者时编码，状态变化时强制发送
+                self.frame_stream.publish(processed_frame, force=current_state != last_state)
+            else:
+                self._send_debug_frame_b64(processed_frame, stats)
+        
+        # 二进制通道模式下，JSON 通道只发送小的状态事件（附带画面订阅地址）
+        now = time.monotonic()
+        if self.frame_stream is not None and self.debug_frames and now >= self.next_debug_status_time:
+            self.emit("debug_frame", {
+                "stream_url": self.frame_stream.url,
+                "status": current_state.lower(),
+                "count": stats['trigger_count'],
+                "duration": stats['duration']
+            })
+            self.next_debug_status_time = now + self.FRAME_SEND_INTERVAL
+        
+        # 状态变化时发送事件
+        wall_time = None
+        if current_state != last_state:
+            self.emit("state_changed", {
+                "state": current_state,
+                "stats": stats
+            }, capture_time)
+            print(f"📊 状态变化: {last_state} → {current_state}", file=sys.stderr)
+            if self.journal is not None:
+                wall_time = time.time() - (now - capture_time)
+                self.journal.on_state(last_state, current_state, wall_time)
+        
+        # 检测到挠头时发送事件
+        if current_state == 'Detected' and last_state != 'Detected':
+            # 保存截图（使用完整路径；有写盘线程时异步保存，不阻塞输出）
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{self.screenshot_prefix}_{timestamp}.jpg"
+            filepath = self.screenshots_dir / filename
+            clip = None
+            if self.evidence is not None:
+                if processed_frame is not None:
+                    self.evidence.save_image(filepath, processed_frame)
+                # 触发前后的片段（事后画面采集完成后才写盘）
+                clip_prefix = self.screenshot_prefix.replace("screenshot", "clip", 1)
+                clip = self.evidence.capture_clip(capture_time, f"{clip_prefix}_{timestamp}")
+            elif processed_frame is not None:
+                cv2.imwrite(str(filepath), processed_frame)
+                print(f"📸 截图已保存: {filepath}", file=sys.stderr)
+            
+            self.emit("scratch_detected", {
+                "trigger_count": stats['trigger_count'],
+                "duration": stats['duration'],
+                "distance": stats['distance'],
+                "behavior": stats.get('behavior'),
+                "screenshot": str(filepath),
+                "screenshot_dir": str(self.screenshots_dir),
+                "clip": clip,
+                "latency_ms": round(latency_ms, 1)
+            }, capture_time)
+            if self.journal is not None:
+                self.journal.on_trigger(stats, wall_time, str(filepath), clip)
+            print(f"🔔 检测到挠头！触发次数: {stats['trigger_count']}", file=sys.stderr)
+        
+        # 定期发送状态更新（每5秒）
+        if now - self.last_status_time >= self.STATUS_UPDATE_INTERVAL:
+            self.emit("status_update", self.status_snapshot(stats))
+            self.last_status_time = now
+        
+        # 定期发送各阶段耗时统计
+        if perf.enabled and self.perf_interval > 0 and now - self.last_perf_time >= self.perf_interval:
+            self.emit("perf", {
+                "stages": perf.snapshot(),
+                "window": perf.window
+            })
+            self.last_perf_time = now
+        
+        self.last_state = current_state
+        self.last_stats = stats
+    
+    def status_snapshot(self, stats):
+        """
+        汇总当前状态和各阶段统计（status_update 事件和 stats 命令共用）
+        
+        Args:
+            stats: 最近一帧的统计信息
+            
+        Returns:
+            dict: 事件数据
+        """
+        data = {
+            "state": stats['state'] if stats else self.last_state,
+            "stats": stats,
+            "frame_count": self.frame_count,
+            "latency": self.latency.snapshot()
+        }
+        if self.pipeline_stats is not None:
+            data["pipeline"] = self.pipeline_stats()
+        if self.frame_stream is not None:
+            data["frame_stream"] = self.frame_stream.snapshot()
+        if self.writer is not None:
+            data["events"] = self.writer.snapshot()
+        if self.evidence is not None:
+            data["evidence"] = self.evidence.snapshot()
+        if self.journal is not None:
+            data["journal"] = self.journal.snapshot()
+        return data
+    
+    def _send_debug_frame_b64(self, processed_frame, stats):
+        """通过 JSON 通道发送调试画面（base64 JPEG，兼容旧版调试窗口）"""
+        # 宿主还没读走上一帧：不再缩放、编码新的一帧（写入队列里也只会保留最新一帧）
+        if self.writer is not None and self.writer.backlogged("debug_frame"):
+            return
+        
+        # 高清画质（宽度调整到960px，更清晰）
+        h, w = processed_frame.shape[:2]
+        target_width = 960
+        target_height = int(h * target_width / w)
+        with perf.measure('resize'):
+            display_frame = cv2.resize(processed_frame, (target_width, target_height),
+                                       dst=self.buffers.get('debug_frame', (target_height, target_width, 3)))
+        
+        # 编码为JPEG（超高质量 95%）
+        with perf.measure('jpeg'):
+            _, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        # 转base64
+        with perf.measure('base64'):
+            img_b64 = base64.b64encode(buffer).decode('utf-8')
+        
+        # 发送debug_frame事件
+        self.emit("debug_frame", {
+            "image_b64": img_b64,
+            "status": stats['state'].lower(),
+            "count": stats['trigger_count'],
+            "duration": stats['duration']
+        })
+
+def infer(detector, output, frame, capture_time):
+    """
+    推理阶段：先做 headless 分析，只在需要时渲染
+    
+    Args:
+        detector: 检测器
+        output: 输出阶段
+        frame: 摄像头原始画面
+        capture_time: 帧的采集时间戳（time.monotonic()）
+        
+    Returns:
+        processed_frame: 渲染后的图像（未渲染时为 None）
+        stats: 统计信息
+    """
+    output.observe_frame(frame, capture_time)
+    pose_landmarks, stats = detector.analyze(frame)
+    
+    processed_frame = None
+    if output.needs_render(stats):
+        processed_frame = detector.render(frame, pose_landmarks, stats)
+    
+    return processed_frame, stats
+
+def pace(pacer, scheduler, stats):
+    """
+    按调度器选择的档位调整推理帧率，并等待到下一个截止时间
+    
+    Args:
+        pacer: 截止时间控制器
+        scheduler: 推理频率调度器
+        stats: 本帧的统计信息
+    """
+    last_level = scheduler.level
+    pacer.set_fps(scheduler.update(stats))
+    
+    if scheduler.level != last_level:
+        print(f"⏱ 推理频率: {last_level} → {scheduler.level} "
+              f"({scheduler.rates[scheduler.level]} FPS)", file=sys.stderr)
+    
+    pacer.wait()
+
+def start_frame_stream(config):
+    """
+    启动调试画面二进制通道
+    
+    Args:
+        config: 完整配置
+        
+    Returns:
+        FrameStreamServer，启动失败时返回 None（改用 JSON 通道）
+    """
+    try:
+        frame_stream = FrameStreamServer(port=config['display'].get('debug_stream_port', 0), perf=perf,
+                                         buffers=BufferPool.from_config(config))
+        frame_stream.start()
+    except OSError as e:
+        print(f"⚠️ 调试画面通道启动失败，改用 JSON 通道: {e}", file=sys.stderr)
+        return None
+    print(f"📺 调试画面通道: {frame_stream.address}", file=sys.stderr)
+    return frame_stream
+
+def apply_commands(commands, control, detector, output, config):
+    """
+    执行排队的控制命令（在两帧之间或暂停期间调用，与推理不会同时进行）
+    
+    支持的命令：
+    - {"cmd": "set", "detection": {...}, "display": {...}}: 修改检测和显示参数
+    - {"cmd": "debug_stream", "enabled": true/false}: 开关调试画面
+    - {"cmd": "reset_counter"}: 重置触发计数
+    - {"cmd": "stats"}: 立即发送一次 stats_snapshot 事件
+    
+    Args:
+        commands: 命令列表
+        control: DaemonControl（用于发送 command_ack）
+        detector: 检测器
+        output: 输出阶段
+        config: 完整配置（修改后的参数同步写回，暂停后重新开始时沿用）
+    """
+    for command in commands:
+        name = command.get('cmd')
+        try:
+            if name == 'set':
+                applied = detector.configure(command.get('detection'), command.get('display'))
+                for section, values in applied.items():
+                    config[section].update(values)
+                print(f"🔧 参数已更新: {applied}", file=sys.stderr)
+                control.acknowledge(command, applied=applied)
+            
+            elif name == 'debug_stream':
+                enabled = command.get('enabled', True)
+                if not isinstance(enabled, bool):
+                    raise ValueError("enabled 必须是 true 或 false")
+                if (enabled and output.frame_stream is None
+                        and config['display'].get('debug_channel', 'stream') == 'stream'):
+                    output.frame_stream = start_frame_stream(config)
+                output.debug_frames = enabled
+                config['display']['debug_frames'] = enabled
+                reply = {"enabled": enabled}
+                if output.frame_stream is not None:
+                    reply["stream_url"] = output.frame_stream.url
+                control.acknowledge(command, **reply)
+            
+            elif name == 'reset_counter':
+                detector.reset_counter()
+                control.acknowledge(command, trigger_count=detector.trigger_count)
+            
+            elif name == 'stats':
+                data = output.status_snapshot(output.last_stats)
+                data["detector"] = detector.get_stats()
+                data["perf"] = perf.snapshot()
+                if 'id' in command:
+                    data["id"] = command['id']
+                output.emit("stats_snapshot", data)
+                control.acknowledge(command)
+            
+            else:
+                control.acknowledge(command, ok=False, error=f"未知的控制命令: {name}")
+        
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"⚠️ 控制命令执行失败 {name}: {e}", file=sys.stderr)
+            control.acknowledge(command, ok=False, error=str(e))
+
+def run_serial(cap, detector, output, scheduler, target_fps, stop=None, commands=None):
+    """
+    串行模式：采集 → 推理 → 输出 在同一线程中依次执行
+    
+    Args:
+        cap: 已打开的摄像头
+        detector: 检测器
+        output: 输出阶段
+        scheduler: 推理频率调度器
+        target_fps: 目标帧率
+        stop: 置位时退出循环（threading.Event，常驻模式下暂停用），None 表示一直运行
+        commands: 每帧开始前调用，执行排队的控制命令（None 表示没有控制通道）
+    """
+    pacer = DeadlinePacer(target_fps)
+    reuse_buffers = detector.buffers.enabled
+    frame = None
+    
+    def pipeline_stats():
+        return {
+            "overruns": pacer.overruns,
+            "scheduler": scheduler.snapshot(),
+            "motion_gate": detector.motion_gate.snapshot(),
+            "keyframes": detector.keyframes.snapshot(),
+            "hand_stage": detector.hand_stage.snapshot(),
+            "buffers": detector.buffers.snapshot(),
+            "model": detector.pose.snapshot()
+        }
+    output.pipeline_stats = pipeline_stats
+    
+    while stop is None or not stop.is_set():
+        if commands is not None:
+            commands()
+        
+        # 缓冲池模式下读进上一帧的数组（上一帧已经处理完）
+        with perf.measure('capture'):
+            ret, frame = read_into(cap, frame if reuse_buffers else None)
+        capture_time = time.monotonic()
+        
+        if not ret:
+            print("❌ 无法读取摄像头", file=sys.stderr)
+            break
+        
+        # 使用检测器处理
+        processed_frame, stats = infer(detector, output, frame, capture_time)
+        output.handle(processed_frame, stats, capture_time)
+        
+        # 控制帧率
+        pace(pacer, scheduler, stats)
+
+def run_pipelined(cap, detector, output, scheduler, target_fps, pipeline_cfg, stop=None, commands=None):
+    """
+    流水线模式：采集线程 → 推理（当前线程）→ 输出线程
+    
+    采集线程只保留最新一帧，输出线程通过有界队列接收结果，
+    推理按截止时间控制节奏
+    
+    Args:
+        cap: 已打开的摄像头
+        detector: 检测器
+        output: 输出阶段
+        scheduler: 推理频率调度器
+        target_fps: 目标帧率
+        pipeline_cfg: 流水线配置
+        stop: 置位时退出循环（threading.Event，常驻模式下暂停用），None 表示一直运行
+        commands: 每帧推理前调用，执行排队的控制命令（None 表示没有控制通道）
+    """
+    grabber = FrameGrabber(cap, perf, reuse_buffers=detector.buffers.enabled)
+    output_queue_size = pipeline_cfg.get('output_queue_size', 2)
+    output_stage = OutputStage(output.handle, maxsize=output_queue_size)
+    # 在途的渲染结果：输出队列 + 输出线程正在处理的 1 帧 + 正在渲染的 1 帧
+    detector.render_slots.ensure(output_queue_size + 2)
+    pacer = DeadlinePacer(target_fps)
+    
+    def pipeline_stats():
+        return {
+            "captured": grabber.captured,
+            "dropped_capture": grabber.dropped,
+            "skipped_capture": grabber.skipped,
+            "dropped_output": output_stage.dropped,
+            "output_errors": output_stage.errors,
+            "overruns": pacer.overruns,
+            "scheduler": scheduler.snapshot(),
+            "motion_gate": detector.motion_gate.snapshot(),
+            "keyframes": detector.keyframes.snapshot(),
+            "hand_stage": detector.hand_stage.snapshot(),
+            "buffers": detector.buffers.snapshot(),
+            "model": detector.pose.snapshot()
+        }
+    output.pipeline_stats = pipeline_stats
+    
+    grabber.start()
+    output_stage.start()
+    print("🧵 流水线模式已启动", file=sys.stderr)
+    
+    try:
+        while stop is None or not stop.is_set():
+            frame, capture_time = grabber.get()
+            
+            if frame is None:
+                if grabber.failed:
+                    print("❌ 无法读取摄像头", file=sys.stderr)
+                    break
+                continue
+            
+            if commands is not None:
+                commands()
+            
+            if not output_stage.is_alive():
+                raise RuntimeError("输出线程已退出")
+            
+            # 使用检测器处理
+            processed_frame, stats = infer(detector, output, frame, capture_time)
+            output_stage.put(processed_frame, stats, capture_time)
+            
+            # 控制帧率（等待期间被覆盖的帧是调度器有意跳过的，不计入丢帧）
+            grabber.mark_idle()
+            pace(pacer, scheduler, stats)
+    
+    finally:
+        grabber.stop()
+        output_stage.stop()
+        grabber.join(timeout=1.0)
+        output_stage.join(timeout=2.0)
+        print(f"📉 丢帧统计: {pipeline_stats()}", file=sys.stderr)
 
 def main():
     print("========================================", file=sys.stderr)
@@ -56,122 +644,163 @@ def main():
     # 加载配置
     config = load_config()
     
+    # 事件协议（宿主通过 NOPICKIE_PROTOCOL 声明支持 v2 时使用批量紧凑格式）
+    global event_writer
+    events_cfg = config.get('events', {})
+    event_writer = EventWriter(
+        negotiate_version(events_cfg.get('protocol', 2)),
+        flush_interval=events_cfg.get('flush_interval', 0.1),
+        max_batch=events_cfg.get('max_batch', 64),
+        max_queue=events_cfg.get('max_queue', 256),
+        close_timeout=events_cfg.get('close_timeout', 2.0),
+        perf=perf
+    )
+    print(f"📡 事件协议: v{event_writer.version}", file=sys.stderr)
+    
+    # 性能计时（开销很小，默认常开）
+    perf_cfg = config.get('perf', {})
+    perf.enabled = perf_cfg.get('enabled', True)
+    
     # 创建截图目录（用户图片目录）
     screenshots_dir = Path.home() / "Pictures" / "NoPickie" / "screenshots"
     screenshots_dir.mkdir(parents=True, exist_ok=True)
     print(f"📂 截图目录: {screenshots_dir}", file=sys.stderr)
     
-    # 初始化检测器
-    try:
-        detector = HeadScratchDetector(config)
-        print("✅ 检测器已初始化", file=sys.stderr)
-    except Exception as e:
-        print(f"❌ 检测器初始化失败: {e}", file=sys.stderr)
-        sys.exit(1)
+    # stdin 控制通道：start / stop / quit 和运行中修改参数（见 apply_commands）
+    # 常驻模式下启动后等待 start，停止时只暂停采集，模型留在内存中
+    control = DaemonControl(resident='--daemon' in sys.argv, emit=send_event)
+    control.start()
+    if control.resident:
+        print("🛌 常驻模式：等待 start 命令", file=sys.stderr)
     
-    # 打开摄像头
-    cap = cv2.VideoCapture(config['camera']['device_id'])
+    # 多路模式：每个视频源一个工作进程（stop 时结束全部工作进程，start 时重新创建）
+    sources = config.get('sources') or []
+    if sources:
+        from multi_source import run_multi_source
+        try:
+            run_multi_source(config, sources, screenshots_dir, send_event, control)
+        except KeyboardInterrupt:
+            print("\n⏹ 收到中断信号", file=sys.stderr)
+        event_writer.close()
+        print("✅ 资源已清理", file=sys.stderr)
+        return
     
-    if not cap.isOpened():
-        print("❌ 无法打开摄像头", file=sys.stderr)
-        print("💡 可能需要授予摄像头权限", file=sys.stderr)
-        
-        # 发送权限需要事件到前端
-        send_event("camera_permission_needed", {
-            "message": "无法访问摄像头",
-            "help": "请在系统弹出的对话框中点击「好」允许摄像头访问，然后重新点击「启动检测」"
-        })
-        
-        # 等待一下，确保事件发送成功
-        time.sleep(0.5)
-        sys.exit(1)
+    # 后台加载检测器（导入 mediapipe、创建并预热模型），主线程同时打开摄像头
+    startup = StartupTimer(STARTUP_T0)
+    startup.mark('init')
+    loader = DetectorLoader(config, startup, perf)
+    loader.start()
     
-    print("✅ 摄像头已打开", file=sys.stderr)
-    print("🎥 开始检测...", file=sys.stderr)
+    # 调试画面通道（stream: 本机 MJPEG 二进制通道；json: 旧版 base64 事件）
+    debug_frames = config['display'].get('debug_frames', True)
+    frame_stream = None
+    if debug_frames and config['display'].get('debug_channel', 'stream') == 'stream':
+        frame_stream = start_frame_stream(config)
     
-    # 状态追踪
-    last_state = "Normal"
-    frame_count = 0
-    last_frame_send_time = 0
-    FRAME_SEND_INTERVAL = 0.2  # 每0.2秒发送一帧（5 FPS）
+    # 证据写盘线程（截图和触发前后片段在后台编码，截图目录有磁盘配额）
+    # 缓冲池模式下采集帧会被覆盖，证据线程保存前先复制
+    buffers_enabled = config.get('buffers', {}).get('enabled', True)
+    evidence = EvidenceWriter(screenshots_dir, config.get('evidence', {}), send_event, perf,
+                              copy_frames=buffers_enabled)
+    evidence.start()
+    
+    # 检测日志（触发、预警片段、会话，带按小时 / 天的聚合）
+    journal = open_journal(config.get('journal', {}), perf=perf)
+    
+    # 输出阶段（事件、调试帧、截图）
+    output = EventOutput(
+        screenshots_dir,
+        debug_frames,
+        perf_cfg.get('interval', 10.0),
+        frame_stream,
+        evidence=evidence,
+        journal=journal,
+        buffers=BufferPool(buffers_enabled)
+    )
+    
+    pipeline_cfg = config.get('pipeline', {})
+    target_fps = config['display'].get('fps', 30)
+    
+    # 自适应推理频率（没人/手离得远时降低帧率）
+    scheduler = InferenceScheduler(target_fps, config.get('scheduler', {}))
+    
+    detector = None
+    cap = None
+    session_frames = 0
+    
+    def run_commands(commands=None):
+        apply_commands(control.drain() if commands is None else commands, control, detector, output, config)
     
     try:
         while True:
-            ret, frame = cap.read()
+            # 暂停期间也执行控制命令（检测器加载完成之前的命令留到开始检测后执行）
+            if not control.wait_start(run_commands if detector is not None else None):
+                break
+            starts = control.starts
+            if startup is None:
+                startup = StartupTimer(resumed=detector is not None)
+            
+            # 打开摄像头
+            with startup.phase('camera_open'):
+                cap = open_camera(config)
+            
+            if cap is None:
+                if not control.resident:
+                    # 等待一下，确保事件发送成功
+                    time.sleep(0.5)
+                    sys.exit(1)
+                control.pause_after(starts)
+                startup = None
+                continue
+            
+            print("✅ 摄像头已打开", file=sys.stderr)
             
-            if not ret:
-                print("❌ 无法读取摄像头", file=sys.stderr)
+            # 等待检测器加载完成（常驻模式下恢复时直接复用）
+            if detector is None:
+                try:
+                    detector = loader.result()
+                    print("✅ 检测器已初始化", file=sys.stderr)
+                except Exception as e:
+                    print(f"❌ 检测器初始化失败: {e}", file=sys.stderr)
+                    sys.exit(1)
+            else:
+                detector.reset()
+            
+            output.startup = startup
+            startup = None
+            session_frames = output.frame_count
+            if journal is not None:
+                journal.start()
+            print("🎥 开始检测...", file=sys.stderr)
+            
+            if pipeline_cfg.get('threaded', True):
+                run_pipelined(cap, detector, output, scheduler, target_fps, pipeline_cfg,
+                              control.stopping, run_commands)
+            else:
+                run_serial(cap, detector, output, scheduler, target_fps, control.stopping, run_commands)
+            
+            # 退出原因在清理之前读取（清理期间可能收到新的 start）
+            if control.stopping.is_set():
+                reason = "quit" if control.quit else "stopped"
+            else:
+                reason = "camera_failed"
+            
+            cap.release()
+            cap = None
+            
+            if journal is not None:
+                journal.stop(reason, output.frame_count - session_frames)
+            
+            if control.quit or (reason == "camera_failed" and not control.resident):
                 break
             
-            # 使用检测器处理
-            processed_frame, stats = detector.process_frame(frame)
-            
-            frame_count += 1
-            current_state = stats['state']
-            
-            # 定期发送视频帧到调试窗口（控制帧率避免过载）
-            current_time = time.time()
-            if current_time - last_frame_send_time >= FRAME_SEND_INTERVAL:
-                # 高清画质（宽度调整到960px，更清晰）
-                h, w = processed_frame.shape[:2]
-                target_width = 960
-                target_height = int(h * target_width / w)
-                display_frame = cv2.resize(processed_frame, (target_width, target_height))
-                
-                # 编码为JPEG（超高质量 95%）
-                _, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                # 转base64
-                img_b64 = base64.b64encode(buffer).decode('utf-8')
-                
-                # 发送debug_frame事件
-                send_event("debug_frame", {
-                    "image_b64": img_b64,
-                    "status": current_state.lower(),
-                    "count": stats['trigger_count'],
-                    "duration": stats['duration']
-                })
-                
-                last_frame_send_time = current_time
-            
-            # 状态变化时发送事件
-            if current_state != last_state:
-                send_event("state_changed", {
-                    "state": current_state,
-                    "stats": stats
-                })
-                print(f"📊 状态变化: {last_state} → {current_state}", file=sys.stderr)
-            
-            # 检测到挠头时发送事件
-            if current_state == 'Detected' and last_state != 'Detected':
-                # 保存截图（使用完整路径）
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"screenshot_{timestamp}.jpg"
-                filepath = screenshots_dir / filename
-                cv2.imwrite(str(filepath), processed_frame)
-                
-                print(f"📸 截图已保存: {filepath}", file=sys.stderr)
-                
-                send_event("scratch_detected", {
-                    "trigger_count": stats['trigger_count'],
-                    "duration": stats['duration'],
-                    "distance": stats['distance'],
-                    "screenshot": str(filepath),
-                    "screenshot_dir": str(screenshots_dir)
-                })
-                print(f"🔔 检测到挠头！触发次数: {stats['trigger_count']}", file=sys.stderr)
-            
-            # 定期发送状态更新（每5秒）
-            if frame_count % 150 == 0:
-                send_event("status_update", {
-                    "state": current_state,
-                    "stats": stats,
-                    "frame_count": frame_count
-                })
-            
-            last_state = current_state
-            
-            # 控制帧率
-            time.sleep(1/30)
+            # 暂停（采集循环因摄像头故障退出时也进入暂停，等待下一次 start）；
+            # 退出后又收到了 start 时直接回到等待循环，重新开始检测
+            if control.pause_after(starts):
+                send_event("paused", {"reason": reason})
+                print(f"⏸ 检测已暂停（{reason}）", file=sys.stderr)
+            else:
+                print(f"▶ 检测已停止（{reason}），已收到新的 start", file=sys.stderr)
     
     except KeyboardInterrupt:
         print("\n⏹ 收到中断信号", file=sys.stderr)
@@ -181,9 +810,62 @@ def main():
     
     finally:
         # 清理
-        cap.release()
-        detector.cleanup()
+        if cap is not None:
+            cap.release()
+        if detector is not None:
+            detector.cleanup()
+        if output.frame_stream is not None:
+            output.frame_stream.stop()
+        evidence.stop()
+        if journal is not None:
+            journal.stop("interrupted", output.frame_count - session_frames)
+            journal.close()
+        event_writer.close()
         print("✅ 资源已清理", file=sys.stderr)
 
+def open_camera(config):
+    """
+    打开摄像头（或 camera.source 配置的视频文件 / 合成画面），并发送实际协商的采集参数
+    
+    Args:
+        config: 完整配置
+        
+    Returns:
+        与 cv2.VideoCapture 接口一致的对象，打不开时发送 camera_permission_needed
+        （视频文件 / 合成画面为 source_error）事件并返回 None
+    """
+    camera_cfg = config['camera']
+    try:
+        cap = open_capture(camera_cfg)
+    except ValueError as e:
+        print(f"❌ 采集配置错误: {e}", file=sys.stderr)
+        send_event("source_error", {"message": str(e)})
+        return None
+    
+    if cap is not None:
+        info = capture_info(cap, camera_cfg)
+        send_event("camera_opened", info)
+        negotiated = info['negotiated']
+        print(f"📷 采集参数: {negotiated['width']}x{negotiated['height']} @ {negotiated['fps']} FPS, "
+              f"{negotiated['format']}, 缓冲 {negotiated['buffer_size']} ({negotiated['backend']})", file=sys.stderr)
+        for key, values in info['mismatch'].items():
+            print(f"⚠️ 摄像头不支持 {key}={values['requested']}，实际为 {values['actual']}", file=sys.stderr)
+        return cap
+    
+    if camera_cfg.get('source', 'device') != 'device':
+        print("❌ 无法打开视频源", file=sys.stderr)
+        send_event("source_error", {"message": "无法打开视频源"})
+        return None
+    
+    print("❌ 无法打开摄像头", file=sys.stderr)
+    print("💡 可能需要授予摄像头权限", file=sys.stderr)
+    
+    # 发送权限需要事件到前端
+    send_event("camera_permission_needed", {
+        "message": "无法访问摄像头",
+        "help": "请在系统弹出的对话框中点击「好」允许摄像头访问，然后重新点击「启动检测」"
+    })
+    return None
+
 if __name__ == '__main__':
     main()
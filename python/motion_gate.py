@@ -0,0 +1,184 @@
+"""
+NoPickie - 运动门控
+人坐着不动时相邻帧几乎一样，没必要每帧都跑姿态模型：
+
+把画面缩小、转灰度后与上一次推理时的画面做差，只看上次关键点中头部和双手附近的区域；
+变化像素比例低于阈值时复用上一次的关键点和状态，并且最多隔 max_skip_seconds 强制推理一次
+
+头部区域的变化比例单独记录（head_motion）：关键帧模式下头部区域有变化时不等下一个关键帧，
+本帧直接推理（手从别处直接伸向头部时，匀速模型预测不到）
+
+强制推理时对比复用的结果和新结果，差别超过 risk_distance 记为一次"过期"，
+stale_rate 即门控可能漏检的风险估计，可以配合 replay.py 调参
+"""
+
+import cv2
+import numpy as np
+
+from buffers import BufferPool
+from geometry import NOSE, LEFT_EAR, RIGHT_EAR, HAND_INDICES
+
+
+# 参与运动检测的关键点：头部（鼻子、双耳）和双手
+HEAD_INDICES = [NOSE, LEFT_EAR, RIGHT_EAR]
+REGION_INDICES = HEAD_INDICES + HAND_INDICES
+
+
+class MotionGate:
+    """运动门控（在推理线程中使用，不加锁）"""
+
+    def __init__(self, config, buffers=None):
+        """
+        Args:
+            config: motion_gate 配置字典
+            buffers: 缓冲池（缩小画面、差分和参考画面复用同一块内存），None 表示每帧分配
+        """
+        self.buffers = buffers or BufferPool(enabled=False)
+        self.enabled = config.get('enabled', True)
+        self.scale_width = config.get('scale_width', 160)  # 差分画面的宽度（像素）
+        self.pixel_threshold = config.get('pixel_threshold', 12)  # 灰度差超过该值的像素算作变化
+        self.motion_threshold = config.get('motion_threshold', 0.02)  # 区域内变化像素比例低于该值时跳过推理
+        self.region_radius = config.get('region_radius', 0.15)  # 关键点周围区域的半径（相对画面宽度）
+        self.max_skip_seconds = config.get('max_skip_seconds', 0.5)  # 最长连续跳过时间
+        self.risk_distance = config.get('risk_distance', 0.05)  # 强制推理时距离变化超过该值记为过期
+
+        self._reference = None  # 上一次推理时的缩小灰度画面
+        self._last_refresh = 0.0
+        self.forced = False  # 本帧是否是到期后的强制推理（由检测器在推理后调用 verify）
+
+        # 统计信息
+        self.frames = 0
+        self.skipped = 0
+        self.forced_refreshes = 0
+        self.stale_refreshes = 0
+        self.motion = None
+        self.head_motion = None  # 本帧头部区域的变化比例（没有计算时为 None）
+
+    def check(self, frame, points, now):
+        """
+        判断本帧是否可以跳过推理
+
+        Args:
+            frame: 摄像头原始画面（BGR）
+            points: 上一次推理得到的关键点（已镜像），没有人体时为 None（检测整个画面）
+            now: 当前时间（检测器时钟，秒）
+
+        Returns:
+            bool: True 表示复用上一次的结果
+        """
+        self.frames += 1
+        self.forced = False
+        self.head_motion = None
+        small = self._downscale(frame)
+
+        if self._reference is None or self._reference.shape != small.shape:
+            return self._refresh(small, now)
+        # 到期强制推理时也计算变化比例（head_motion 供关键帧判断）
+        self.motion = self._motion(small, points)
+        if now - self._last_refresh >= self.max_skip_seconds:
+            self.forced = True
+            self.forced_refreshes += 1
+            return self._refresh(small, now)
+        if self.motion >= self.motion_threshold:
+            return self._refresh(small, now)
+
+        self.skipped += 1
+        return True
+
+    def head_moved(self):
+        """
+        本帧头部区域是否有变化（超过 motion_threshold）
+
+        Returns:
+            bool: 门控没有运行或没有计算变化比例时为 False
+        """
+        return self.head_motion is not None and self.head_motion >= self.motion_threshold
+
+    def verify(self, reused_distance, distance):
+        """
+        强制推理后对比复用的距离和新距离（估计漏检风险）
+
+        Args:
+            reused_distance: 跳过期间复用的距离（None 表示当时没有人体）
+            distance: 本次推理得到的距离（None 表示没有人体）
+        """
+        if (reused_distance is None) != (distance is None):
+            self.stale_refreshes += 1
+        elif distance is not None and abs(distance - reused_distance) > self.risk_distance:
+            self.stale_refreshes += 1
+
+    def reset(self):
+        """清空参考画面（下一帧一定推理）"""
+        self._reference = None
+
+    def _refresh(self, small, now):
+        # 复用缓冲区时 small 下一帧会被覆盖，参考画面复制到单独的缓冲区
+        reference = self.buffers.get('gate_reference', small.shape)
+        if reference is None:
+            self._reference = small
+        else:
+            np.copyto(reference, small)
+            self._reference = reference
+        self._last_refresh = now
+        return False
+
+    def _downscale(self, frame):
+        """缩小并转灰度"""
+        h, w = frame.shape[:2]
+        size = (self.scale_width, max(1, int(h * self.scale_width / w)))
+        small = cv2.resize(frame, size, dst=self.buffers.get('gate_resized', (size[1], size[0], 3)),
+                           interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self.buffers.get('gate_gray', small.shape[:2]))
+
+    def _motion(self, small, points):
+        """
+        计算变化像素比例（头部和双手区域中的最大值，头部区域的最大值另存到 head_motion）
+
+        Returns:
+            float: 0-1
+        """
+        # 变化像素记为 255（uint8 掩码，可以原地计算）
+        diff = cv2.absdiff(small, self._reference, dst=self.buffers.get('gate_diff', small.shape))
+        _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=diff)
+        if points is None:
+            # 没有关键点时把画面分成 4x4 格，取变化最大的一格（局部运动不会被整幅画面平均掉）
+            tiles = cv2.resize(changed, (4, 4), dst=self.buffers.get('gate_tiles', (4, 4)),
+                               interpolation=cv2.INTER_AREA)
+            return float(tiles.max()) / 255
+
+        h, w = changed.shape
+        radius = max(1, int(self.region_radius * w))
+        motion = 0.0
+        head_motion = 0.0
+        for index in REGION_INDICES:
+            # 关键点已镜像，换回原始画面坐标
+            cx = int((1.0 - points[index, 0]) * w)
+            cy = int(points[index, 1] * h)
+            x0, x1 = max(0, cx - radius), min(w, cx + radius)
+            y0, y1 = max(0, cy - radius), min(h, cy + radius)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            region = float(changed[y0:y1, x0:x1].mean()) / 255
+            motion = max(motion, region)
+            if index in HEAD_INDICES:
+                head_motion = max(head_motion, region)
+        self.head_motion = head_motion
+        return motion
+
+    def snapshot(self):
+        """
+        获取门控统计
+
+        Returns:
+            dict: 跳过率、强制推理次数、过期率（漏检风险）、最近一次的变化比例
+        """
+        return {
+            'enabled': self.enabled,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            'forced_refreshes': self.forced_refreshes,
+            'stale_refreshes': self.stale_refreshes,
+            'stale_rate': round(self.stale_refreshes / self.forced_refreshes, 3) if self.forced_refreshes else 0.0,
+            'motion': round(self.motion, 4) if self.motion is not None else None
+        }
@@ -0,0 +1,497 @@
+"""
+NoPickie - 多路视频源
+每个摄像头 / 视频文件在独立的工作进程中运行（各自一个检测器和 Pose 实例），
+避免 GIL 和 MediaPipe 的图线程互相争抢；工作进程的事件通过队列汇总到主进程，
+带上 source 字段后统一从 stdout 发出，并定期发送各路的健康状态（sources_health）
+
+配置示例：
+    "sources": [
+        {"id": "desk", "device": 0},
+        {"id": "door", "device": 1},
+        {"id": "clip", "file": "session.mp4", "realtime": false},
+        {"id": "synth", "synthetic": {"pattern": "moving"}, "width": 1280, "height": 720}
+    ]
+摄像头和合成画面可以带 capture.py 的采集参数（width / height / fps / format / buffer_size / backend）
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from pathlib import Path
+
+
+HEARTBEAT_INTERVAL = 1.0  # 工作进程上报心跳的间隔（秒）
+HEALTH_INTERVAL = 5.0     # 主进程发送 sources_health 的间隔（秒）
+STALE_SECONDS = 5.0       # 超过该时间没有心跳视为卡住
+STOP_TIMEOUT = 5.0        # 停止时等待工作进程退出的时间（秒）
+
+# 视频源配置中传给 capture.open_capture 的采集参数
+CAPTURE_KEYS = ('backend', 'width', 'height', 'fps', 'format', 'buffer_size')
+
+
+def normalize_sources(sources):
+    """
+    规范化视频源配置
+
+    Args:
+        sources: 列表，元素可以是设备号（int）、视频路径（str）或配置字典
+
+    Returns:
+        list: [{"id", "device" / "file" / "synthetic", "realtime", ...采集参数}]
+    """
+    result = []
+    seen = set()
+    for index, source in enumerate(sources):
+        if isinstance(source, int):
+            source = {'device': source}
+        elif isinstance(source, str):
+            source = {'file': source}
+        else:
+            source = dict(source)
+
+        if 'file' in source:
+            source.setdefault('id', Path(source['file']).stem)
+            source.setdefault('realtime', True)
+        elif 'synthetic' in source:
+            if not isinstance(source['synthetic'], dict):
+                source['synthetic'] = {}
+            source.setdefault('id', 'synthetic')
+            source['realtime'] = True
+        else:
+            source.setdefault('device', 0)
+            source.setdefault('id', f"camera{source['device']}")
+            source['realtime'] = True
+
+        if source['id'] in seen:
+            source['id'] = f"{source['id']}_{index}"
+        seen.add(source['id'])
+        result.append(source)
+    return result
+
+
+def capture_config(source):
+    """
+    视频源配置 → capture.open_capture 使用的 camera 配置
+
+    视频文件由工作进程自己按文件帧率控制节奏，这里不再按实时出帧
+    """
+    camera = {key: source[key] for key in CAPTURE_KEYS if key in source}
+    if 'file' in source:
+        camera.update(source='file', file=str(source['file']), realtime=False)
+    elif 'synthetic' in source:
+        camera.update(source='synthetic', synthetic=source['synthetic'])
+    else:
+        camera.update(source='device', device_id=source['device'])
+    return camera
+
+
+def source_worker(source, config, screenshots_dir, events, stop):
+    """
+    工作进程入口：打开视频源并运行检测循环
+
+    Args:
+        source: 规范化后的视频源配置
+        config: 完整配置
+        screenshots_dir: 截图目录
+        events: 进程间事件队列，元素为 (source_id, 事件类型, 数据, 单调时钟时间)
+        stop: 停止信号（multiprocessing.Event）
+    """
+    source_id = source['id']
+
+    def emit(event_type, data, t=None):
+        # 单调时钟是系统级的，跨进程可以直接比较
+        events.put((source_id, event_type, data, time.monotonic() if t is None else t))
+
+    try:
+        _run_source(source, config, screenshots_dir, emit, stop)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        emit('source_error', {'message': str(e)})
+
+
+def _run_source(source, config, screenshots_dir, emit, stop):
+    """单路视频源的检测循环（在工作进程中执行）"""
+    import cv2
+
+    from detector import HeadScratchDetector
+    from evidence import EvidenceWriter
+    from buffers import read_into
+    from capture import open_capture, capture_info
+    from journal import open_journal
+    from main_simple import EventOutput, infer, pace, perf
+    from pipeline import DeadlinePacer, InferenceScheduler
+    from replay import ReplayClock
+
+    source_id = source['id']
+    is_file = 'file' in source
+    camera = capture_config(source)
+    cap = open_capture(camera)
+    if cap is None:
+        emit('source_error', {'message': "无法打开视频源"})
+        return
+
+    perf_cfg = config.get('perf', {})
+    perf.enabled = perf_cfg.get('enabled', True)
+    target_fps = config['display'].get('fps', 30)
+
+    # 视频文件按文件时间轴驱动检测器（不按实时播放时也能得到正确的持续时长）
+    clock = time.time
+    file_fps = 0.0
+    if is_file:
+        file_fps = cap.get(cv2.CAP_PROP_FPS) or target_fps
+        clock = ReplayClock()
+
+    detector = HeadScratchDetector(config, clock=clock, perf=perf)
+    reuse_buffers = detector.buffers.enabled
+    evidence = EvidenceWriter(screenshots_dir, config.get('evidence', {}), emit, perf,
+                              copy_frames=reuse_buffers)
+    evidence.start()
+    journal = open_journal(config.get('journal', {}), source_id, perf)
+    output = EventOutput(
+        Path(screenshots_dir),
+        debug_frames=False,
+        perf_interval=perf_cfg.get('interval', 10.0),
+        emit=emit,
+        screenshot_prefix=f"screenshot_{source_id}",
+        evidence=evidence,
+        journal=journal
+    )
+
+    # 摄像头：自适应推理频率；视频文件：按文件帧率播放，或不限速（realtime=false）
+    scheduler = None
+    pacer = None
+    if not is_file:
+        scheduler = InferenceScheduler(target_fps, config.get('scheduler', {}))
+        pacer = DeadlinePacer(target_fps)
+        output.pipeline_stats = lambda: {
+            "overruns": pacer.overruns,
+            "scheduler": scheduler.snapshot(),
+            "motion_gate": detector.motion_gate.snapshot(),
+            "keyframes": detector.keyframes.snapshot(),
+            "hand_stage": detector.hand_stage.snapshot(),
+            "buffers": detector.buffers.snapshot(),
+            "model": detector.pose.snapshot()
+        }
+    elif source['realtime']:
+        pacer = DeadlinePacer(file_fps)
+
+    emit('source_started', {
+        'kind': camera['source'] if camera['source'] != 'device' else 'camera',
+        'pid': os.getpid(),
+        'fps': file_fps or target_fps,
+        'capture': capture_info(cap, camera)['negotiated']
+    })
+
+    frames = 0
+    reason = 'stopped'
+    last_heartbeat = time.monotonic()
+    heartbeat_frames = 0
+    stats = None
+    frame = None
+    if journal is not None:
+        journal.start()
+
+    try:
+        while not stop.is_set():
+            # 缓冲池模式下读进上一帧的数组（上一帧已经处理完）
+            ret, frame = read_into(cap, frame if reuse_buffers else None)
+            capture_time = time.monotonic()
+            if not ret:
+                reason = 'eof' if is_file else 'camera_failed'
+                break
+
+            if is_file:
+                clock.set(frames / file_fps)
+            frames += 1
+
+            processed_frame, stats = infer(detector, output, frame, capture_time)
+            output.handle(processed_frame, stats, capture_time)
+
+            now = time.monotonic()
+            if now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                emit('heartbeat', {
+                    'frames': frames,
+                    'fps': round((frames - heartbeat_frames) / (now - last_heartbeat), 1),
+                    'state': stats['state'],
+                    'trigger_count': stats['trigger_count'],
+                    'model_complexity': stats['model_complexity']
+                })
+                last_heartbeat = now
+                heartbeat_frames = frames
+
+            if scheduler is not None:
+                pace(pacer, scheduler, stats)
+            elif pacer is not None:
+                pacer.wait()
+    finally:
+        cap.release()
+        detector.cleanup()
+        evidence.stop()
+        if journal is not None:
+            journal.stop(reason, frames)
+            journal.close()
+
+    emit('source_stopped', {
+        'reason': reason,
+        'frames': frames,
+        'trigger_count': stats['trigger_count'] if stats else 0
+    })
+
+
+class SourceHealth:
+    """单路视频源的健康状态（由主进程根据心跳和进程状态维护）"""
+
+    def __init__(self, source, process):
+        self.source = source
+        self.process = process
+        self.started = False
+        self.stopped_reason = None
+        self.error = None
+        self.frames = 0
+        self.fps = 0.0
+        self.state = None
+        self.trigger_count = 0
+        self.model_complexity = None
+        self.last_seen = time.monotonic()
+
+    def on_event(self, event_type, data):
+        """根据工作进程的事件更新状态"""
+        self.last_seen = time.monotonic()
+        if event_type == 'source_started':
+            self.started = True
+        elif event_type == 'heartbeat':
+            self.frames = data['frames']
+            self.fps = data['fps']
+            self.state = data['state']
+            self.trigger_count = data['trigger_count']
+            self.model_complexity = data['model_complexity']
+        elif event_type == 'source_stopped':
+            self.stopped_reason = data['reason']
+            self.frames = data['frames']
+            self.trigger_count = data['trigger_count']
+        elif event_type == 'source_error':
+            self.error = data['message']
+
+    @property
+    def status(self):
+        """running / starting / stalled / stopped / failed"""
+        if self.error is not None or (self.process.exitcode not in (None, 0) and self.stopped_reason is None):
+            return 'failed'
+        if self.stopped_reason is not None or not self.process.is_alive():
+            return 'stopped'
+        if not self.started:
+            return 'starting'
+        if time.monotonic() - self.last_seen > STALE_SECONDS:
+            return 'stalled'
+        return 'running'
+
+    def snapshot(self):
+        """
+        获取健康状态
+
+        Returns:
+            dict: 状态、帧数、帧率、最近一次心跳距今的秒数等
+        """
+        return {
+            'source': self.source['id'],
+            'kind': 'file' if 'file' in self.source else 'camera',
+            'status': self.status,
+            'pid': self.process.pid,
+            'exitcode': self.process.exitcode,
+            'frames': self.frames,
+            'fps': self.fps,
+            'state': self.state,
+            'trigger_count': self.trigger_count,
+            'model_complexity': self.model_complexity,
+            'last_seen_s': round(time.monotonic() - self.last_seen, 1),
+            'stopped_reason': self.stopped_reason,
+            'error': self.error
+        }
+
+
+class SourcePool:
+    """
+    多路视频源进程池：每路一个工作进程，事件汇总到同一个队列
+
+    使用 spawn 方式创建进程（不继承主进程的 MediaPipe 图和线程状态）
+    """
+
+    def __init__(self, sources, config, screenshots_dir):
+        """
+        Args:
+            sources: normalize_sources() 的结果
+            config: 完整配置
+            screenshots_dir: 截图目录
+        """
+        self.sources = sources
+        self.config = config
+        self.screenshots_dir = str(screenshots_dir)
+
+        context = multiprocessing.get_context('spawn')
+        self.events = context.Queue()
+        self.stop_event = context.Event()
+        self.health = {}
+
+        for source in sources:
+            process = context.Process(
+                target=source_worker,
+                args=(source, config, self.screenshots_dir, self.events, self.stop_event),
+                name=f"NoPickie-{source['id']}",
+                daemon=True
+            )
+            self.health[source['id']] = SourceHealth(source, process)
+
+    def start(self):
+        """启动全部工作进程"""
+        for health in self.health.values():
+            health.process.start()
+
+    @property
+    def alive(self):
+        """是否还有工作进程在运行"""
+        return any(health.process.is_alive() for health in self.health.values())
+
+    def poll(self, timeout):
+        """
+        取出一个工作进程事件
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            (source_id, 事件类型, 数据, 单调时钟时间)，超时返回 None
+        """
+        try:
+            item = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.health[item[0]].on_event(item[1], item[2])
+        return item
+
+    def snapshot(self):
+        """
+        获取各路健康状态
+
+        Returns:
+            dict: 各路状态列表、CPU 核数
+        """
+        return {
+            'sources': [health.snapshot() for health in self.health.values()],
+            'cpu_count': os.cpu_count()
+        }
+
+    def stop(self):
+        """通知全部工作进程退出，超时未退出的强制结束"""
+        self.stop_event.set()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for health in self.health.values():
+            health.process.join(max(0.0, deadline - time.monotonic()))
+            if health.process.is_alive():
+                health.process.terminate()
+
+
+def run_multi_source(config, sources, screenshots_dir, send_event, control=None):
+    """
+    多路模式主循环：转发工作进程事件，定期发送健康状态
+
+    有控制通道时响应 start / stop / quit：stop 结束全部工作进程（释放摄像头），
+    start 重新创建进程池；常驻模式下启动后先等待 start
+
+    Args:
+        config: 完整配置
+        sources: 视频源配置列表（见 normalize_sources）
+        screenshots_dir: 截图目录
+        send_event: 事件输出函数（见 main_simple.send_event）
+        control: startup.DaemonControl，None 表示一直运行到全部工作进程退出
+    """
+    sources = normalize_sources(sources)
+    if len(sources) > (os.cpu_count() or 1):
+        print(f"⚠️ 视频源数量（{len(sources)}）超过 CPU 核数（{os.cpu_count()}），"
+              f"各路帧率会下降", file=sys.stderr)
+
+    pool = None
+
+    def run_commands(commands):
+        _reply_commands(commands, control, pool, send_event)
+
+    while True:
+        if control is not None and not control.wait_start(run_commands):
+            break
+        starts = control.starts if control is not None else 0
+
+        pool = SourcePool(sources, config, screenshots_dir)
+        pool.start()
+        print(f"🎥 多路模式已启动: {', '.join(s['id'] for s in pool.sources)}", file=sys.stderr)
+
+        next_health_time = time.monotonic() + HEALTH_INTERVAL
+        try:
+            while not (stopped := control is not None and control.stopping.is_set()):
+                if control is not None:
+                    run_commands(control.drain())
+
+                item = pool.poll(timeout=0.5)
+                if item is not None:
+                    _forward(item, send_event)
+
+                now = time.monotonic()
+                if now >= next_health_time:
+                    send_event("sources_health", pool.snapshot())
+                    next_health_time = now + HEALTH_INTERVAL
+
+                # 全部工作进程已退出且队列已取空
+                if item is None and not pool.alive:
+                    break
+        finally:
+            pool.stop()
+            # 转发退出前残留的事件
+            while (item := pool.poll(timeout=0.1)) is not None:
+                _forward(item, send_event)
+            send_event("sources_health", pool.snapshot())
+
+        if control is None or control.quit:
+            break
+        # 退出原因取自循环退出时（停止工作进程期间可能收到新的 start）
+        if stopped:
+            reason = "stopped"
+        else:
+            reason = "sources_exited"
+            if not control.resident:
+                break
+
+        # 暂停（全部工作进程退出时也进入暂停，等待下一次 start）；之后又收到 start 时重新创建进程池
+        if control.pause_after(starts):
+            send_event("paused", {"reason": reason})
+            print(f"⏸ 多路检测已暂停（{reason}）", file=sys.stderr)
+        else:
+            print(f"▶ 多路检测已停止（{reason}），已收到新的 start", file=sys.stderr)
+
+
+def _reply_commands(commands, control, pool, send_event):
+    """
+    多路模式下的排队命令：stats 发送各路健康状态，其余命令（参数在各工作进程中，主进程无法修改）返回失败
+
+    Args:
+        commands: 命令列表
+        control: DaemonControl（用于发送 command_ack）
+        pool: 当前的 SourcePool（尚未启动时为 None）
+        send_event: 事件输出函数
+    """
+    for command in commands:
+        if command.get('cmd') == 'stats':
+            data = {"sources_health": pool.snapshot() if pool is not None else None}
+            if 'id' in command:
+                data["id"] = command['id']
+            send_event("stats_snapshot", data)
+            control.acknowledge(command)
+        else:
+            control.acknowledge(command, ok=False, error=f"多路模式不支持该命令: {command.get('cmd')}")
+
+
+def _forward(item, send_event):
+    """把工作进程事件加上 source 字段后发出（心跳只用于健康状态，不转发）"""
+    source_id, event_type, data, t = item
+    if event_type != 'heartbeat':
+        send_event(event_type, {"source": source_id, **data}, t)
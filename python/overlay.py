@@ -0,0 +1,118 @@
+"""
+NoPickie - 叠加层绘制
+信息面板和标签文字的缓存合成：半透明背景只混合面板区域，
+文字预先渲染成掩码，内容不变时直接复用
+"""
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class _TextSprite:
+    """预先渲染好的文字掩码"""
+
+    __slots__ = ('mask', 'offset_x', 'offset_y')
+
+    def __init__(self, text, font, font_scale, thickness):
+        (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        # getTextSize 不包含字形的上下伸出部分和笔画宽度，四周留足余量
+        pad = baseline + thickness + 1
+
+        self.mask = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad), dtype=np.uint8)
+        cv2.putText(self.mask, text, (pad, pad + text_h), font, font_scale, 255, thickness)
+        self.mask = self.mask.astype(bool)
+
+        # putText 的坐标是基线左端，掩码左上角相对它的偏移
+        self.offset_x = -pad
+        self.offset_y = -(pad + text_h)
+
+
+class OverlayCompositor:
+    """
+    叠加层合成器
+
+    - blend_rect: 只对矩形区域做半透明混合（不再复制整帧）
+    - put_text: 同样的文字只渲染一次；文字完整在画面内时与 cv2.putText 逐像素一致，
+      被画面边缘截断时 cv2.putText 自身的裁剪会让截断处有个别像素不同
+    """
+
+    def __init__(self, max_sprites=256):
+        """
+        Args:
+            max_sprites: 文字缓存的最大条目数（超出时淘汰最久未使用的）
+        """
+        self.max_sprites = max_sprites
+        self._sprites = OrderedDict()
+        self._backgrounds = {}
+
+    def blend_rect(self, frame, pt1, pt2, color, alpha):
+        """
+        半透明矩形：效果等同于在整帧副本上画实心矩形后用 addWeighted 混合
+
+        Args:
+            frame: 要绘制的图像（原地修改）
+            pt1: 左上角 (x, y)
+            pt2: 右下角 (x, y)，包含在内
+            color: 背景颜色 (B, G, R)
+            alpha: 背景不透明度
+        """
+        h, w = frame.shape[:2]
+        x0, y0 = max(0, pt1[0]), max(0, pt1[1])
+        x1, y1 = min(w, pt2[0] + 1), min(h, pt2[1] + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        roi = frame[y0:y1, x0:x1]
+        key = (roi.shape, tuple(color))
+        background = self._backgrounds.get(key)
+        if background is None:
+            background = np.empty(roi.shape, dtype=frame.dtype)
+            background[:] = color
+            self._backgrounds[key] = background
+
+        cv2.addWeighted(background, alpha, roi, 1 - alpha, 0, dst=roi)
+
+    def put_text(self, frame, text, org, font, font_scale, color, thickness):
+        """
+        绘制文字（参数与 cv2.putText 相同，只支持默认线型）
+
+        Args:
+            frame: 要绘制的图像（原地修改）
+            text: 文字内容
+            org: 基线左端坐标 (x, y)
+            font: 字体
+            font_scale: 字号
+            color: 颜色 (B, G, R)
+            thickness: 线宽
+        """
+        sprite = self._get_sprite(text, font, font_scale, thickness)
+
+        h, w = frame.shape[:2]
+        mask_h, mask_w = sprite.mask.shape
+        x = org[0] + sprite.offset_x
+        y = org[1] + sprite.offset_y
+
+        # 裁剪到画面范围内
+        fx0, fy0 = max(0, x), max(0, y)
+        fx1, fy1 = min(w, x + mask_w), min(h, y + mask_h)
+        if fx0 >= fx1 or fy0 >= fy1:
+            return
+
+        mask = sprite.mask[fy0 - y:fy1 - y, fx0 - x:fx1 - x]
+        frame[fy0:fy1, fx0:fx1][mask] = color
+
+    def _get_sprite(self, text, font, font_scale, thickness):
+        """获取（或渲染并缓存）文字掩码"""
+        key = (text, font, font_scale, thickness)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+
+        sprite = _TextSprite(text, font, font_scale, thickness)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
@@ -0,0 +1,114 @@
+"""
+NoPickie - 性能计时模块
+各阶段耗时的滚动窗口统计（p50/p95/p99），开销很小，可以在生产环境常开
+"""
+
+import time
+from collections import deque
+
+
+class _StageMeasure:
+    """单个阶段的计时上下文"""
+
+    __slots__ = ('recorder', 'stage', 'start')
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullMeasure:
+    """关闭计时时使用的空上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_MEASURE = _NullMeasure()
+
+
+class PerfRecorder:
+    """
+    各阶段耗时记录器
+
+    每个阶段保留最近 window 个样本（滚动窗口），输出时再排序求分位数；
+    采集、推理、输出线程可以同时写入（deque.append 本身是线程安全的）
+    """
+
+    def __init__(self, window=300, enabled=True):
+        """
+        Args:
+            window: 每个阶段保留的样本数
+            enabled: 是否启用计时
+        """
+        self.window = window
+        self.enabled = enabled
+        self._samples = {}
+        self._counts = {}
+
+    def measure(self, stage):
+        """
+        计时上下文：with perf.measure('pose'): ...
+
+        Args:
+            stage: 阶段名称
+        """
+        if not self.enabled:
+            return _NULL_MEASURE
+        return _StageMeasure(self, stage)
+
+    def add(self, stage, seconds):
+        """
+        记录一次耗时
+
+        Args:
+            stage: 阶段名称
+            seconds: 耗时（秒）
+        """
+        if not self.enabled:
+            return
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples.setdefault(stage, deque(maxlen=self.window))
+        samples.append(seconds)
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def snapshot(self):
+        """
+        计算各阶段滚动窗口内的耗时分位数
+
+        Returns:
+            dict: {stage: {count, p50_ms, p95_ms, p99_ms, max_ms}}
+        """
+        result = {}
+        for stage, samples in list(self._samples.items()):
+            values = sorted(samples)
+            if not values:
+                continue
+            last = len(values) - 1
+            result[stage] = {
+                'count': self._counts.get(stage, 0),
+                'p50_ms': round(values[int(last * 0.50)] * 1000, 2),
+                'p95_ms': round(values[int(last * 0.95)] * 1000, 2),
+                'p99_ms': round(values[int(last * 0.99)] * 1000, 2),
+                'max_ms': round(values[last] * 1000, 2)
+            }
+        return result
+
+
+# 未传入计时器时使用（不计时）
+NULL_PERF = PerfRecorder(enabled=False)
@@ -0,0 +1,390 @@
+"""
+NoPickie - 流水线调度模块
+采集 / 推理 / 输出 三段式流水线，各段之间使用有界队列连接
+"""
+
+import queue
+import sys
+import threading
+import time
+import traceback
+
+from buffers import read_into
+from perf import NULL_PERF
+
+
+class FrameGrabber(threading.Thread):
+    """
+    摄像头采集线程
+
+    只保留最新一帧（latest-frame-wins）：推理跟不上时旧帧直接丢弃，
+    避免帧堆积在驱动缓冲区里造成延迟
+
+    复用缓冲区时是三缓冲：正在读入的、最新的、推理线程持有的各一块；
+    被丢弃的帧和推理线程取下一帧时交回的上一帧重新用于读入，稳定后不再分配
+
+    被覆盖的帧分两类统计：推理线程按调度档位主动等待期间被覆盖的记为 skipped（降低推理帧率的预期结果），
+    其余记为 dropped（推理跟不上采集，真正的过载）
+    """
+
+    def __init__(self, cap, perf=NULL_PERF, reuse_buffers=False):
+        """
+        初始化采集线程
+
+        Args:
+            cap: 已打开的 cv2.VideoCapture
+            perf: 各阶段耗时记录器
+            reuse_buffers: 是否复用帧缓冲区（推理线程调用 get() 即表示上一帧已经用完）
+        """
+        super().__init__(name="FrameGrabber", daemon=True)
+        self.cap = cap
+        self.perf = perf
+        self.reuse_buffers = reuse_buffers
+        self._cond = threading.Condition()
+        self._frame = None
+        self._capture_time = 0.0
+        self._running = True
+        self._free = []     # 可以重新读入的数组
+        self._held = None   # 推理线程正在使用的帧
+        self._idle = False  # 推理线程正在按节奏主动等待（见 mark_idle）
+
+        # 统计信息
+        self.captured = 0   # 采集到的总帧数
+        self.dropped = 0    # 推理线程忙时未被消费就被覆盖的帧数
+        self.skipped = 0    # 推理线程主动等待时被覆盖的帧数（调度器降低了推理帧率）
+        self.failed = False  # 摄像头读取失败
+
+    def run(self):
+        while self._running:
+            buffer = None
+            if self.reuse_buffers:
+                with self._cond:
+                    buffer = self._free.pop() if self._free else None
+            with self.perf.measure('capture'):
+                ret, frame = read_into(self.cap, buffer)
+            # 采集时间戳（glass-to-event 延迟的起点）
+            capture_time = time.monotonic()
+
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+
+                if self._frame is not None:
+                    if self._idle:
+                        self.skipped += 1
+                    else:
+                        self.dropped += 1
+                    if self.reuse_buffers:
+                        self._free.append(self._frame)
+                self._frame = frame
+                self._capture_time = capture_time
+                self.captured += 1
+                self._cond.notify_all()
+
+    def get(self, timeout=1.0):
+        """
+        取出最新一帧（取出后清空槽位）
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            (frame, capture_time)，超时或采集已停止时返回 (None, None)；
+            复用缓冲区时 frame 在下一次 get() 之后会被覆盖，需要保留的话由调用方复制
+        """
+        with self._cond:
+            self._idle = False
+            if self._frame is None and self._running:
+                self._cond.wait(timeout)
+            frame = self._frame
+            capture_time = self._capture_time
+            self._frame = None
+            if self.reuse_buffers and frame is not None:
+                if self._held is not None:
+                    self._free.append(self._held)
+                self._held = frame
+
+        if frame is None:
+            return None, None
+        return frame, capture_time
+
+    def mark_idle(self):
+        """推理线程开始按节奏等待（下一次 get() 之前被覆盖的帧记为 skipped，不算丢帧）"""
+        with self._cond:
+            self._idle = True
+
+    def stop(self):
+        """停止采集线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+
+class DeadlinePacer:
+    """
+    按截止时间控制节奏（替代固定 sleep）
+
+    每个周期只睡到下一个截止时间；处理耗时已经超过一个周期时不再补偿，
+    直接以当前时间为新的起点，避免落后后连续“追帧”
+    """
+
+    def __init__(self, target_fps):
+        """
+        Args:
+            target_fps: 目标帧率，<= 0 表示不限速
+        """
+        self.period = 1.0 / target_fps if target_fps > 0 else 0.0
+        self.next_deadline = time.monotonic() + self.period
+        self.overruns = 0  # 超过截止时间的周期数
+
+    def set_fps(self, target_fps):
+        """
+        调整目标帧率（下一个截止时间按新周期重新计算）
+
+        Args:
+            target_fps: 目标帧率，<= 0 表示不限速
+        """
+        period = 1.0 / target_fps if target_fps > 0 else 0.0
+        if period != self.period:
+            self.next_deadline += period - self.period
+            self.period = period
+
+    def wait(self):
+        """等待到下一个截止时间"""
+        if self.period <= 0:
+            return
+
+        now = time.monotonic()
+        remaining = self.next_deadline - now
+
+        if remaining > 0:
+            time.sleep(remaining)
+            self.next_deadline += self.period
+        else:
+            self.overruns += 1
+            self.next_deadline = now + self.period
+
+
+class InferenceScheduler:
+    """
+    自适应推理频率调度器
+
+    根据检测器状态选择推理帧率：
+    - full:  手靠近头部或处于 Warning/Detected → 全速
+    - far:   有人但手远离头部区域 → 降速
+    - probe: 画面中没有人 → 低频探测
+
+    升档立即生效（不延迟检测），降档需要目标档位持续 hold_seconds 秒（迟滞）
+    """
+
+    LEVELS = ('probe', 'far', 'full')
+
+    def __init__(self, full_fps, config):
+        """
+        Args:
+            full_fps: 全速帧率
+            config: scheduler 配置字典
+        """
+        self.enabled = config.get('enabled', True)
+        self.rates = {
+            'full': full_fps,
+            'far': config.get('far_fps', 10),
+            'probe': config.get('probe_fps', 3)
+        }
+        self.near_ratio = config.get('near_ratio', 1.5)
+        self.hold_seconds = config.get('hold_seconds', 2.0)
+
+        self.level = 'full'
+        self._pending_level = None
+        self._pending_since = 0.0
+
+        # 统计信息：各档位累计时长（秒）
+        self.time_in_level = {level: 0.0 for level in self.LEVELS}
+        self._last_update = time.monotonic()
+
+    def _desired_level(self, stats):
+        """根据检测结果计算目标档位"""
+        if stats['state'] != 'Normal':
+            return 'full'
+        if stats['distance'] is None:
+            return 'probe'
+        proximity = stats.get('hand_proximity')
+        if proximity is not None and proximity < self.near_ratio:
+            return 'full'
+        return 'far'
+
+    def update(self, stats):
+        """
+        根据最新的检测结果更新档位
+
+        Args:
+            stats: 检测器返回的统计信息
+
+        Returns:
+            float: 当前应使用的推理帧率
+        """
+        now = time.monotonic()
+        self.time_in_level[self.level] += now - self._last_update
+        self._last_update = now
+
+        if not self.enabled:
+            return self.rates['full']
+
+        desired = self._desired_level(stats)
+
+        if self.LEVELS.index(desired) >= self.LEVELS.index(self.level):
+            # 升档（或保持）立即生效
+            self.level = desired
+            self._pending_level = None
+        elif desired != self._pending_level:
+            # 开始降档计时
+            self._pending_level = desired
+            self._pending_since = now
+        elif now - self._pending_since >= self.hold_seconds:
+            self.level = desired
+            self._pending_level = None
+
+        return self.rates[self.level]
+
+    def snapshot(self):
+        """
+        获取调度统计
+
+        Returns:
+            dict: 当前档位和各档位累计时长
+        """
+        return {
+            'level': self.level,
+            'fps': self.rates[self.level],
+            'time_in_level': {k: round(v, 1) for k, v in self.time_in_level.items()}
+        }
+
+
+class OutputStage(threading.Thread):
+    """
+    输出线程
+
+    从有界队列中取推理结果并交给 handler 处理（编码、写截图、发事件）。
+    队列满时丢弃普通结果，保证推理线程不会被输出阻塞；
+    状态变化的结果（例如只持续一帧的 Detected）不可丢弃，会阻塞等待入队；
+    handler 出错时记录并继续处理下一个结果，输出线程意外退出时 put() 抛出 RuntimeError
+    """
+
+    PUT_TIMEOUT = 0.5  # 状态变化的结果等待入队时，每隔多久检查一次输出线程是否还在运行
+
+    def __init__(self, handler, maxsize=2):
+        """
+        Args:
+            handler: 回调函数 handler(processed_frame, stats, capture_time)
+            maxsize: 队列长度
+        """
+        super().__init__(name="OutputStage", daemon=True)
+        self.handler = handler
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._running = True
+        self._last_state = None
+
+        # 统计信息
+        self.dropped = 0  # 因队列满被丢弃的结果数
+        self.errors = 0   # handler 出错的次数
+        self._last_error = None
+
+    def put(self, processed_frame, stats, capture_time):
+        """
+        提交一个推理结果
+
+        Args:
+            processed_frame: 处理后的图像
+            stats: 检测器返回的统计信息
+            capture_time: 帧的采集时间戳
+
+        Raises:
+            RuntimeError: 输出线程已退出（状态变化的结果无法送达）
+        """
+        item = (processed_frame, stats, capture_time)
+        state_changed = stats['state'] != self._last_state
+        self._last_state = stats['state']
+
+        if state_changed:
+            while True:
+                try:
+                    self.queue.put(item, timeout=self.PUT_TIMEOUT)
+                    return
+                except queue.Full:
+                    if not self.is_alive():
+                        raise RuntimeError("输出线程已退出")
+
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while self._running or not self.queue.empty():
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.handler(*item)
+            except Exception as e:
+                self.errors += 1
+                # 同一个错误（例如宿主已退出后每次发送事件都失败）只打印一次
+                message = f"{type(e).__name__}: {e}"
+                if message != self._last_error:
+                    self._last_error = message
+                    print(f"❌ 输出阶段出错: {message}", file=sys.stderr)
+                    traceback.print_exc(file=sys.stderr)
+
+    def stop(self):
+        """停止输出线程（会先处理完队列中剩余的结果）"""
+        self._running = False
+
+
+class LatencyTracker:
+    """glass-to-event 延迟统计（采集时间戳 → 事件发出）"""
+
+    def __init__(self, alpha=0.1):
+        """
+        Args:
+            alpha: 指数滑动平均系数
+        """
+        self.alpha = alpha
+        self.last_ms = None
+        self.avg_ms = None
+        self.max_ms = 0.0
+
+    def record(self, capture_time):
+        """
+        记录一次延迟
+
+        Args:
+            capture_time: 帧的采集时间戳（time.monotonic()）
+
+        Returns:
+            float: 本次延迟（毫秒）
+        """
+        latency_ms = (time.monotonic() - capture_time) * 1000
+        self.last_ms = latency_ms
+        if self.avg_ms is None:
+            self.avg_ms = latency_ms
+        else:
+            self.avg_ms += self.alpha * (latency_ms - self.avg_ms)
+        self.max_ms = max(self.max_ms, latency_ms)
+        return latency_ms
+
+    def snapshot(self):
+        """
+        获取当前延迟统计
+
+        Returns:
+            dict: 延迟信息（毫秒）
+        """
+        return {
+            'last_ms': round(self.last_ms, 1) if self.last_ms is not None else None,
+            'avg_ms': round(self.avg_ms, 1) if self.avg_ms is not None else None,
+            'max_ms': round(self.max_ms, 1)
+        }
@@ -0,0 +1,250 @@
+"""
+NoPickie - 姿态模型管理
+持有 MediaPipe Pose 实例，auto 模式下根据实测推理耗时在 Lite / Full / Heavy 之间切换：
+新模型在后台线程中创建并预热，就绪后在推理线程中原子替换，切换期间检测不中断
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from perf import NULL_PERF
+
+
+MODEL_NAMES = ('lite', 'full', 'heavy')  # model_complexity = 0 / 1 / 2
+
+# 升一档后推理耗时的估计倍数（Lite→Full、Full→Heavy），用于判断升档后是否仍在预算内
+UPGRADE_COST = {0: 1.6, 1: 3.0}
+
+WARMUP_JOIN_TIMEOUT = 5.0  # close() 等待后台预热结束的最长时间（秒）
+
+
+class PoseModel:
+    """
+    姿态模型（可热切换 model_complexity）
+
+    - 固定模式：使用配置的 complexity，不做任何测量和切换
+    - auto 模式：推理耗时中位数超出预算时降档；按 UPGRADE_COST 估计升档后仍有余量时升档。
+      降档后被放弃的档位、预热失败的档位（例如离线时模型文件下载失败）在 retry_seconds 内不再尝试
+    """
+
+    def __init__(self, mp_pose, config, frame_budget, perf=NULL_PERF):
+        """
+        Args:
+            mp_pose: mediapipe.solutions.pose 模块
+            config: model 配置字典
+            frame_budget: 默认的单帧耗时预算（秒），配置中 frame_budget_ms 优先
+            perf: 各阶段耗时记录器
+        """
+        self.mp_pose = mp_pose
+        self.perf = perf
+        self.min_detection_confidence = config.get('min_detection_confidence', 0.5)
+        self.min_tracking_confidence = config.get('min_tracking_confidence', 0.5)
+
+        self.auto = config.get('auto', False)
+        self.min_complexity = config.get('min_complexity', 0)
+        self.max_complexity = config.get('max_complexity', 2)
+        budget_ms = config.get('frame_budget_ms')
+        self.frame_budget = budget_ms / 1000.0 if budget_ms else frame_budget
+        self.headroom = config.get('headroom', 0.7)  # 推理可占用的预算比例（其余留给转换、绘制等）
+        self.window = config.get('window', 30)  # 参与判断的推理耗时样本数
+        self.cooldown = config.get('cooldown_seconds', 10.0)  # 两次切换之间的最短间隔
+        self.retry_seconds = config.get('retry_seconds', 120.0)
+
+        self.complexity = int(config.get('complexity', 1))
+        self.pose = self._create(self.complexity)
+        # ROI 裁剪画面使用单独的实例：跟踪模式的 Pose 图会沿用上一次输入的图像坐标 ROI，
+        # 全帧和裁剪画面交替送进同一个实例会互相干扰（第一次裁剪推理时创建）
+        self.roi_pose = None
+
+        self._latencies = deque(maxlen=self.window)
+        self._last_switch = time.monotonic()
+        self._blocked_until = {}  # complexity → 在此之前不再切换到该档位
+
+        # 后台预热
+        self._lock = threading.Lock()
+        self._warming = None      # 正在预热的 complexity
+        self._ready = None        # (complexity, 已预热的 Pose 实例)
+        self._warm_thread = None
+        self._closed = False      # close() 之后预热完成的实例直接关闭，不再换上
+
+        # 统计信息
+        self.switches = 0
+
+    @property
+    def name(self):
+        """当前模型名称"""
+        return MODEL_NAMES[self.complexity]
+
+    def _create(self, complexity):
+        """创建 Pose 实例"""
+        return self.mp_pose.Pose(
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+            model_complexity=complexity  # 0=Lite, 1=Full, 2=Heavy
+        )
+
+    def process(self, rgb_frame, roi=False):
+        """
+        姿态检测（在推理线程中调用）
+
+        Args:
+            rgb_frame: RGB图像
+            roi: 是否是 ROI 裁剪画面（使用 roi_pose）
+
+        Returns:
+            pose_landmarks: 检测到的关键点，未检测到时为 None
+        """
+        self._swap_if_ready()
+
+        if roi:
+            if self.roi_pose is None:
+                self.roi_pose = self._create(self.complexity)
+            pose = self.roi_pose
+        else:
+            pose = self.pose
+
+        start = time.perf_counter()
+        pose_landmarks = pose.process(rgb_frame).pose_landmarks
+        latency = time.perf_counter() - start
+        self.perf.add('pose', latency)
+
+        # 固定模式下也记录（snapshot 报告推理耗时），只有 auto 模式据此切换
+        self._latencies.append(latency)
+        if self.auto:
+            self._maybe_switch(rgb_frame)
+
+        return pose_landmarks
+
+    def warmup(self, frame_shape, roi_shape=None):
+        """
+        在空白画面上跑一次推理（图初始化、内存分配），不计入耗时统计
+
+        Args:
+            frame_shape: 画面尺寸 (h, w, 3)
+            roi_shape: ROI 裁剪画面的尺寸，None 表示不预热 roi_pose
+        """
+        self.pose.process(np.zeros(frame_shape, dtype=np.uint8))
+        if roi_shape is not None:
+            if self.roi_pose is None:
+                self.roi_pose = self._create(self.complexity)
+            self.roi_pose.process(np.zeros(roi_shape, dtype=np.uint8))
+
+    def _maybe_switch(self, rgb_frame):
+        """根据最近的推理耗时决定是否切换档位"""
+        now = time.monotonic()
+        if len(self._latencies) < self.window or self._warming is not None:
+            return
+        if now - self._last_switch < self.cooldown:
+            return
+
+        latency = float(np.median(self._latencies))
+        budget = self.frame_budget * self.headroom
+
+        target = None
+        if latency > budget:
+            if self.complexity > self.min_complexity:
+                target = self.complexity - 1
+        elif self.complexity < self.max_complexity:
+            if latency * UPGRADE_COST[self.complexity] < budget:
+                target = self.complexity + 1
+
+        if target is None or now < self._blocked_until.get(target, 0.0):
+            return
+        if target < self.complexity:
+            self._blocked_until[self.complexity] = now + self.retry_seconds
+        self._start_warmup(target, rgb_frame)
+
+    def _start_warmup(self, complexity, rgb_frame):
+        """在后台线程中创建并预热新模型"""
+        self._warming = complexity
+        sample = rgb_frame.copy()
+        self._warm_thread = threading.Thread(target=self._warmup, args=(complexity, sample),
+                                             name="PoseWarmup", daemon=True)
+        self._warm_thread.start()
+        print(f"🔄 预热姿态模型: {MODEL_NAMES[self.complexity]} → {MODEL_NAMES[complexity]}",
+              file=sys.stderr)
+
+    def _warmup(self, complexity, sample):
+        """后台线程：创建模型并用当前画面跑一次推理（首次推理包含图初始化，耗时最长）"""
+        pose = None
+        try:
+            pose = self._create(complexity)
+            pose.process(sample)
+        except Exception as e:
+            if pose is not None:
+                pose.close()
+            print(f"⚠️ 姿态模型预热失败: {e}", file=sys.stderr)
+            with self._lock:
+                self._blocked_until[complexity] = time.monotonic() + self.retry_seconds
+                self._warming = None
+            return
+
+        with self._lock:
+            if not self._closed:
+                self._ready = (complexity, pose)
+                return
+            self._warming = None
+        # 预热期间模型已关闭：不再发布，直接释放
+        pose.close()
+
+    def _swap_if_ready(self):
+        """预热完成后替换当前模型（推理线程中执行，旧实例在此关闭）"""
+        if self._ready is None:
+            return
+        with self._lock:
+            complexity, pose = self._ready
+            self._ready = None
+            self._warming = None
+
+        old = self.pose
+        self.pose = pose
+        self.complexity = complexity
+        old.close()
+        if self.roi_pose is not None:
+            # 下一次裁剪推理时按新档位重新创建
+            self.roi_pose.close()
+            self.roi_pose = None
+
+        self.switches += 1
+        self._latencies.clear()
+        self._last_switch = time.monotonic()
+        print(f"✅ 已切换姿态模型: {self.name}", file=sys.stderr)
+
+    def snapshot(self):
+        """
+        获取模型统计
+
+        Returns:
+            dict: 当前档位、推理耗时中位数、切换次数
+        """
+        samples = list(self._latencies)  # 输出线程读取时推理线程可能正在写入
+        latency = float(np.median(samples)) if samples else None
+        return {
+            'complexity': self.complexity,
+            'name': self.name,
+            'auto': self.auto,
+            'latency_ms': round(latency * 1000, 1) if latency is not None else None,
+            'budget_ms': round(self.frame_budget * self.headroom * 1000, 1),
+            'warming': MODEL_NAMES[self._warming] if self._warming is not None else None,
+            'switches': self.switches
+        }
+
+    def close(self):
+        """释放模型（包括 ROI 实例、还没换上的预热实例和正在预热的实例）"""
+        with self._lock:
+            self._closed = True
+        # 正在预热的实例由预热线程在结束时关闭（见 _warmup），这里等它结束
+        if self._warm_thread is not None:
+            self._warm_thread.join(WARMUP_JOIN_TIMEOUT)
+        self.pose.close()
+        if self.roi_pose is not None:
+            self.roi_pose.close()
+            self.roi_pose = None
+        with self._lock:
+            if self._ready is not None:
+                self._ready[1].close()
+                self._ready = None
@@ -0,0 +1,303 @@
+"""
+NoPickie - stdout 事件协议
+Tauri 通过 stdout 逐行读取 JSON 事件，协议有两个版本：
+
+- v1（旧版）：每个事件一行 {"event", "timestamp": ISO 时间, ...}，立即 flush（积压时多行一次写出）
+- v2：紧凑的批量 NDJSON
+    第一行是握手 {"event": "protocol", "version": 2, "anchor": {"wall", "mono"}}，
+    之后每行是一批事件 {"event": "batch", "events": [{"e": 事件类型, "t": 毫秒, ...}]}；
+    t 是相对 anchor.mono 的单调时钟毫秒数（例如帧的采集时间），
+    墙上时间 = anchor.wall + t / 1000，不再为每个事件格式化日期
+
+宿主通过环境变量 NOPICKIE_PROTOCOL 声明自己支持的最高版本（未设置视为 1），
+实际版本取宿主与配置 events.protocol 中较小的一个，旧版宿主不受影响
+
+两个版本都由独立的写入线程写 stdout：宿主读取变慢、管道写满时只有写入线程阻塞，检测循环不受影响。
+积压时周期性/大体积事件（LOSSY_EVENTS）同类只保留最新一条，队列满时直接丢弃；其余事件不会丢弃
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from perf import NULL_PERF
+
+
+PROTOCOL_VERSION = 2
+PROTOCOL_ENV = "NOPICKIE_PROTOCOL"
+
+# 需要立即送达的事件（不等批量攒满）
+URGENT_EVENTS = frozenset({
+    "state_changed", "scratch_detected", "camera_permission_needed",
+    "source_error", "source_stopped", "command_ack", "stats_snapshot"
+})
+
+# 可合并、可丢弃的事件：待写队列中同一类型（多路模式下同一视频源）只保留最新一条，
+# 队列达到上限时新事件直接丢弃；不在此列的事件（state_changed、scratch_detected 等）从不丢弃
+LOSSY_EVENTS = frozenset({"debug_frame", "status_update", "perf", "sources_health"})
+
+
+def negotiate_version(config_version=PROTOCOL_VERSION, environ=None):
+    """
+    协商协议版本
+
+    Args:
+        config_version: 配置允许的最高版本
+        environ: 环境变量（默认 os.environ）
+
+    Returns:
+        int: 实际使用的协议版本
+    """
+    environ = os.environ if environ is None else environ
+    try:
+        host_version = int(environ.get(PROTOCOL_ENV, 1))
+    except ValueError:
+        host_version = 1
+    return max(1, min(int(config_version), host_version, PROTOCOL_VERSION))
+
+
+class EventWriter:
+    """
+    stdout 事件写入器
+
+    send() 只把事件放进待写队列，由后台写入线程写出（每次一行或多行、一次 flush）：
+    - 不可丢弃的事件按顺序排队，优先写出
+    - LOSSY_EVENTS 按 (类型, source) 合并，只写最新一条；待写事件数达到 max_queue 时丢弃
+    v2 下非紧急事件最多滞留 flush_interval 秒攒成一批；v1 下每个事件立即写出
+    """
+
+    def __init__(self, version=1, stream=None, flush_interval=0.1, max_batch=64, max_queue=256,
+                 close_timeout=2.0, perf=NULL_PERF):
+        """
+        Args:
+            version: 协议版本（见 negotiate_version）
+            stream: 输出流（默认 sys.stdout）
+            flush_interval: v2 下非紧急事件的最长滞留时间（秒）
+            max_batch: 每次写出的最多事件数
+            max_queue: 待写事件数上限（超过后丢弃可丢弃的事件）
+            close_timeout: 退出时等待剩余事件写出的最长时间（秒）
+            perf: 各阶段耗时记录器
+        """
+        self.version = version
+        self.stream = stream or sys.stdout
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.close_timeout = close_timeout
+        self.perf = perf
+
+        self._lock = threading.Condition()
+        self._reliable = deque()  # 不可丢弃的事件（按顺序写出）
+        self._lossy = {}          # (事件类型, source) → 最新的一条可合并事件
+        self._oldest = None       # 最早一条待写事件的入队时间（单调时钟）
+        self._urgent = False
+        self._writing = False
+        self._write_start = 0.0   # 当前写入的开始时间（perf_counter）
+        self._closed = False
+        self._writer = None       # 写入线程（第一次发送时启动）
+        self.error = None         # 写入失败（例如宿主已退出、管道断开）
+
+        # 统计信息
+        self.events = 0
+        self.writes = 0
+        self.coalesced = 0        # 被更新的同类事件替换的次数
+        self.dropped = {}         # 队列满时丢弃的次数（按事件类型）
+        self.peak_depth = 0
+        self.max_write = 0.0      # 单次写入的最长耗时（秒），宿主读取慢时变大
+
+        if version >= 2:
+            # 单调时钟锚点：同一时刻的墙上时间和单调时钟
+            self.anchor_wall = time.time()
+            self.anchor_mono = time.monotonic()
+            # 握手在启动时直接写出（此时管道是空的）
+            self._write(json.dumps({
+                "event": "protocol",
+                "version": version,
+                "encoding": "ndjson-batch",
+                "anchor": {"wall": self.anchor_wall, "mono": self.anchor_mono}
+            }, separators=(',', ':')), count=0)
+
+    def send(self, event_type, data, t=None):
+        """
+        发送事件（只入队，不等待写出）
+
+        Args:
+            event_type: 事件类型
+            data: 事件数据
+            t: 事件对应的单调时钟时间（例如帧的采集时间），None 表示当前时间
+
+        Raises:
+            OSError / ValueError: 之前的写入已失败（宿主已退出、stdout 已关闭）
+        """
+        if self.version < 2:
+            event = {"event": event_type, "timestamp": datetime.now().isoformat(), **data}
+        else:
+            if t is None:
+                t = time.monotonic()
+            event = {"e": event_type, "t": round((t - self.anchor_mono) * 1000), **data}
+
+        with self._lock:
+            if self.error is not None:
+                raise self.error
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="EventWriter", daemon=True)
+                self._writer.start()
+
+            if event_type in LOSSY_EVENTS:
+                key = (event_type, data.get("source"))
+                if key in self._lossy:
+                    self.coalesced += 1
+                elif self.depth >= self.max_queue:
+                    self.dropped[event_type] = self.dropped.get(event_type, 0) + 1
+                    return
+                self._lossy[key] = event
+            else:
+                self._reliable.append(event)
+
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self.version < 2 or event_type in URGENT_EVENTS:
+                self._urgent = True
+            self.peak_depth = max(self.peak_depth, self.depth)
+            self._lock.notify_all()
+
+    def backlogged(self, event_type, source=None):
+        """
+        同类事件是否还在等待写出（调用方可以跳过准备新事件，例如不再编码调试画面）
+
+        Args:
+            event_type: 事件类型
+            source: 视频源（多路模式）
+        """
+        with self._lock:
+            return (event_type, source) in self._lossy
+
+    @property
+    def depth(self):
+        """待写事件数"""
+        return len(self._reliable) + len(self._lossy)
+
+    def flush(self, timeout=None):
+        """
+        立即写出全部待写事件并等待完成
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否全部写出
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._urgent = True
+            self._lock.notify_all()
+            while (self.depth or self._writing) and self.error is None and self._writer is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            return self.depth == 0 and not self._writing
+
+    def close(self):
+        """写出剩余事件并停止写入线程（宿主不再读取时最多等待 close_timeout 秒）"""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+            writer = self._writer
+        if writer is None:
+            return
+        writer.join(self.close_timeout)
+        if writer.is_alive():
+            print(f"⚠️ 宿主未读取，{self.depth} 个事件未写出", file=sys.stderr)
+
+    def snapshot(self):
+        """
+        获取写入统计
+
+        Returns:
+            dict: 协议版本、事件数、实际写入行数、队列深度、合并和丢弃次数、
+                  最长写入耗时、当前写入已阻塞的时间（宿主读取停滞时持续增长）
+        """
+        with self._lock:
+            blocked = time.perf_counter() - self._write_start if self._writing else 0.0
+            return {
+                "version": self.version,
+                "events": self.events,
+                "writes": self.writes,
+                "depth": self.depth,
+                "peak_depth": self.peak_depth,
+                "coalesced": self.coalesced,
+                "dropped": dict(self.dropped),
+                "max_write_ms": round(self.max_write * 1000, 1),
+                "blocked_ms": round(blocked * 1000, 1)
+            }
+
+    def _write_loop(self):
+        """写入线程：等到有紧急事件、攒满一批或滞留超过 flush_interval 时写出"""
+        while True:
+            with self._lock:
+                while True:
+                    if not self.depth:
+                        if self._closed:
+                            return
+                        self._lock.wait()
+                        continue
+                    if self._urgent or self._closed or self.depth >= self.max_batch:
+                        break
+                    remaining = self._oldest + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(remaining)
+                events = self._take_locked()
+                self._writing = True
+                self._write_start = time.perf_counter()
+
+            # 写出时不持锁：管道写满时只阻塞本线程，send() 照常入队
+            try:
+                if self.version >= 2:
+                    self._write(json.dumps({"event": "batch", "events": events}, separators=(',', ':')),
+                                count=len(events))
+                else:
+                    self._write("\n".join(json.dumps(event) for event in events), count=len(events))
+            except (OSError, ValueError) as e:
+                with self._lock:
+                    self.error = e
+                    self._reliable.clear()
+                    self._lossy.clear()
+                    self._writing = False
+                    self._lock.notify_all()
+                print(f"❌ 事件写入失败: {e}", file=sys.stderr)
+                return
+
+            with self._lock:
+                self._writing = False
+                self._lock.notify_all()
+
+    def _take_locked(self):
+        """取出下一批事件：先取不可丢弃的事件，再取合并后的事件（调用方持有锁）"""
+        events = []
+        while self._reliable and len(events) < self.max_batch:
+            events.append(self._reliable.popleft())
+        while self._lossy and len(events) < self.max_batch:
+            events.append(self._lossy.pop(next(iter(self._lossy))))
+        if self.depth:
+            # 还有积压：下一批立即写出
+            self._oldest = time.monotonic()
+            self._urgent = True
+        else:
+            self._oldest = None
+            self._urgent = False
+        return events
+
+    def _write(self, line, count):
+        """写出一行或多行并 flush"""
+        start = time.perf_counter()
+        with self.perf.measure('stdout'):
+            print(line, file=self.stream, flush=True)
+        self.max_write = max(self.max_write, time.perf_counter() - start)
+        self.events += count
+        self.writes += 1
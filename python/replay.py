@@ -0,0 +1,347 @@
+"""
+NoPickie - 离线回放工具
+把录制的视频或关键点数据按虚拟时钟喂给检测器（可以比实时更快），
+统计各阶段耗时分位数、吞吐量，以及相对标注触发时间的准确率/召回率
+
+用法：
+    python replay.py session.mp4 --labels session_labels.json
+    python replay.py session.npz --labels session_labels.json
+    python replay.py session.mp4 --dump session.npz
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from geometry import NUM_LANDMARKS
+
+
+class ReplayClock:
+    """虚拟时钟：由回放进度驱动，替代 time.time()"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def set(self, t):
+        """设置当前时间（秒）"""
+        self.now = t
+
+
+class StageTimer:
+    """各阶段耗时记录（用于计算分位数）"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        """
+        记录一次耗时
+
+        Args:
+            stage: 阶段名称
+            seconds: 耗时（秒）
+        """
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """
+        计算各阶段耗时统计
+
+        Returns:
+            dict: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms}}
+        """
+        result = {}
+        for stage, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            result[stage] = {
+                'count': len(ms),
+                'mean_ms': round(float(ms.mean()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3)
+            }
+        return result
+
+
+def load_landmark_dump(path):
+    """
+    读取关键点数据
+
+    Args:
+        path: .npz 文件路径
+
+    Returns:
+        timestamps: (N,) 每帧时间（秒）
+        points: (N, 33, 3) 关键点（已镜像）
+        present: (N,) 该帧是否检测到人体
+    """
+    data = np.load(path)
+    return data['timestamps'], data['points'], data['present']
+
+
+def save_landmark_dump(path, timestamps, points, present):
+    """
+    保存关键点数据（格式见 load_landmark_dump）
+
+    Args:
+        path: .npz 文件路径
+        timestamps: 每帧时间（秒）
+        points: 每帧关键点
+        present: 每帧是否检测到人体
+    """
+    np.savez_compressed(
+        path,
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        points=np.asarray(points, dtype=np.float64),
+        present=np.asarray(present, dtype=bool)
+    )
+
+
+def load_labels(path):
+    """
+    读取标注的触发时间
+
+    文件格式：{"triggers": [8.0, 15.5]} 或直接 [8.0, 15.5]
+
+    Returns:
+        list: 触发时间（秒）
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data['triggers']
+    return sorted(float(t) for t in data)
+
+
+def score_detections(detected, expected, tolerance):
+    """
+    按时间容差匹配检测结果和标注，计算准确率/召回率
+
+    Args:
+        detected: 检测到的触发时间列表
+        expected: 标注的触发时间列表
+        tolerance: 匹配容差（秒）
+
+    Returns:
+        dict: 匹配结果
+    """
+    unmatched = sorted(detected)
+    true_positives = 0
+    delays = []
+
+    for target in sorted(expected):
+        # 在容差内找最近的、尚未匹配的检测
+        best = None
+        for i, t in enumerate(unmatched):
+            if abs(t - target) <= tolerance and (best is None or abs(t - target) < abs(unmatched[best] - target)):
+                best = i
+        if best is not None:
+            delays.append(unmatched.pop(best) - target)
+            true_positives += 1
+
+    false_positives = len(unmatched)
+    false_negatives = len(expected) - true_positives
+
+    return {
+        'true_positives': true_positives,
+        'false_positives': false_positives,
+        'false_negatives': false_negatives,
+        'precision': true_positives / len(detected) if detected else 1.0,
+        'recall': true_positives / len(expected) if expected else 1.0,
+        'mean_delay': round(float(np.mean(delays)), 3) if delays else None
+    }
+
+
+class Replayer:
+    """按虚拟时钟驱动检测器的回放器"""
+
+    def __init__(self, detector, clock, render=False):
+        """
+        Args:
+            detector: 使用 clock 创建的 HeadScratchDetector
+            clock: ReplayClock
+            render: 是否同时执行渲染（测量渲染开销）
+        """
+        self.detector = detector
+        self.clock = clock
+        self.render = render
+        self.timer = StageTimer()
+
+        self.frames = 0
+        self.detections = []  # 触发时间（秒）
+        self.media_duration = 0.0
+        self._trigger_count = detector.trigger_count
+
+    def _record(self, timestamp, stats):
+        """记录一帧的结果"""
+        self.frames += 1
+        self.media_duration = timestamp
+        if stats['trigger_count'] > self._trigger_count:
+            self.detections.append(timestamp)
+        self._trigger_count = stats['trigger_count']
+
+    def replay_video(self, path, dump=None):
+        """
+        回放视频文件
+
+        Args:
+            path: 视频路径
+            dump: 可选，把检测到的关键点另存为 .npz（用于之后的快速回放）
+        """
+        import cv2
+
+        cap = cv2.VideoCapture(str(path))
+        if not cap.isOpened():
+            raise IOError(f"无法打开视频: {path}")
+
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        timestamps, points, present = [], [], []
+        index = 0
+
+        try:
+            while True:
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.timer.add('decode', time.perf_counter() - start)
+
+                timestamp = index / video_fps
+                self.clock.set(timestamp)
+
+                start = time.perf_counter()
+                pose_landmarks, stats = self.detector.analyze(frame)
+                self.timer.add('analyze', time.perf_counter() - start)
+
+                if self.render:
+                    start = time.perf_counter()
+                    self.detector.render(frame, pose_landmarks, stats)
+                    self.timer.add('render', time.perf_counter() - start)
+
+                if dump is not None:
+                    timestamps.append(timestamp)
+                    present.append(pose_landmarks is not None)
+                    if pose_landmarks is not None:
+                        points.append([(lm.x, lm.y, lm.z) for lm in pose_landmarks.landmark])
+                    else:
+                        points.append(np.zeros((NUM_LANDMARKS, 3)))
+
+                self._record(timestamp, stats)
+                index += 1
+        finally:
+            cap.release()
+
+        if dump is not None:
+            save_landmark_dump(dump, timestamps, points, present)
+
+    def replay_landmarks(self, timestamps, points, present):
+        """
+        回放关键点数据（跳过 MediaPipe，只测状态机和几何计算）
+
+        Args:
+            timestamps: (N,) 每帧时间（秒）
+            points: (N, 33, 3) 关键点
+            present: (N,) 该帧是否检测到人体
+        """
+        for timestamp, frame_points, frame_present in zip(timestamps, points, present):
+            self.clock.set(float(timestamp))
+
+            start = time.perf_counter()
+            # 关键帧模式：中间帧使用预测的关键点（与 analyze() 的跳帧逻辑相同）
+            predicted = self.detector.predict_points()
+            if predicted is not None:
+                stats = self.detector.analyze_points(predicted)
+            else:
+                frame_points = frame_points if frame_present else None
+                self.detector.observe_keyframe(frame_points)
+                stats = self.detector.analyze_points(frame_points)
+            self.timer.add('analyze', time.perf_counter() - start)
+
+            self._record(float(timestamp), stats)
+
+    def report(self, wall_seconds, expected=None, tolerance=1.0):
+        """
+        生成回放报告
+
+        Args:
+            wall_seconds: 回放实际耗时（秒）
+            expected: 可选，标注的触发时间
+            tolerance: 匹配容差（秒）
+
+        Returns:
+            dict: 报告
+        """
+        report = {
+            'frames': self.frames,
+            'media_seconds': round(self.media_duration, 3),
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_fps': round(self.frames / wall_seconds, 1) if wall_seconds > 0 else None,
+            'realtime_factor': round(self.media_duration / wall_seconds, 2) if wall_seconds > 0 else None,
+            'stages': self.timer.summary(),
+            'detections': [round(t, 3) for t in self.detections]
+        }
+        if self.detector.motion_gate.frames:
+            report['motion_gate'] = self.detector.motion_gate.snapshot()
+        if self.detector.keyframes.enabled:
+            report['keyframes'] = self.detector.keyframes.snapshot()
+        if self.detector.hand_stage.frames:
+            report['hand_stage'] = self.detector.hand_stage.snapshot()
+        if expected is not None:
+            report['accuracy'] = score_detections(self.detections, expected, tolerance)
+        return report
+
+
+def create_detector(config, clock):
+    """创建使用虚拟时钟的检测器"""
+    from detector import HeadScratchDetector
+    return HeadScratchDetector(config, clock=clock)
+
+
+def load_replay_config(path):
+    """读取检测配置（默认使用 config.json）"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 离线回放")
+    parser.add_argument('input', help="视频文件，或 .npz 关键点数据")
+    parser.add_argument('--labels', help="标注的触发时间（JSON）")
+    parser.add_argument('--tolerance', type=float, default=1.0, help="触发时间匹配容差（秒）")
+    parser.add_argument('--config', default='config.json', help="检测配置文件")
+    parser.add_argument('--render', action='store_true', help="同时执行渲染（测量渲染开销）")
+    parser.add_argument('--dump', help="回放视频时把关键点保存为 .npz")
+    parser.add_argument('--no-motion-gate', action='store_true', help="关闭运动门控（与开启时对比准确率）")
+    args = parser.parse_args()
+
+    config = load_replay_config(args.config)
+    if args.no_motion_gate:
+        config.setdefault('motion_gate', {})['enabled'] = False
+    clock = ReplayClock()
+    replayer = Replayer(create_detector(config, clock), clock, render=args.render)
+
+    start = time.perf_counter()
+    try:
+        if Path(args.input).suffix == '.npz':
+            replayer.replay_landmarks(*load_landmark_dump(args.input))
+        else:
+            replayer.replay_video(args.input, dump=args.dump)
+    finally:
+        replayer.detector.cleanup()
+    wall_seconds = time.perf_counter() - start
+
+    expected = load_labels(args.labels) if args.labels else None
+    report = replayer.report(wall_seconds, expected, args.tolerance)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
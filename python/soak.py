@@ -0,0 +1,275 @@
+"""
+NoPickie - 长时间运行测试（soak）
+按实际运行时的路径（采集 → infer → EventOutput，调试画面和证据环形缓冲都开启）
+循环播放视频或读取摄像头若干小时，每隔 interval 秒输出一行 JSON：
+
+- rss_mb:            当前常驻内存
+- transient_kb:      抽样帧内的临时分配峰值（tracemalloc，numpy/OpenCV 的数组也会被统计），
+                     缓冲池模式下应接近 0；抽样帧之外不开启 tracemalloc，不影响帧率
+- pool_allocations:  缓冲池在本区间内的（重新）分配次数，稳定后应为 0
+- gc:                本区间内各代回收次数、总停顿和最长停顿
+
+用法：
+    python soak.py session.mp4 --hours 4                 # 循环播放视频 4 小时
+    python soak.py 0 --hours 8 --output soak.jsonl       # 摄像头 0，结果另存一份
+    python soak.py session.mp4 --minutes 10 --no-buffer-pool   # 对比关闭缓冲池
+    python soak.py synthetic --hours 2                   # 合成画面（使用 config.json 的 camera 分辨率）
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from buffers import BufferPool, read_into
+from capture import open_capture
+from evidence import EvidenceWriter
+from main_simple import EventOutput, infer, perf
+from pipeline import DeadlinePacer
+from replay import create_detector, load_replay_config
+
+
+def rss_mb():
+    """当前进程的常驻内存（MB），取不到时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        # macOS 没有 /proc，用 ps（单位 KB）
+        out = subprocess.run(['ps', '-o', 'rss=', '-p', str(os.getpid())], capture_output=True, text=True)
+        return int(out.stdout.strip()) / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class GCMonitor:
+    """通过 gc.callbacks 记录每次回收的代数和停顿时间"""
+
+    def __init__(self):
+        self._start = None
+        self.reset()
+        gc.callbacks.append(self._callback)
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            pause = time.perf_counter() - self._start
+            self.collections[info['generation']] += 1
+            self.pause_seconds += pause
+            self.max_pause = max(self.max_pause, pause)
+            self._start = None
+
+    def reset(self):
+        """清空区间统计"""
+        self.collections = [0, 0, 0]
+        self.pause_seconds = 0.0
+        self.max_pause = 0.0
+
+    def snapshot(self):
+        return {
+            'collections': list(self.collections),
+            'pause_ms': round(self.pause_seconds * 1000, 2),
+            'max_pause_ms': round(self.max_pause * 1000, 2)
+        }
+
+    def close(self):
+        gc.callbacks.remove(self._callback)
+
+
+def open_source(source, camera):
+    """
+    打开视频源
+
+    Args:
+        source: 视频文件（循环播放）、摄像头编号或 synthetic
+        camera: config.json 的 camera 配置（采集参数）
+    """
+    camera = dict(camera)
+    if source == 'synthetic':
+        camera['source'] = 'synthetic'
+    elif source.isdigit():
+        camera.update(source='device', device_id=int(source))
+    else:
+        # 节奏由 soak 自己的 pacer 控制
+        camera.update(source='file', file=source, loop=True, realtime=False)
+    cap = open_capture(camera)
+    if cap is None:
+        raise SystemExit(f"❌ 无法打开: {source}")
+    return cap
+
+
+def run_soak(cap, config, duration, interval, fps, sample_every, report):
+    """
+    运行 soak 测试
+
+    Args:
+        cap: 已打开的视频源
+        config: 检测配置
+        duration: 总时长（秒）
+        interval: 报告间隔（秒）
+        fps: 目标帧率（<= 0 表示不限速）
+        sample_every: 每隔多少帧抽样一次临时分配
+        report: 每个区间的回调 report(dict)
+
+    Returns:
+        list: 各区间的报告
+    """
+    detector = create_detector(config, time.time)
+    reuse_buffers = detector.buffers.enabled
+    screenshots = Path(tempfile.mkdtemp(prefix="nopickie_soak_"))
+    evidence = EvidenceWriter(screenshots, config.get('evidence', {}), perf=perf, copy_frames=reuse_buffers)
+    evidence.start()
+    # 与实际运行相同的输出阶段（调试画面走 JSON 通道，编码但不发送）
+    output = EventOutput(screenshots, debug_frames=True, perf_interval=0, emit=lambda *args, **kwargs: None,
+                         evidence=evidence, buffers=BufferPool(reuse_buffers))
+    pacer = DeadlinePacer(fps)
+    monitor = GCMonitor()
+
+    reports = []
+    frame = None
+    frames = 0
+    interval_frames = 0
+    samples = []
+    pool_allocations = detector.buffers.allocations
+    start = time.monotonic()
+    last_report = start
+    rss_start = rss_mb()
+
+    try:
+        while time.monotonic() - start < duration:
+            ret, frame = read_into(cap, frame if reuse_buffers else None)
+            if not ret:
+                print("❌ 无法读取视频源", file=sys.stderr)
+                break
+            capture_time = time.monotonic()
+
+            sampled = frames % sample_every == 0
+            if sampled:
+                tracemalloc.start()
+                baseline = tracemalloc.get_traced_memory()[0]
+            processed_frame, stats = infer(detector, output, frame, capture_time)
+            output.handle(processed_frame, stats, capture_time)
+            if sampled:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                samples.append(peak - baseline)
+
+            frames += 1
+            interval_frames += 1
+            pacer.wait()
+
+            now = time.monotonic()
+            if now - last_report >= interval:
+                rss = rss_mb()
+                allocations = detector.buffers.allocations
+                entry = {
+                    'elapsed_s': round(now - start, 1),
+                    'frames': frames,
+                    'fps': round(interval_frames / (now - last_report), 1),
+                    'rss_mb': round(rss, 1) if rss is not None else None,
+                    'rss_growth_mb': round(rss - rss_start, 1) if rss is not None and rss_start is not None else None,
+                    'transient_kb': {
+                        'mean': round(sum(samples) / len(samples) / 1024, 1) if samples else None,
+                        'max': round(max(samples) / 1024, 1) if samples else None,
+                        'samples': len(samples)
+                    },
+                    'pool_allocations': allocations - pool_allocations,
+                    'pool_allocs_per_frame': round((allocations - pool_allocations) / interval_frames, 4),
+                    'gc': monitor.snapshot(),
+                    'state': stats['state']
+                }
+                reports.append(entry)
+                report(entry)
+                monitor.reset()
+                samples = []
+                pool_allocations = allocations
+                interval_frames = 0
+                last_report = now
+    except KeyboardInterrupt:
+        print("\n⏹ 收到中断信号", file=sys.stderr)
+    finally:
+        monitor.close()
+        detector.cleanup()
+        evidence.stop()
+        # 证据写盘线程已停止，删除本次运行的截图和片段
+        shutil.rmtree(screenshots, ignore_errors=True)
+
+    return reports
+
+
+def summarize(reports, buffer_pool):
+    """汇总各区间的报告"""
+    if not reports:
+        return {}
+    rss = [r['rss_mb'] for r in reports if r['rss_mb'] is not None]
+    hours = reports[-1]['elapsed_s'] / 3600
+    transient = [r['transient_kb']['mean'] for r in reports if r['transient_kb']['mean'] is not None]
+    # 第一个区间包含缓冲区的首次分配，稳定状态从第二个区间算起
+    steady = reports[1:] or reports
+    steady_frames = reports[-1]['frames'] - (reports[0]['frames'] if len(reports) > 1 else 0)
+    return {
+        'buffer_pool': buffer_pool,
+        'hours': round(hours, 3),
+        'frames': reports[-1]['frames'],
+        'mean_fps': round(sum(r['fps'] for r in reports) / len(reports), 1),
+        'rss_first_mb': rss[0] if rss else None,
+        'rss_last_mb': rss[-1] if rss else None,
+        'rss_max_mb': max(rss) if rss else None,
+        'rss_drift_mb_per_hour': round((rss[-1] - rss[0]) / hours, 1) if len(rss) > 1 and hours > 0 else None,
+        'transient_kb_mean': round(sum(transient) / len(transient), 1) if transient else None,
+        'steady_pool_allocs_per_frame': round(sum(r['pool_allocations'] for r in steady) / max(1, steady_frames), 4),
+        'gc_pause_ms': round(sum(r['gc']['pause_ms'] for r in reports), 1),
+        'gc_max_pause_ms': max(r['gc']['max_pause_ms'] for r in reports),
+        'gen2_collections': sum(r['gc']['collections'][2] for r in reports)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NoPickie 长时间运行测试")
+    parser.add_argument('source', help="视频文件（循环播放）、摄像头编号或 synthetic")
+    parser.add_argument('--hours', type=float, default=1.0, help="运行时长（小时）")
+    parser.add_argument('--minutes', type=float, help="运行时长（分钟，优先于 --hours）")
+    parser.add_argument('--interval', type=float, default=60.0, help="报告间隔（秒）")
+    parser.add_argument('--fps', type=float, default=30.0, help="目标帧率（0 表示不限速）")
+    parser.add_argument('--sample-every', type=int, default=30, help="每隔多少帧抽样一次临时分配")
+    parser.add_argument('--config', default='config.json', help="检测配置文件")
+    parser.add_argument('--no-buffer-pool', action='store_true', help="关闭缓冲池（对比每帧分配的情况）")
+    parser.add_argument('--output', help="把每个区间的报告另存为 JSON Lines")
+    args = parser.parse_args()
+
+    config = load_replay_config(args.config)
+    config.setdefault('buffers', {})['enabled'] = not args.no_buffer_pool
+    duration = args.minutes * 60 if args.minutes is not None else args.hours * 3600
+
+    log = open(args.output, 'w') if args.output else None
+
+    def report(entry):
+        line = json.dumps(entry)
+        print(line, flush=True)
+        if log is not None:
+            log.write(line + "\n")
+            log.flush()
+
+    cap = open_source(args.source, config.get('camera', {}))
+    try:
+        reports = run_soak(cap, config, duration, args.interval, args.fps, max(1, args.sample_every), report)
+    finally:
+        cap.release()
+        if log is not None:
+            log.close()
+
+    print(json.dumps(summarize(reports, not args.no_buffer_pool), indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+NoPickie - 启动优化
+- StartupTimer:   记录各启动阶段耗时，首帧检测完成后随 ready 事件发送
+- DetectorLoader: 后台线程导入 mediapipe、创建并预热检测器，与打开摄像头同时进行
+- DaemonControl:  stdin 控制通道：start / stop / quit（停止检测只暂停采集，不退出进程），
+                  以及运行中修改参数、开关调试画面、重置计数、查询统计
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+from perf import NULL_PERF
+
+
+class StartupTimer:
+    """启动阶段计时（多个线程同时记录不同阶段）"""
+
+    def __init__(self, t0=None, resumed=False):
+        """
+        Args:
+            t0: 起点（time.monotonic()），默认当前时间
+            resumed: 是否是常驻模式下的恢复（模型已加载）
+        """
+        self.t0 = time.monotonic() if t0 is None else t0
+        self.resumed = resumed
+        self.phases = {}
+
+    def phase(self, name):
+        """
+        计时上下文
+
+        Args:
+            name: 阶段名称
+        """
+        return _Phase(self, name)
+
+    def mark(self, name):
+        """记录从起点到现在的耗时"""
+        self.phases[name] = time.monotonic() - self.t0
+
+    def report(self):
+        """
+        生成启动报告
+
+        Returns:
+            dict: 各阶段耗时和从起点到现在（首帧检测完成）的总耗时，单位毫秒
+        """
+        return {
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            'time_to_first_detection_ms': round((time.monotonic() - self.t0) * 1000, 1),
+            'resumed': self.resumed
+        }
+
+
+class _Phase:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.phases[self.name] = time.monotonic() - self.start
+        return False
+
+
+class DetectorLoader(threading.Thread):
+    """
+    后台加载检测器
+
+    mediapipe 的导入（连带 matplotlib）和 Pose 图的创建、首次推理都很慢，
+    放到后台线程里与打开摄像头并行
+    """
+
+    def __init__(self, config, timer, perf=NULL_PERF):
+        """
+        Args:
+            config: 完整配置
+            timer: StartupTimer
+            perf: 各阶段耗时记录器
+        """
+        super().__init__(name="DetectorLoader", daemon=True)
+        self.config = config
+        self.timer = timer
+        self.perf = perf
+        self.detector = None
+        self.error = None
+
+    def run(self):
+        try:
+            with self.timer.phase('detector_import'):
+                from detector import HeadScratchDetector
+            with self.timer.phase('model_load'):
+                detector = HeadScratchDetector(self.config, perf=self.perf)
+            with self.timer.phase('model_warmup'):
+                display = self.config['display']
+                detector.warmup((display.get('window_height', 480), display.get('window_width', 640), 3))
+            self.detector = detector
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        """
+        等待加载完成
+
+        Returns:
+            HeadScratchDetector
+
+        Raises:
+            加载过程中的异常
+        """
+        with self.timer.phase('model_wait'):
+            self.join()
+        if self.error is not None:
+            raise self.error
+        return self.detector
+
+
+class DaemonControl(threading.Thread):
+    """
+    stdin 控制通道：从 stdin 逐行读取命令
+
+    命令可以是纯文本（start / stop / quit）或 JSON {"cmd": "start", "id": ...}：
+    - 采集控制 start / stop / quit（pause / resume 是 stop / start 的别名）在读取线程中立即生效
+    - 其余命令（set / debug_stream / reset_counter / stats）放入队列，由检测循环在两帧之间取出执行，
+      暂停期间由等待 start 的主线程执行
+    每条命令执行后发送 command_ack 事件（带上命令里的 id）
+
+    常驻模式下启动后等待 start，stdin 关闭（宿主退出）等同于 quit；
+    非常驻模式下直接开始采集，stdin 关闭只结束读取
+    """
+
+    ALIASES = {'pause': 'stop', 'resume': 'start'}
+    LIFECYCLE = ('start', 'stop', 'quit')
+
+    def __init__(self, stream=None, resident=True, emit=None):
+        """
+        Args:
+            stream: 命令来源（默认 stdin）
+            resident: 是否是常驻模式
+            emit: 事件出口 emit(event_type, data)，None 表示不发送确认
+        """
+        super().__init__(name="DaemonControl", daemon=True)
+        self.stream = stream or sys.stdin
+        self.resident = resident
+        self.emit = emit
+        self.active = threading.Event()    # 置位表示应当采集
+        self.stopping = threading.Event()  # 置位表示当前采集应当暂停（传给采集循环）
+        self.quit = False
+        self.starts = 0  # 收到的 start 次数（判断采集循环退出后是否又收到了 start）
+        self._cond = threading.Condition()
+        self._pending = deque()  # 等待在两帧之间执行的命令
+        if not resident:
+            self.active.set()
+
+    def run(self):
+        for line in self.stream:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                try:
+                    command = json.loads(line)
+                except ValueError:
+                    print(f"⚠️ 无法解析控制命令: {line}", file=sys.stderr)
+                    continue
+                if not isinstance(command, dict):
+                    print(f"⚠️ 无法解析控制命令: {line}", file=sys.stderr)
+                    continue
+            else:
+                command = {'cmd': line}
+            self.submit(command)
+        if self.resident:
+            self.handle('quit')
+
+    def submit(self, command):
+        """
+        接收一条命令：采集控制立即执行，其余排队
+
+        Args:
+            command: {"cmd": 命令名, "id": 可选的请求编号, ...参数}
+        """
+        name = self.ALIASES.get(command.get('cmd'), command.get('cmd'))
+        if name in self.LIFECYCLE:
+            self.handle(name)
+            self.acknowledge(command, ok=True)
+            return
+        with self._cond:
+            self._pending.append(command)
+            self._cond.notify_all()
+
+    def acknowledge(self, command, ok=True, error=None, **data):
+        """
+        发送 command_ack 事件
+
+        Args:
+            command: 原始命令
+            ok: 是否执行成功
+            error: 失败原因
+            **data: 附加的结果（例如实际生效的参数）
+        """
+        if self.emit is None:
+            return
+        reply = {'cmd': command.get('cmd'), 'ok': ok}
+        if 'id' in command:
+            reply['id'] = command['id']
+        if error is not None:
+            reply['error'] = error
+        reply.update(data)
+        self.emit("command_ack", reply)
+
+    def drain(self):
+        """
+        取出所有排队的命令（检测循环在两帧之间调用）
+
+        Returns:
+            list: 命令列表（按到达顺序）
+        """
+        if not self._pending:
+            return []
+        with self._cond:
+            commands = list(self._pending)
+            self._pending.clear()
+        return commands
+
+    def handle(self, command):
+        """
+        执行一条采集控制命令
+
+        Args:
+            command: start / stop / quit
+        """
+        with self._cond:
+            if command == 'start':
+                self.starts += 1
+                self.stopping.clear()
+                self.active.set()
+            elif command == 'stop':
+                self.active.clear()
+                self.stopping.set()
+            elif command == 'quit':
+                self.quit = True
+                self.active.clear()
+                self.stopping.set()
+            else:
+                print(f"⚠️ 未知的控制命令: {command}", file=sys.stderr)
+                return
+            self._cond.notify_all()
+
+    def pause_after(self, starts):
+        """
+        采集循环结束（清理完成）后进入暂停；清理期间又收到 start 时不暂停，保留这次 start
+
+        Args:
+            starts: 采集开始时的 self.starts
+
+        Returns:
+            bool: True 表示已暂停，False 表示之后收到了 start（或 quit），回到 wait_start 即可
+        """
+        with self._cond:
+            if self.quit or self.starts != starts:
+                return False
+            self.active.clear()
+            self.stopping.set()
+            self._cond.notify_all()
+            return True
+
+    def wait_start(self, on_commands=None):
+        """
+        等待 start 命令
+
+        Args:
+            on_commands: 等待期间收到排队命令时的回调 on_commands(commands)，None 表示留到开始采集后执行
+
+        Returns:
+            bool: True 表示开始采集，False 表示退出
+        """
+        with self._cond:
+            while not self.active.is_set() and not self.quit:
+                if on_commands is not None and self._pending:
+                    commands = list(self._pending)
+                    self._pending.clear()
+                    # 回调可能发送事件，不持有锁
+                    self._cond.release()
+                    try:
+                        on_commands(commands)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                self._cond.wait()
+            return not self.quit
@@ -1,7 +1,7 @@
 use tauri::{Manager, Emitter, WebviewUrl, WebviewWindowBuilder};
-use std::process::{Command, Child, Stdio};
+use std::process::{Command, Child, ChildStdin, Stdio};
 use std::sync::{Arc, Mutex};
-use std::io::{BufReader, BufRead};
+use std::io::{BufReader, BufRead, Write};
 use std::thread;
 use std::path::PathBuf;
 
@@ -9,20 +9,74 @@ mod stats;
 use stats::StatsManager;
 
 // Python 进程管理器
+// Python 以常驻模式（--daemon）运行：停止检测只暂停采集，模型留在内存中，再次启动几乎没有等待
 pub struct PythonDetector {
     process: Option<Child>,
+    stdin: Option<ChildStdin>,
+    paused: bool,
 }
 
 impl PythonDetector {
     fn new() -> Self {
-        Self { process: None }
+        Self { process: None, stdin: None, paused: false }
     }
     
     fn is_running(&self) -> bool {
+        self.process.is_some() && !self.paused
+    }
+    
+    // 保存新启动的进程并开始采集（常驻模式下 Python 等待 start 命令）
+    fn attach(&mut self, mut child: Child) {
+        self.stdin = child.stdin.take();
+        self.process = Some(child);
+        self.paused = false;
+        self.send_command("start");
+    }
+    
+    // 通过 stdin 发送控制命令（start / stop / quit 或 JSON 命令）
+    fn send_command(&mut self, command: &str) -> bool {
+        match self.stdin.as_mut() {
+            Some(stdin) => writeln!(stdin, "{}", command).and_then(|_| stdin.flush()).is_ok(),
+            None => false,
+        }
+    }
+    
+    // 进程是否还活着（已退出时顺便清理）
+    fn is_alive(&mut self) -> bool {
+        if let Some(ref mut child) = self.process {
+            if let Ok(Some(status)) = child.try_wait() {
+                println!("🧹 清理已退出的 Python 进程 (退出码: {:?})", status.code());
+                self.process = None;
+                self.stdin = None;
+                self.paused = false;
+            }
+        }
         self.process.is_some()
     }
     
+    // 暂停检测（释放摄像头，进程和模型保留）
+    fn pause(&mut self) -> bool {
+        if !self.is_alive() || !self.send_command("stop") {
+            return false;
+        }
+        self.paused = true;
+        println!("⏸ Python 检测已暂停");
+        true
+    }
+    
+    // 恢复检测（摄像头打不开时 Python 会自行暂停，所以进程在运行时也发送 start）
+    fn resume(&mut self) -> bool {
+        if !self.is_alive() || !self.send_command("start") {
+            return false;
+        }
+        self.paused = false;
+        println!("▶️ Python 检测已恢复");
+        true
+    }
+    
     fn stop(&mut self) {
+        self.stdin = None;
+        self.paused = false;
         if let Some(mut process) = self.process.take() {
             let _ = process.kill();
             let _ = process.wait();
@@ -31,6 +85,77 @@ impl PythonDetector {
     }
 }
 
+// 事件协议：通过环境变量告诉 Python 支持的最高版本（协议说明见 python/protocol.py）
+const EVENT_PROTOCOL_ENV: &str = "NOPICKIE_PROTOCOL";
+const EVENT_PROTOCOL_VERSION: &str = "2";
+
+// 发送单个事件到前端（检测到挠头时同时显示通知条）
+fn dispatch_event(app: &tauri::AppHandle, event_type: &str, payload: serde_json::Value) {
+    if event_type == "scratch_detected" {
+        let app_handle = app.clone();
+        tauri::async_runtime::spawn(async move {
+            if let Err(e) = show_alert(app_handle).await {
+                println!("❌ 显示通知条失败: {}", e);
+            }
+        });
+    }
+    
+    let _ = app.emit(event_type, payload);
+}
+
+// 读取 Python stdout 的事件并转发到前端
+// v1: 每行一个事件；v2: 握手行 + 批量事件行，批量事件拆开后按 v1 格式转发（前端无需改动）
+fn forward_python_events(app: tauri::AppHandle, stdout: std::process::ChildStdout) {
+    let reader = BufReader::new(stdout);
+    let mut anchor_wall: Option<f64> = None; // v2 握手时的墙上时间（秒）
+    
+    for line in reader.lines() {
+        let line = match line {
+            Ok(line) => line,
+            Err(_) => continue,
+        };
+        println!("📨 Python 输出: {}", line);
+        
+        let json = match serde_json::from_str::<serde_json::Value>(&line) {
+            Ok(json) => json,
+            Err(_) => continue,
+        };
+        
+        match json["event"].as_str().unwrap_or("unknown") {
+            "protocol" => {
+                anchor_wall = json["anchor"]["wall"].as_f64();
+                println!("📡 事件协议: v{}", json["version"]);
+            }
+            "batch" => {
+                let events = match json["events"].as_array() {
+                    Some(events) => events,
+                    None => continue,
+                };
+                for event in events {
+                    let mut payload = event.clone();
+                    let event_type = event["e"].as_str().unwrap_or("unknown").to_string();
+                    if let Some(fields) = payload.as_object_mut() {
+                        fields.remove("e");
+                        fields.insert("event".to_string(), serde_json::json!(event_type));
+                        // 单调时钟毫秒数 → 墙上时间
+                        if let (Some(wall), Some(t)) = (anchor_wall, event["t"].as_f64()) {
+                            let millis = (wall * 1000.0 + t) as i64;
+                            if let Some(time) = chrono::DateTime::from_timestamp_millis(millis) {
+                                let local = time.with_timezone(&chrono::Local);
+                                fields.insert("timestamp".to_string(),
+                                    serde_json::json!(local.format("%Y-%m-%dT%H:%M:%S%.6f").to_string()));
+                            }
+                        }
+                    }
+                    dispatch_event(&app, &event_type, payload);
+                }
+            }
+            event_type => dispatch_event(&app, event_type, json.clone()),
+        }
+    }
+    println!("📭 Python stdout 读取线程结束");
+}
+
 // 自动查找系统中可用的 Python
 fn find_python() -> Result<PathBuf, String> {
     println!("🔍 正在查找系统 Python...");
@@ -92,17 +217,9 @@ async fn start_detection(
 ) -> Result<String, String> {
     let mut detector_guard = detector.lock().map_err(|e| e.to_string())?;
     
-    // 检查进程状态，如果已退出则清理
-    if let Some(ref mut child) = detector_guard.process {
-        if let Ok(Some(status)) = child.try_wait() {
-            // 进程已退出
-            detector_guard.process = None;
-            println!("🧹 清理已退出的 Python 进程 (退出码: {:?})", status.code());
-        }
-    }
-    
-    if detector_guard.is_running() {
-        return Ok("检测已在运行".to_string());
+    // 常驻进程还在（已暂停或正在运行）：直接恢复，不重新加载模型
+    if detector_guard.resume() {
+        return Ok("检测已启动".to_string());
     }
     
     println!("🚀 启动 Python 检测器...");
@@ -156,7 +273,10 @@ async fn start_detection(
     // 启动 Python 进程
     let mut child = Command::new(&python_path)
         .arg(&script_path)
+        .arg("--daemon")
         .current_dir(&final_python_dir)
+        .env(EVENT_PROTOCOL_ENV, EVENT_PROTOCOL_VERSION)
+        .stdin(Stdio::piped())
         .stdout(Stdio::piped())
         .stderr(Stdio::piped())
         .spawn()
@@ -169,38 +289,12 @@ async fn start_detection(
     let stderr = child.stderr.take().ok_or("无法获取 stderr")?;
     
     // 保存进程句柄
-    detector_guard.process = Some(child);
+    detector_guard.attach(child);
     drop(detector_guard);
     
     // 启动线程读取 Python 输出 (stdout - JSON 事件)
     let app_clone = app.clone();
-    thread::spawn(move || {
-        let reader = BufReader::new(stdout);
-        for line in reader.lines() {
-            if let Ok(line) = line {
-                println!("📨 Python 输出: {}", line);
-                
-                // 解析 JSON 并发送事件到前端
-                if let Ok(json) = serde_json::from_str::<serde_json::Value>(&line) {
-                    let event_type = json["event"].as_str().unwrap_or("unknown");
-                    
-                    // 检测到挠头时显示通知条
-                    if event_type == "scratch_detected" {
-                        let app_handle = app_clone.clone();
-                        tauri::async_runtime::spawn(async move {
-                            if let Err(e) = show_alert(app_handle).await {
-                                println!("❌ 显示通知条失败: {}", e);
-                            }
-                        });
-                    }
-                    
-                    // 发送到前端（用于界面显示）
-                    let _ = app_clone.emit(event_type, json.clone());
-                }
-            }
-        }
-        println!("📭 Python stdout 读取线程结束");
-    });
+    thread::spawn(move || forward_python_events(app_clone, stdout));
     
     // 启动线程读取 Python 错误输出 (stderr - 日志)
     thread::spawn(move || {
@@ -222,10 +316,33 @@ async fn stop_detection(
     detector: tauri::State<'_, Arc<Mutex<PythonDetector>>>
 ) -> Result<String, String> {
     let mut detector_guard = detector.lock().map_err(|e| e.to_string())?;
-    detector_guard.stop();
+    if !detector_guard.pause() {
+        detector_guard.stop();
+    }
     Ok("检测已停止".to_string())
 }
 
+// Tauri 命令：向运行中的检测器发送控制命令（JSON，例如 {"cmd": "set", "detection": {...}}，
+// 支持的命令见 python/main_simple.py 的 apply_commands，执行结果通过 command_ack 事件返回）
+#[tauri::command]
+async fn send_detector_command(
+    command: serde_json::Value,
+    detector: tauri::State<'_, Arc<Mutex<PythonDetector>>>
+) -> Result<(), String> {
+    if command.get("cmd").and_then(|cmd| cmd.as_str()).is_none() {
+        return Err("控制命令缺少 cmd 字段".to_string());
+    }
+    let mut detector_guard = detector.lock().map_err(|e| e.to_string())?;
+    if !detector_guard.is_alive() {
+        return Err("检测器未运行".to_string());
+    }
+    if detector_guard.send_command(&command.to_string()) {
+        Ok(())
+    } else {
+        Err("发送控制命令失败".to_string())
+    }
+}
+
 // Tauri 命令：获取检测状态
 #[tauri::command]
 async fn get_detection_status(
@@ -409,6 +526,7 @@ pub fn run() {
         .invoke_handler(tauri::generate_handler![
             start_detection,
             stop_detection,
+            send_detector_command,
             get_detection_status,
             show_alert,
             toggle_debug_window,
@@ -532,7 +650,9 @@ pub fn run() {
                                 if is_running {
                                     // 停止检测
                                     let mut guard = detector.lock().unwrap();
-                                    guard.stop();
+                                    if !guard.pause() {
+                                        guard.stop();
+                                    }
                                     println!("✅ 检测已停止（通过菜单栏）");
                                     
                                     // 通知前端更新 UI
@@ -541,6 +661,13 @@ pub fn run() {
                                     // 启动检测
                                     println!("🚀 启动检测（通过菜单栏）...");
                                     
+                                    // 常驻进程还在：直接恢复，不重新加载模型
+                                    let resumed = detector.lock().unwrap().resume();
+                                    if resumed {
+                                        let _ = app_handle.emit("detection_started_from_menu", ());
+                                        return;
+                                    }
+                                    
                                     // 调用启动逻辑
                                     let result = tauri::async_runtime::block_on(async {
                                         // 获取资源目录
@@ -573,7 +700,10 @@ pub fn run() {
                                         // 启动 Python 进程
                                         let mut child = Command::new(&python_path)
                                             .arg(&script_path)
+                                            .arg("--daemon")
                                             .current_dir(&final_python_dir)
+                                            .env(EVENT_PROTOCOL_ENV, EVENT_PROTOCOL_VERSION)
+                                            .stdin(Stdio::piped())
                                             .stdout(Stdio::piped())
                                             .stderr(Stdio::piped())
                                             .spawn()
@@ -588,34 +718,12 @@ pub fn run() {
                                         // 保存进程句柄
                                         {
                                             let mut guard = detector.lock().unwrap();
-                                            guard.process = Some(child);
+                                            guard.attach(child);
                                         }
                                         
                                         // 启动读取线程
                                         let app_clone = app_handle.clone();
-                                        std::thread::spawn(move || {
-                                            let reader = BufReader::new(stdout);
-                                            for line in reader.lines() {
-                                                if let Ok(line) = line {
-                                                    println!("📨 Python 输出: {}", line);
-                                                    if let Ok(json) = serde_json::from_str::<serde_json::Value>(&line) {
-                                                        let event_type = json["event"].as_str().unwrap_or("unknown");
-                                                        
-                                                        // 检测到挠头时显示通知条
-                                                        if event_type == "scratch_detected" {
-                                                            let app_handle = app_clone.clone();
-                                                            tauri::async_runtime::spawn(async move {
-                                                                if let Err(e) = show_alert(app_handle).await {
-                                                                    println!("❌ 显示通知条失败: {}", e);
-                                                                }
-                                                            });
-                                                        }
-                                                        
-                                                        let _ = app_clone.emit(event_type, json.clone());
-                                                    }
-                                                }
-                                            }
-                                        });
+                                        std::thread::spawn(move || forward_python_events(app_clone, stdout));
                                         
                                         std::thread::spawn(move || {
                                             let reader = BufReader::new(stderr);
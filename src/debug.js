@@ -19,12 +19,31 @@ function setStatus(type) {
   }
 }
 
+// 调试画面二进制通道（MJPEG）的订阅地址
+let streamUrl = null;
+
+function attachStream() {
+  if (streamUrl && !document.hidden && videoImg.src !== streamUrl) {
+    videoImg.src = streamUrl;
+  }
+}
+
+function detachStream() {
+  // 断开连接后 Python 端停止编码
+  if (streamUrl) {
+    videoImg.removeAttribute('src');
+  }
+}
+
 async function init() {
-  // 帧事件：debug_frame { image_b64, status, count, duration }
+  // 帧事件：debug_frame { image_b64 | stream_url, status, count, duration }
   await listen('debug_frame', ({ payload }) => {
     try {
       const p = typeof payload === 'string' ? JSON.parse(payload) : payload;
-      if (p.image_b64) {
+      if (p.stream_url) {
+        streamUrl = p.stream_url;
+        attachStream();
+      } else if (p.image_b64) {
         videoImg.src = `data:image/jpeg;base64,${p.image_b64}`;
       }
       if (p.status) setStatus(p.status);
@@ -38,6 +57,15 @@ async function init() {
   // 状态事件兜底
   await listen('warning', ({ payload }) => setStatus('warning'));
   await listen('scratch_detected', ({ payload }) => setStatus('scratch_detected'));
+
+  // 窗口隐藏时断开画面订阅，显示时重新连接
+  document.addEventListener('visibilitychange', () => {
+    if (document.hidden) {
+      detachStream();
+    } else {
+      attachStream();
+    }
+  });
 }
 
 window.addEventListener('DOMContentLoaded', init);